@@ -0,0 +1,248 @@
+"""
+Columnar storage for the clean data layer.
+
+The transform writes every output table of a cycle as an Arrow IPC file
+(``data/clean/cycles/<suffix>/<name>.arrow``) with a fixed, typed schema.
+The files are uncompressed so they can be memory-mapped: readers get typed
+columns (dates stay dates, IDs stay integers) without parsing or copying.
+CSV is still available as an optional compatibility output.
+
+    from etl.clean_store import read_table, biomarker_matrix
+    measurements = read_table("measurements").to_pandas()
+    wide = biomarker_matrix(cycles=["I", "J"])
+"""
+
+import csv
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+CLEAN_DIR = Path(__file__).resolve().parent.parent / "data" / "clean"
+
+SCHEMAS = {
+    "users": pa.schema(
+        [
+            ("SEQN", pa.int64()),
+            ("BirthDate", pa.date32()),
+            ("Sex", pa.string()),
+            ("RaceEthnicity", pa.string()),
+        ]
+    ),
+    "sessions": pa.schema(
+        [
+            ("SEQN", pa.int64()),
+            ("SessionDate", pa.date32()),
+            ("FastingStatus", pa.int8()),
+        ]
+    ),
+    "measurements": pa.schema(
+        [
+            ("SEQN", pa.int64()),
+            ("SessionDate", pa.date32()),
+            ("BiomarkerID", pa.int16()),
+            ("Value", pa.float64()),
+            ("TakenAt", pa.date32()),
+        ]
+    ),
+    "anthropometry": pa.schema(
+        [
+            ("SEQN", pa.int64()),
+            ("ExamDate", pa.date32()),
+            ("HeightCM", pa.float64()),
+            ("WeightKG", pa.float64()),
+            ("BMI", pa.float64()),
+        ]
+    ),
+}
+
+FORMATS = {"arrow": ".arrow", "csv": ".csv"}
+
+
+# ---- writing ----
+
+
+class _Sink:
+    """
+    Append-only writer for one table in one format
+
+    Rows go to ``<file>.part``, which ``close`` renames into place, so a
+    failed run never leaves a half-written file behind.
+    """
+
+    def __init__(self, path: Path, name: str):
+        """Prepare ``path``.part for table ``name``"""
+        self.path = path
+        self.schema = SCHEMAS[name]
+        self._part = path.with_name(path.name + ".part")
+
+    def write(self, frame: pd.DataFrame) -> None:
+        """Append rows (columns are selected and ordered by the schema)"""
+        self._write(frame[self.schema.names])
+
+    def close(self) -> None:
+        """Finish the file and move it into place"""
+        self._close()
+        os.replace(self._part, self.path)
+
+    def abort(self) -> None:
+        """Discard the partial file"""
+        self._close()
+        self._part.unlink(missing_ok=True)
+
+
+class ArrowSink(_Sink):
+    """Uncompressed Arrow IPC file, one record batch per written chunk"""
+
+    def __init__(self, path: Path, name: str):
+        """Open the IPC file writer with the table's schema"""
+        super().__init__(path, name)
+        self._writer = pa.ipc.new_file(str(self._part), self.schema)
+
+    def _write(self, frame: pd.DataFrame) -> None:
+        """Convert with the fixed schema (NaN becomes null)"""
+        self._writer.write_table(
+            pa.Table.from_pandas(frame, schema=self.schema, preserve_index=False)
+        )
+
+    def _close(self) -> None:
+        """Write the IPC footer"""
+        self._writer.close()
+
+
+class CsvSink(_Sink):
+    """CSV in the layout the old ``load.sh`` expected (compatibility output)"""
+
+    def __init__(self, path: Path, name: str):
+        """Open the file and write the header"""
+        super().__init__(path, name)
+        self._file = open(self._part, "w", newline="")
+        self._file.write(",".join(self.schema.names) + "\n")
+
+    def _write(self, frame: pd.DataFrame) -> None:
+        """Append rows (dates are written as YYYY-MM-DD)"""
+        frame.to_csv(self._file, header=False, index=False, date_format="%Y-%m-%d")
+
+    def _close(self) -> None:
+        """Close the file"""
+        self._file.close()
+
+
+SINKS = {"arrow": ArrowSink, "csv": CsvSink}
+
+
+class TableOutput:
+    """One output table, written to each requested format, with timing"""
+
+    def __init__(self, cycle_dir: Path, name: str, formats=("arrow",)):
+        """Open a sink per format in ``cycle_dir``"""
+        self.name = name
+        self.sinks = [
+            SINKS[fmt](Path(cycle_dir) / f"{name}{FORMATS[fmt]}", name)
+            for fmt in formats
+        ]
+        self.rows = 0
+        self.seconds = 0.0
+
+    @property
+    def files(self):
+        """Names of the files this output produces"""
+        return [sink.path.name for sink in self.sinks]
+
+    def write(self, frame: pd.DataFrame, started: float) -> None:
+        """Append rows; ``started`` is when work on this chunk began"""
+        for sink in self.sinks:
+            sink.write(frame)
+        self.rows += len(frame)
+        self.seconds += time.perf_counter() - started
+
+    def close(self) -> None:
+        """Move every finished file into place"""
+        for sink in self.sinks:
+            sink.close()
+
+    def abort(self) -> None:
+        """Discard every partial file"""
+        for sink in self.sinks:
+            sink.abort()
+
+
+# ---- reading ----
+
+
+def table_path(cycle_dir: Path, name: str) -> Path:
+    """The Arrow file of a table, falling back to CSV for older transforms"""
+    arrow = Path(cycle_dir) / f"{name}.arrow"
+    return arrow if arrow.exists() else Path(cycle_dir) / f"{name}.csv"
+
+
+def open_table(path: Path, columns=None) -> pa.Table:
+    """Memory-map one Arrow IPC file (zero-copy) and return it as a Table"""
+    with pa.memory_map(str(path), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.select(columns) if columns else table
+
+
+def iter_rows(path: Path):
+    """
+    Yield rows of an Arrow or CSV table file as tuples
+
+    Arrow values come back typed (dates as ``datetime.date``, nulls as None);
+    CSV values are strings, with empty fields as None.
+    """
+    path = Path(path)
+    if path.suffix == ".arrow":
+        with pa.memory_map(str(path), "r") as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                yield from zip(*(column.to_pylist() for column in batch.columns))
+        return
+
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)  # header
+        for row in reader:
+            yield tuple(value if value != "" else None for value in row)
+
+
+def cycle_dirs(clean_dir: Path = CLEAN_DIR, cycles=None):
+    """Transformed cycle directories (those with a manifest), sorted"""
+    dirs = sorted(
+        path.parent for path in (Path(clean_dir) / "cycles").glob("*/manifest.json")
+    )
+    return [path for path in dirs if not cycles or path.name in cycles]
+
+
+def read_table(name: str, cycles=None, columns=None, clean_dir: Path = CLEAN_DIR):
+    """
+    One clean table across cycles, as a single memory-mapped Arrow Table
+
+    Args:
+        name: "users", "sessions", "measurements" or "anthropometry"
+        cycles: Cycle suffixes to include (default: all transformed cycles)
+        columns: Optional subset of columns to keep
+    """
+    tables = [
+        open_table(path / f"{name}.arrow", columns)
+        for path in cycle_dirs(clean_dir, cycles)
+        if (path / f"{name}.arrow").exists()
+    ]
+    if not tables:
+        schema = SCHEMAS[name]
+        if columns:
+            schema = pa.schema([schema.field(column) for column in columns])
+        return schema.empty_table()
+    return pa.concat_tables(tables)
+
+
+def biomarker_matrix(cycles=None, clean_dir: Path = CLEAN_DIR) -> pd.DataFrame:
+    """Wide SEQN x BiomarkerID matrix of the clean measurements, for analytics"""
+    measurements = read_table(
+        "measurements", cycles, ["SEQN", "BiomarkerID", "Value"], clean_dir
+    ).to_pandas()
+    return measurements.pivot_table(
+        index="SEQN", columns="BiomarkerID", values="Value", aggfunc="last"
+    )
@@ -0,0 +1,80 @@
+"""
+NHANES cycle registry.
+
+Every cycle-specific detail of the ETL lives here: which two-year survey
+cycle a file suffix belongs to, which XPT files it publishes, and which lab
+variables map to our BiomarkerIDs. The downloader, transform and loader all
+take a list of cycle suffixes and look them up in ``CYCLES``.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict
+
+BASE_URL = "https://wwwn.cdc.gov/Nchs/Data/Nhanes/Public/{year}/DataFiles/{name}"
+
+# NHANES variable -> BiomarkerID, grouped by the file it comes from
+LAB_FILES = {
+    "BIOPRO": {"LBXSAL": 1, "LBXSAPSI": 2, "LBXSCR": 3},  # Albumin, ALP, Creatinine
+    "GLU": {"LBXGLU": 4},  # Fasting glucose (mg/dL)
+    "HSCRP": {"LBXHSCRP": 5},  # High-sensitivity CRP
+    "CBC": {"LBXWBCSI": 6, "LBXLYPCT": 7, "LBXMCVSI": 8, "LBXRDW": 9},
+}
+
+# Non-lab files every cycle needs
+CORE_FILES = ["DEMO", "FASTQX", "BMX"]
+
+
+@dataclass(frozen=True)
+class NhanesCycle:
+    """One two-year NHANES survey cycle"""
+
+    suffix: str
+    first_year: int
+    last_year: int
+    lab_files: Dict[str, Dict[str, int]] = field(default_factory=lambda: LAB_FILES)
+
+    @property
+    def label(self) -> str:
+        """E.g. '2017-2018'"""
+        return f"{self.first_year}-{self.last_year}"
+
+    @property
+    def exam_year(self) -> int:
+        """Year used for exam dates and to derive birth dates from age"""
+        return self.last_year
+
+    @property
+    def file_stems(self):
+        """All XPT stems to download for this cycle"""
+        return CORE_FILES + list(self.lab_files)
+
+    def file_name(self, stem: str) -> str:
+        """Local XPT file name, e.g. DEMO_J.XPT"""
+        return f"{stem}_{self.suffix}.XPT"
+
+    def url(self, stem: str) -> str:
+        """CDC download URL (folders are named after the first cycle year)"""
+        return BASE_URL.format(year=self.first_year, name=self.file_name(stem))
+
+
+CYCLES = {
+    # hs-CRP was not measured in 2013-2014, so CRP is missing for cycle H
+    "H": NhanesCycle(
+        "H",
+        2013,
+        2014,
+        {stem: v for stem, v in LAB_FILES.items() if stem != "HSCRP"},
+    ),
+    "I": NhanesCycle("I", 2015, 2016),
+    "J": NhanesCycle("J", 2017, 2018),
+}
+DEFAULT_CYCLES = ["J"]
+
+
+def get_cycles(suffixes=None):
+    """Look up cycles by suffix (default: DEFAULT_CYCLES)"""
+    suffixes = suffixes or DEFAULT_CYCLES
+    unknown = [suffix for suffix in suffixes if suffix not in CYCLES]
+    if unknown:
+        raise ValueError(f"Unknown NHANES cycle(s): {unknown}")
+    return [CYCLES[suffix] for suffix in suffixes]
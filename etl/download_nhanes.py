@@ -1,53 +1,264 @@
 """NHANES Data Downloader.
 
 This script downloads NHANES data files needed for the Longevity Biomarker
-Tracking System. It gets the 2017-2018 cycle files for demographics and the
-nine biomarkers needed for the Phenotypic Age calculation.
+Tracking System: demographics, fasting questionnaire, body measures and the
+nine biomarkers needed for the Phenotypic Age calculation, for one or more
+two-year cycles (2017-2018, cycle J, by default).
+
+Files are fetched concurrently and streamed to disk in chunks. Interrupted
+downloads are resumed with an HTTP Range request, and a small cache manifest
+(``data/raw/.download_cache.json``) records each URL's ETag, size and SHA-256
+so that unchanged files are revalidated with a conditional request and
+skipped instead of downloaded again.
+
+Usage:
+    python etl/download_nhanes.py
+    python etl/download_nhanes.py --cycle I --cycle J --workers 8
 """
 
-import urllib.request
+import argparse
+import hashlib
+import http.client
+import json
+import os
 import ssl
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
-# Create data directories if they don't exist
-raw_dir = Path("data/raw")
-raw_dir.mkdir(parents=True, exist_ok=True)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from etl.cycles import CYCLES, get_cycles
+
+RAW_DIR = Path("data/raw")
+CACHE_MANIFEST = ".download_cache.json"
+
+CHUNK_BYTES = 1 << 20
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 2.0
+TIMEOUT_SECONDS = 60
+RETRY_STATUS = {408, 416, 429}
+
+
+def nhanes_urls(cycles=None):
+    """Map local file name (e.g. DEMO_J.XPT) to its CDC URL for each cycle"""
+    return {
+        cycle.file_name(stem): cycle.url(stem)
+        for cycle in get_cycles(cycles)
+        for stem in cycle.file_stems
+    }
+
+
+def ssl_context():
+    """SSL context for the CDC host (certificate checks are relaxed as before)"""
+    ctx = ssl.create_default_context()
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
+
+def file_sha256(path: Path) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DownloadCache:
+    """
+    Manifest of completed downloads keyed by URL
+
+    Each entry records the server's ETag/Last-Modified and the local file's
+    size and SHA-256; an entry only counts if the file on disk still matches.
+    """
+
+    def __init__(self, raw_dir: Path):
+        """Load the manifest from ``raw_dir`` (empty if missing or unreadable)"""
+        self.path = raw_dir / CACHE_MANIFEST
+        self._lock = threading.Lock()
+        try:
+            self.entries = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            self.entries = {}
 
-# URLs for the NHANES 2017-2018 (cycle J) XPT files we need
-urls = {
-    "DEMO_J.XPT": "https://wwwn.cdc.gov/Nchs/Data/Nhanes/Public/2017/DataFiles/DEMO_J.xpt",
-    "BIOPRO_J.XPT": "https://wwwn.cdc.gov/Nchs/Data/Nhanes/Public/2017/DataFiles/BIOPRO_J.XPT",
-    "GLU_J.XPT": "https://wwwn.cdc.gov/Nchs/Data/Nhanes/Public/2017/DataFiles/GLU_J.XPT",
-    "HSCRP_J.XPT": "https://wwwn.cdc.gov/Nchs/Data/Nhanes/Public/2017/DataFiles/HSCRP_J.XPT",
-    "CBC_J.XPT": "https://wwwn.cdc.gov/Nchs/Data/Nhanes/Public/2017/DataFiles/CBC_J.XPT",
-    "BMX_J.XPT": "https://wwwn.cdc.gov/Nchs/Data/Nhanes/Public/2017/DataFiles/BMX_J.XPT",
-    "FASTQX_J.XPT": "https://wwwn.cdc.gov/Nchs/Data/Nhanes/Public/2017/DataFiles/FASTQX_J.XPT",
-}
+    def valid_entry(self, url: str, target: Path):
+        """Cache entry for ``url`` if ``target`` is intact, else None"""
+        entry = self.entries.get(url)
+        if not entry or "sha256" not in entry or not target.exists():
+            return None
+        if target.stat().st_size != entry["size"]:
+            return None
+        if file_sha256(target) != entry["sha256"]:
+            return None
+        return entry
 
+    def partial_validator(self, url: str):
+        """ETag/Last-Modified of the response a ``.part`` file came from"""
+        return self.entries.get(url, {}).get("partialValidator")
+
+    def mark_partial(self, url: str, validator) -> None:
+        """Remember which server version an in-progress download belongs to"""
+        with self._lock:
+            self.entries[url] = {"partialValidator": validator}
+            self._save()
+
+    def record(self, url: str, target: Path, headers, sha256: str) -> None:
+        """Store a completed download and persist the manifest"""
+        with self._lock:
+            self.entries[url] = {
+                "file": target.name,
+                "etag": headers.get("ETag"),
+                "lastModified": headers.get("Last-Modified"),
+                "size": target.stat().st_size,
+                "sha256": sha256,
+            }
+            self._save()
+
+    def _save(self) -> None:
+        """Write the manifest atomically (caller holds the lock)"""
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self.entries, indent=2, sort_keys=True))
+        os.replace(tmp, self.path)
+
+
+def fetch(url: str, target: Path, cache: DownloadCache, context=None) -> str:
+    """
+    Download ``url`` to ``target`` unless the cached copy is still current
+
+    Partial data lives in ``<target>.part`` and is resumed with a Range
+    request (guarded by If-Range, so a changed file restarts from zero).
+
+    Returns:
+        "cached" if the server confirmed the local copy (304), else "downloaded"
+    """
+    part = target.with_name(target.name + ".part")
+    entry = cache.valid_entry(url, target)
+
+    request = urllib.request.Request(url)
+    if entry and entry.get("etag"):
+        request.add_header("If-None-Match", entry["etag"])
+    if entry and entry.get("lastModified"):
+        request.add_header("If-Modified-Since", entry["lastModified"])
+
+    offset = part.stat().st_size if part.exists() and not entry else 0
+    validator = cache.partial_validator(url)
+    if offset and validator:
+        request.add_header("Range", f"bytes={offset}-")
+        request.add_header("If-Range", validator)
+    else:
+        offset = 0
 
-def download_file(url, filename):
-    """Download a file from a URL to the specified filename."""
     try:
-        # Create an SSL context that doesn't verify certificates (only if needed)
-        ctx = ssl.create_default_context()
-        ctx.check_hostname = False
-        ctx.verify_mode = ssl.CERT_NONE
+        response = urllib.request.urlopen(
+            request, context=context, timeout=TIMEOUT_SECONDS
+        )
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and entry:
+            return "cached"
+        if e.code == 416:  # stale .part longer than the file; start over
+            part.unlink(missing_ok=True)
+        raise
+
+    with response:
+        digest = hashlib.sha256()
+        if response.status == 206:
+            with open(part, "rb") as f:
+                for block in iter(lambda: f.read(CHUNK_BYTES), b""):
+                    digest.update(block)
+            mode = "ab"
+        else:
+            mode = "wb"
+            cache.mark_partial(
+                url,
+                response.headers.get("ETag") or response.headers.get("Last-Modified"),
+            )
+
+        received = 0
+        with open(part, mode) as out_file:
+            for block in iter(lambda: response.read(CHUNK_BYTES), b""):
+                out_file.write(block)
+                digest.update(block)
+                received += len(block)
+        headers = response.headers
+
+    # http.client returns short reads at EOF silently; keep the .part to resume
+    expected = headers.get("Content-Length")
+    if expected is not None and received < int(expected):
+        raise http.client.IncompleteRead(b"", int(expected) - received)
+
+    os.replace(part, target)
+    cache.record(url, target, headers, digest.hexdigest())
+    return "downloaded"
+
+
+def download_file(url, filename, cache, context=None):
+    """Fetch one file with retries; returns (status, seconds)"""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        started = time.perf_counter()
+        try:
+            status = fetch(url, Path(filename), cache, context)
+            return status, time.perf_counter() - started
+        except (urllib.error.URLError, http.client.HTTPException, OSError) as e:
+            code = getattr(e, "code", None)  # set for HTTP errors only
+            retryable = code is None or code in RETRY_STATUS or code >= 500
+            if attempt == MAX_ATTEMPTS or not retryable:
+                print(f"Error downloading {filename}: {e}")
+                return "failed", time.perf_counter() - started
+            print(f"[WARNING] {filename}: {e} (attempt {attempt}, retrying)")
+            time.sleep(RETRY_BACKOFF_SECONDS * attempt)
+
+
+def download_all(urls, raw_dir: Path = RAW_DIR, workers: int = 4, context=None):
+    """
+    Download ``urls`` ({file name: url}) into ``raw_dir`` with a thread pool
 
-        print(f"Downloading {filename}...")
-        with urllib.request.urlopen(url, context=ctx) as response:
-            with open(filename, "wb") as out_file:
-                out_file.write(response.read())
-        print(f"Downloaded {filename} successfully.")
-    except Exception as e:
-        print(f"Error downloading {filename}: {e}")
+    Returns:
+        Dict of file name -> "downloaded" / "cached" / "failed"
+    """
+    raw_dir = Path(raw_dir)
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    cache = DownloadCache(raw_dir)
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(download_file, url, raw_dir / name, cache, context): name
+            for name, url in urls.items()
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            status, seconds = future.result()
+            results[name] = status
+            print(f"{status:>10}  {name} ({seconds:.1f}s)")
+    return results
 
 
 def main():
     """Main function to download all required NHANES files."""
-    for filename, url in urls.items():
-        download_file(url, raw_dir / filename)
+    parser = argparse.ArgumentParser(description="NHANES XPT downloader")
+    parser.add_argument(
+        "--cycle",
+        action="append",
+        choices=sorted(CYCLES),
+        help="NHANES cycle suffix (repeatable, default: J)",
+    )
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--raw-dir", type=Path, default=RAW_DIR)
+    args = parser.parse_args()
 
-    print("\nDownload complete. Files saved to data/raw/")
+    results = download_all(
+        nhanes_urls(args.cycle), args.raw_dir, args.workers, ssl_context()
+    )
+    failed = sorted(name for name, status in results.items() if status == "failed")
+    print(f"\nDownload complete. Files saved to {args.raw_dir}/")
+    if failed:
+        print(f"[WARNING] failed: {', '.join(failed)}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
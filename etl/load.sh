@@ -1,7 +1,8 @@
 #!/usr/bin/env bash
 # ------------------------------------------------------------------
-# ETL Load Script – loads patched CSVs into MySQL 8
-# • Handles SEQN→UserID and SessionID look-ups with temp tables
+# ETL Load Script – loads transformed NHANES cycles into MySQL 8
+# • Reference ranges via LOAD DATA; NHANES cycles via etl/loader.py
+# • Incremental: only new or changed cycles (per manifest) are loaded
 # • Creates a tidy sample dump for CI without privileged options
 # ------------------------------------------------------------------
 
@@ -31,8 +32,8 @@ mysqldump_cmd() {
 echo "Starting data load process..."
 
 # ── Ensure CSVs present ────────────────────────────────────────────
-if ! ls data/clean/*.csv >/dev/null 2>&1; then
-  echo "[WARN] Skipping MySQL LOAD – clean/*.csv not generated yet."
+if ! ls data/clean/cycles/*/manifest.json >/dev/null 2>&1; then
+  echo "[WARN] Skipping MySQL LOAD – no transformed cycles in data/clean/cycles/ yet."
   exit 0
 fi
 
@@ -62,90 +63,13 @@ echo "Verifying reference ranges loaded..."
 mysql -h "$MYSQL_HOST" -P "$MYSQL_PORT" -u "$MYSQL_USER" -p"$MYSQL_PASSWORD" \
       "$MYSQL_DATABASE" -e "SELECT RangeType, COUNT(*) as count FROM ReferenceRange GROUP BY RangeType;"
 
-# ── Load USERS (BirthDate already patched) ─────────────────────────
-echo "Loading User ..."
-mysql_cmd -e "
-  LOAD DATA LOCAL INFILE 'data/clean/users.csv'
-  INTO TABLE User
-  FIELDS TERMINATED BY ',' ENCLOSED BY '\"'
-  LINES  TERMINATED BY '\n'
-  IGNORE 1 ROWS
-  (SEQN, BirthDate, Sex, RaceEthnicity);
-"
-
-# ── Load MEASUREMENTSESSION (SEQN → UserID) ───────────────────────
-echo "Loading MeasurementSession ..."
-mysql_cmd -e "
-  CREATE TEMPORARY TABLE tmp_sessions (
-      SEQN INT, SessionDate DATE, FastingStatus TINYINT
-  );
-
-  LOAD DATA LOCAL INFILE 'data/clean/sessions.csv'
-  INTO TABLE tmp_sessions
-  FIELDS TERMINATED BY ',' ENCLOSED BY '\"'
-  LINES  TERMINATED BY '\n'
-  IGNORE 1 ROWS
-  (SEQN, SessionDate, FastingStatus);
-
-  INSERT IGNORE INTO MeasurementSession (UserID, SessionDate, FastingStatus)
-  SELECT u.UserID, t.SessionDate, t.FastingStatus
-  FROM   tmp_sessions t
-  JOIN   User u USING (SEQN);
-
-  DROP TEMPORARY TABLE tmp_sessions;
-"
-
-# ── Load MEASUREMENT (SEQN + SessionDate → SessionID) ─────────────
-echo "Loading Measurement ..."
-mysql_cmd -e "
-  CREATE TEMPORARY TABLE tmp_meas (
-      SEQN INT, SessionDate DATE,
-      BiomarkerID INT, Value DECIMAL(12,4), TakenAt TIMESTAMP
-  );
-
-  LOAD DATA LOCAL INFILE 'data/clean/measurements.csv'
-  INTO TABLE tmp_meas
-  FIELDS TERMINATED BY ',' ENCLOSED BY '\"'
-  LINES  TERMINATED BY '\n'
-  IGNORE 1 ROWS
-  (SEQN, SessionDate, BiomarkerID, Value, TakenAt);
-
-  INSERT IGNORE INTO Measurement (SessionID, BiomarkerID, Value, TakenAt)
-  SELECT s.SessionID, t.BiomarkerID, t.Value, t.TakenAt
-  FROM   tmp_meas t
-  JOIN   User u USING (SEQN)
-  JOIN   MeasurementSession s
-         ON s.UserID = u.UserID AND s.SessionDate = t.SessionDate;
-
-  DROP TEMPORARY TABLE tmp_meas;
-"
-
-# ── Load ANTHROPOMETRY (optional file) ────────────────────────────
-if [[ -f "data/clean/anthropometry.csv" ]]; then
-  echo "Loading Anthropometry ..."
-  mysql_cmd -e "
-    CREATE TEMPORARY TABLE tmp_anthro (
-        SEQN INT, ExamDate DATE,
-        HeightCM DECIMAL(5,2), WeightKG DECIMAL(5,2), BMI DECIMAL(4,2)
-    );
-
-    LOAD DATA LOCAL INFILE 'data/clean/anthropometry.csv'
-    INTO TABLE tmp_anthro
-    FIELDS TERMINATED BY ',' ENCLOSED BY '\"'
-    LINES  TERMINATED BY '\n'
-    IGNORE 1 ROWS
-    (SEQN, ExamDate, HeightCM, WeightKG, BMI);
-
-    INSERT IGNORE INTO Anthropometry (UserID, ExamDate, HeightCM, WeightKG, BMI)
-    SELECT u.UserID, t.ExamDate, t.HeightCM, t.WeightKG, t.BMI
-    FROM   tmp_anthro t
-    JOIN   User u USING (SEQN);
-
-    DROP TEMPORARY TABLE tmp_anthro;
-  "
-else
-  echo "Skipping Anthropometry (file not found)"
-fi
+# ── Load NHANES cycles (incremental, see etl/loader.py) ────────────
+# Only new or re-transformed cycles are loaded; FORCE_RELOAD=1 reloads all,
+# DEFER_INDEXES=1 rebuilds Measurement's secondary indexes once at the end.
+loader_args=()
+[[ "${FORCE_RELOAD:-0}" == "1" ]] && loader_args+=(--force)
+[[ "${DEFER_INDEXES:-0}" == "1" ]] && loader_args+=(--defer-indexes)
+"${PYTHON:-python3}" etl/loader.py ${loader_args[@]+"${loader_args[@]}"}
 
 # ── Create sample dump for CI (no LIMIT-in-subquery) ───────────────
 echo "Creating sample dump for testing ..."
@@ -171,5 +95,11 @@ mysqldump_cmd Measurement \
   --no-create-info --skip-add-drop-table --skip-lock-tables \
   >> tests/sample_dump.sql
 
+# 4) Latest-measurement table for the same users
+mysqldump_cmd UserLatestMeasurement \
+  --where="UserID IN ($TOP_USERS)" \
+  --no-create-info --skip-add-drop-table --skip-lock-tables \
+  >> tests/sample_dump.sql
+
 echo "Sample dump written to tests/sample_dump.sql"
 echo "Data loading completed successfully!"
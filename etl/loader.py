@@ -0,0 +1,577 @@
+#!/usr/bin/env python3
+"""
+Bulk loader for transformed NHANES cycles.
+
+Loads each ``data/clean/cycles/<suffix>/`` directory written by
+``etl/transform.py`` into MySQL over a single connection. Foreign keys are
+resolved in memory (SEQN -> UserID and (UserID, SessionDate) -> SessionID are
+read once per cycle into dicts), and rows are streamed from the memory-mapped
+Arrow files (or the CSVs of older transforms) in batched multi-row
+``INSERT ... ON DUPLICATE KEY UPDATE`` statements, so no temporary tables or
+``mysql`` CLI round trips are needed.
+
+Loading is incremental: a cycle whose manifest fingerprint matches its
+``NhanesCycleLoad`` row is skipped. Each cycle loads in one transaction:
+rows are upserted, rows an earlier load of the cycle wrote that are no longer
+in its files (a dropped participant, session, lab variable or exam) are
+deleted, ``UserLatestMeasurement`` is refreshed for its own users and the
+cycle is then recorded in ``NhanesCycleLoad``. Sessions and exams carry the
+cycle that created them in ``SourceCycle``; ones entered through the API have
+none and are never pruned, and neither is a participant who still has any. ``--defer-indexes`` drops the secondary indexes on
+``Measurement`` for the duration of the load and rebuilds them once at the
+end, which is much faster for large initial loads.
+
+Usage:
+    python etl/loader.py
+    python etl/loader.py --cycle J --force --defer-indexes
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+
+import pyarrow.compute as pc
+import pymysql
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from etl.clean_store import cycle_dirs as find_cycle_dirs
+from etl.clean_store import iter_rows, open_table, table_path
+
+load_dotenv()
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+CLEAN_DIR = PROJECT_ROOT / "data" / "clean"
+
+DB_CONFIG = {
+    "host": os.getenv("MYSQL_HOST", "localhost"),
+    "port": int(os.getenv("MYSQL_PORT", 3307)),
+    "user": os.getenv("MYSQL_USER", "biomarker_user"),
+    "password": os.getenv("MYSQL_PASSWORD", "biomarker_pass"),
+    "database": os.getenv("MYSQL_DATABASE", "longevity"),
+    "charset": "utf8mb4",
+    "cursorclass": pymysql.cursors.DictCursor,
+    "autocommit": False,
+}
+
+BATCH_ROWS = 5000
+
+# Tables whose non-unique secondary indexes --defer-indexes rebuilds after load
+DEFERRABLE_INDEX_TABLES = ["Measurement"]
+
+# ---- SQL ----
+
+LOADED_FINGERPRINT = """
+SELECT Fingerprint, SeqnLow, SeqnHigh FROM NhanesCycleLoad WHERE Cycle = %s
+"""
+
+UPSERT_USERS = """
+INSERT INTO User (SEQN, BirthDate, Sex, RaceEthnicity)
+VALUES (%s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    BirthDate = VALUES(BirthDate),
+    Sex = VALUES(Sex),
+    RaceEthnicity = VALUES(RaceEthnicity)
+"""
+
+UPSERT_SESSIONS = """
+INSERT INTO MeasurementSession (UserID, SessionDate, FastingStatus, SourceCycle)
+VALUES (%s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE FastingStatus = VALUES(FastingStatus)
+"""
+
+UPSERT_MEASUREMENTS = """
+INSERT INTO Measurement (SessionID, BiomarkerID, Value, TakenAt)
+VALUES (%s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE Value = VALUES(Value), TakenAt = VALUES(TakenAt)
+"""
+
+UPSERT_ANTHROPOMETRY = """
+INSERT INTO Anthropometry (UserID, ExamDate, HeightCM, WeightKG, BMI, SourceCycle)
+VALUES (%s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    HeightCM = VALUES(HeightCM),
+    WeightKG = VALUES(WeightKG),
+    BMI = VALUES(BMI)
+"""
+
+USER_IDS = "SELECT SEQN, UserID FROM User WHERE SEQN BETWEEN %s AND %s"
+
+SESSION_IDS = """
+SELECT s.UserID, s.SessionDate, s.SessionID
+FROM MeasurementSession s
+JOIN User u ON u.UserID = s.UserID
+WHERE u.SEQN BETWEEN %s AND %s
+"""
+
+# SourceCycle is only set when the loader inserts a row, so sessions and
+# exams entered through the API keep NULL even if a load later merges into them
+CYCLE_SESSION_KEYS = """
+SELECT s.SessionID, s.UserID, s.SessionDate, s.SourceCycle
+FROM MeasurementSession s
+JOIN User u ON u.UserID = s.UserID
+WHERE u.SEQN BETWEEN %s AND %s
+"""
+
+CYCLE_MEASUREMENT_KEYS = """
+SELECT m.MeasurementID, m.SessionID, m.BiomarkerID
+FROM Measurement m
+JOIN MeasurementSession s ON m.SessionID = s.SessionID
+WHERE s.SourceCycle = %s
+"""
+
+CYCLE_ANTHROPOMETRY_KEYS = """
+SELECT a.AnthroID, a.UserID, a.ExamDate, a.SourceCycle
+FROM Anthropometry a
+JOIN User u ON u.UserID = a.UserID
+WHERE u.SEQN BETWEEN %s AND %s
+"""
+
+# Stale rows are deleted child-first by primary key: foreign-key checks (and
+# so cascades) are off while --defer-indexes is in effect
+DELETE_STALE = {
+    "Measurement": "DELETE FROM Measurement WHERE MeasurementID IN ({placeholders})",
+    "MeasurementSession": (
+        "DELETE FROM MeasurementSession WHERE SessionID IN ({placeholders})"
+    ),
+    "Anthropometry": "DELETE FROM Anthropometry WHERE AnthroID IN ({placeholders})",
+    "BiologicalAgeResult": (
+        "DELETE FROM BiologicalAgeResult WHERE UserID IN ({placeholders})"
+    ),
+    "User": "DELETE FROM User WHERE UserID IN ({placeholders})",
+}
+
+# SEQN ranges of different cycles do not overlap, so a range scopes a cycle
+DELETE_CYCLE_LATEST = """
+DELETE latest
+FROM UserLatestMeasurement latest
+JOIN User u ON u.UserID = latest.UserID
+WHERE u.SEQN BETWEEN %s AND %s
+"""
+
+INSERT_CYCLE_LATEST = """
+INSERT INTO UserLatestMeasurement (UserID, BiomarkerID, MeasurementID, Value, TakenAt)
+SELECT UserID, BiomarkerID, MeasurementID, Value, TakenAt
+FROM (
+    SELECT s.UserID, m.BiomarkerID, m.MeasurementID, m.Value, m.TakenAt,
+           ROW_NUMBER() OVER (
+               PARTITION BY s.UserID, m.BiomarkerID
+               ORDER BY m.TakenAt DESC, m.MeasurementID DESC
+           ) AS RowNumber
+    FROM Measurement m
+    JOIN MeasurementSession s ON m.SessionID = s.SessionID
+    JOIN User u ON u.UserID = s.UserID
+    WHERE u.SEQN BETWEEN %s AND %s
+) ranked
+WHERE RowNumber = 1
+"""
+
+RECORD_CYCLE = """
+INSERT INTO NhanesCycleLoad (Cycle, Label, Fingerprint, SeqnLow, SeqnHigh)
+VALUES (%s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    Label = VALUES(Label),
+    Fingerprint = VALUES(Fingerprint),
+    SeqnLow = VALUES(SeqnLow),
+    SeqnHigh = VALUES(SeqnHigh)
+"""
+
+SECONDARY_INDEXES = """
+SELECT INDEX_NAME AS name,
+       GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX) AS columns
+FROM information_schema.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND NON_UNIQUE = 1
+GROUP BY INDEX_NAME
+"""
+
+
+# ---- rows ----
+
+
+def resolve_users(rows, user_ids: dict, skipped: list):
+    """Replace the leading SEQN of each row by its UserID"""
+    for seqn, *rest in rows:
+        user_id = user_ids.get(int(seqn))
+        if user_id is None:
+            skipped[0] += 1
+            continue
+        yield (user_id, *rest)
+
+
+def resolve_measurements(rows, user_ids: dict, session_ids: dict, skipped: list):
+    """(SEQN, SessionDate, BiomarkerID, Value, TakenAt) -> Measurement row"""
+    for seqn, session_date, biomarker_id, value, taken_at in rows:
+        session_id = session_ids.get((user_ids.get(int(seqn)), str(session_date)))
+        if session_id is None:
+            skipped[0] += 1
+            continue
+        yield (session_id, biomarker_id, value, taken_at)
+
+
+def with_source(rows, cycle: str):
+    """Append the SourceCycle column to each row"""
+    for row in rows:
+        yield (*row, cycle)
+
+
+def record_keys(rows, keys: set, key):
+    """Pass rows through, adding ``key(row)`` to ``keys`` for each"""
+    for row in rows:
+        keys.add(key(row))
+        yield row
+
+
+def stale_rows(cursor, cycle: str, user_ids: dict, keep: dict, scope):
+    """
+    Primary keys of rows this cycle loaded that are no longer in its files
+
+    Only sessions, measurements and exams the loader wrote for ``cycle`` are
+    candidates. A dropped participant is removed (with their bio-age results)
+    only if no other session or exam of theirs remains.
+
+    Args:
+        user_ids: SEQN -> UserID for every user in ``scope``
+        keep: Keys written by this load: "User" SEQNs, "MeasurementSession"
+            and "Anthropometry" (UserID, date) and "Measurement"
+            (SessionID, BiomarkerID) pairs
+        scope: (low, high) SEQN range of the cycle
+
+    Returns:
+        Dict of table -> list of primary keys (UserIDs for BiologicalAgeResult)
+    """
+    dropped = {uid for seqn, uid in user_ids.items() if seqn not in keep["User"]}
+    kept_owners = set()
+
+    cursor.execute(CYCLE_SESSION_KEYS, scope)
+    sessions = set()
+    for row in cursor.fetchall():
+        key = (row["UserID"], str(row["SessionDate"]))
+        if row["SourceCycle"] == cycle and key not in keep["MeasurementSession"]:
+            sessions.add(row["SessionID"])
+        else:
+            kept_owners.add(row["UserID"])
+
+    cursor.execute(CYCLE_MEASUREMENT_KEYS, (cycle,))
+    measurements = [
+        row["MeasurementID"]
+        for row in cursor.fetchall()
+        if row["SessionID"] in sessions
+        or (row["SessionID"], int(row["BiomarkerID"])) not in keep["Measurement"]
+    ]
+
+    cursor.execute(CYCLE_ANTHROPOMETRY_KEYS, scope)
+    anthropometry = []
+    for row in cursor.fetchall():
+        key = (row["UserID"], str(row["ExamDate"]))
+        if row["SourceCycle"] == cycle and key not in keep["Anthropometry"]:
+            anthropometry.append(row["AnthroID"])
+        else:
+            kept_owners.add(row["UserID"])
+
+    users = sorted(dropped - kept_owners)
+    return {
+        "Measurement": measurements,
+        "MeasurementSession": sorted(sessions),
+        "Anthropometry": anthropometry,
+        "BiologicalAgeResult": users,
+        "User": users,
+    }
+
+
+def prune(cursor, stale: dict, batch_rows: int) -> int:
+    """Delete stale rows child-first; return the number of rows removed"""
+    removed = 0
+    for table, sql in DELETE_STALE.items():
+        for batch in batches(stale[table], batch_rows):
+            placeholders = ", ".join(["%s"] * len(batch))
+            removed += cursor.execute(sql.format(placeholders=placeholders), batch)
+    return removed
+
+
+def batches(rows, size: int):
+    """Split an iterable into lists of at most ``size`` rows"""
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+# ---- loading ----
+
+
+class TableStats:
+    """Rows written, rows skipped and time spent for one table"""
+
+    def __init__(self, table: str):
+        """Start the clock for ``table``"""
+        self.table = table
+        self.rows = 0
+        self.skipped = [0]  # mutable so the resolve_* generators can count
+        self._started = time.perf_counter()
+        self.seconds = 0.0
+
+    def stop(self) -> "TableStats":
+        """Stop the clock and print throughput"""
+        self.seconds = time.perf_counter() - self._started
+        rate = self.rows / self.seconds if self.seconds else float("inf")
+        skipped = f", {self.skipped[0]:,} unresolved" if self.skipped[0] else ""
+        print(
+            f"  ✓ {self.table:<20} {self.rows:>10,} rows in {self.seconds:6.2f}s "
+            f"({rate:,.0f} rows/s{skipped})"
+        )
+        return self
+
+
+def upsert(cursor, sql: str, rows, stats: TableStats, batch_rows: int):
+    """Stream ``rows`` into ``sql`` as multi-row INSERT batches"""
+    for batch in batches(rows, batch_rows):
+        cursor.executemany(sql, batch)  # rewritten by PyMySQL into one INSERT
+        stats.rows += len(batch)
+    return stats.stop()
+
+
+def seqn_range(path: Path):
+    """Smallest and largest SEQN in a cycle's users table"""
+    if path.suffix == ".arrow":
+        bounds = pc.min_max(open_table(path, ["SEQN"]).column("SEQN")).as_py()
+        return bounds["min"], bounds["max"]
+    low = high = None
+    for seqn, *_ in iter_rows(path):
+        seqn = int(seqn)
+        low = seqn if low is None else min(low, seqn)
+        high = seqn if high is None else max(high, seqn)
+    return low, high
+
+
+def load_cycle(connection, cycle_dir: Path, force=False, batch_rows=BATCH_ROWS):
+    """
+    Load one transformed cycle directory in a single transaction
+
+    Returns:
+        Dict of table -> rows written, or None if the cycle was unchanged
+    """
+    cycle_dir = Path(cycle_dir)
+    manifest = json.loads((cycle_dir / "manifest.json").read_text())
+    cycle = manifest["cycle"]
+
+    with connection.cursor() as cursor:
+        cursor.execute(LOADED_FINGERPRINT, (cycle,))
+        loaded = cursor.fetchone()
+    if not force and loaded and loaded["Fingerprint"] == manifest["fingerprint"]:
+        print(f"Cycle {cycle} ({manifest['label']}) unchanged – skipping")
+        return None
+
+    print(f"Loading cycle {cycle} ({manifest['label']}) ...")
+    low, high = seqn_range(table_path(cycle_dir, "users"))
+    # Prune over the previous load's range too, in case its edges were dropped
+    scope = (
+        min(low, loaded["SeqnLow"]) if loaded and loaded["SeqnLow"] else low,
+        max(high, loaded["SeqnHigh"]) if loaded and loaded["SeqnHigh"] else high,
+    )
+    keep = {
+        "User": set(),
+        "MeasurementSession": set(),
+        "Measurement": set(),
+        "Anthropometry": set(),
+    }
+    results = {}
+    try:
+        with connection.cursor() as cursor:
+            stats = TableStats("User")
+            rows = record_keys(
+                iter_rows(table_path(cycle_dir, "users")),
+                keep["User"],
+                lambda row: int(row[0]),
+            )
+            upsert(cursor, UPSERT_USERS, rows, stats, batch_rows)
+            results["User"] = stats.rows
+
+            cursor.execute(USER_IDS, scope)
+            user_ids = {row["SEQN"]: row["UserID"] for row in cursor.fetchall()}
+
+            stats = TableStats("MeasurementSession")
+            rows = record_keys(
+                resolve_users(
+                    iter_rows(table_path(cycle_dir, "sessions")),
+                    user_ids,
+                    stats.skipped,
+                ),
+                keep["MeasurementSession"],
+                lambda row: (row[0], str(row[1])),
+            )
+            results["MeasurementSession"] = upsert(
+                cursor, UPSERT_SESSIONS, with_source(rows, cycle), stats, batch_rows
+            ).rows
+
+            cursor.execute(SESSION_IDS, scope)
+            session_ids = {
+                (row["UserID"], str(row["SessionDate"])): row["SessionID"]
+                for row in cursor.fetchall()
+            }
+
+            stats = TableStats("Measurement")
+            rows = record_keys(
+                resolve_measurements(
+                    iter_rows(table_path(cycle_dir, "measurements")),
+                    user_ids,
+                    session_ids,
+                    stats.skipped,
+                ),
+                keep["Measurement"],
+                lambda row: (row[0], int(row[1])),
+            )
+            results["Measurement"] = upsert(
+                cursor, UPSERT_MEASUREMENTS, rows, stats, batch_rows
+            ).rows
+
+            stats = TableStats("Anthropometry")
+            rows = record_keys(
+                resolve_users(
+                    iter_rows(table_path(cycle_dir, "anthropometry")),
+                    user_ids,
+                    stats.skipped,
+                ),
+                keep["Anthropometry"],
+                lambda row: (row[0], str(row[1])),
+            )
+            results["Anthropometry"] = upsert(
+                cursor,
+                UPSERT_ANTHROPOMETRY,
+                with_source(rows, cycle),
+                stats,
+                batch_rows,
+            ).rows
+
+            # Latest rows are joined through User, so clear them before pruning
+            cursor.execute(DELETE_CYCLE_LATEST, scope)
+            stale = stale_rows(cursor, cycle, user_ids, keep, scope)
+            removed = prune(cursor, stale, batch_rows)
+            if removed:
+                print(f"  ✓ pruned {removed:,} rows no longer in the cycle files")
+
+            stats = TableStats("UserLatestMeasurement")
+            stats.rows = cursor.execute(INSERT_CYCLE_LATEST, scope)
+            results["UserLatestMeasurement"] = stats.stop().rows
+
+            cursor.execute(
+                RECORD_CYCLE,
+                (cycle, manifest["label"], manifest["fingerprint"], low, high),
+            )
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    return results
+
+
+def drop_secondary_indexes(connection, dropped: list, tables=DEFERRABLE_INDEX_TABLES):
+    """
+    Drop non-unique secondary indexes so loads skip their maintenance
+
+    Foreign-key checks are disabled for the session first, since an index
+    may be the one backing a foreign key. Each dropped index is appended to
+    ``dropped`` as (table, name, columns) as soon as it is gone, so
+    ``restore_indexes`` can rebuild them even if a later drop fails.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SET SESSION foreign_key_checks = 0")
+        for table in tables:
+            cursor.execute(SECONDARY_INDEXES, (table,))
+            for index in cursor.fetchall():
+                cursor.execute(f"ALTER TABLE {table} DROP INDEX {index['name']}")
+                dropped.append((table, index["name"], index["columns"]))
+
+
+def restore_indexes(connection, dropped) -> None:
+    """Recreate indexes removed by ``drop_secondary_indexes`` in one pass"""
+    started = time.perf_counter()
+    with connection.cursor() as cursor:
+        by_table = {}
+        for table, name, columns in dropped:
+            by_table.setdefault(table, []).append(f"ADD INDEX {name} ({columns})")
+        for table, clauses in by_table.items():
+            cursor.execute(f"ALTER TABLE {table} {', '.join(clauses)}")
+        cursor.execute("SET SESSION foreign_key_checks = 1")
+    if dropped:
+        print(
+            f"  ✓ rebuilt {len(dropped)} index(es) in {time.perf_counter() - started:.2f}s"
+        )
+
+
+def load(
+    clean_dir: Path = CLEAN_DIR,
+    cycles=None,
+    connection=None,
+    force: bool = False,
+    defer_indexes: bool = False,
+    batch_rows: int = BATCH_ROWS,
+):
+    """
+    Load every transformed cycle under ``clean_dir``/cycles (or only ``cycles``)
+
+    Args:
+        connection: Open DictCursor connection; one is opened from DB_CONFIG
+            (and closed again) if omitted
+
+    Returns:
+        Dict of cycle suffix -> rows per table, or None for skipped cycles
+    """
+    cycle_dirs = find_cycle_dirs(clean_dir, cycles)
+
+    owns_connection = connection is None
+    if owns_connection:
+        connection = pymysql.connect(**DB_CONFIG)
+    dropped = []
+    started = time.perf_counter()
+    try:
+        if defer_indexes:
+            drop_secondary_indexes(connection, dropped)
+        results = {
+            path.name: load_cycle(connection, path, force, batch_rows)
+            for path in cycle_dirs
+        }
+    finally:
+        if defer_indexes:
+            restore_indexes(connection, dropped)
+        if owns_connection:
+            connection.close()
+
+    rows = sum(sum(r.values()) for r in results.values() if r)
+    elapsed = time.perf_counter() - started
+    print(f"Loaded {rows:,} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)")
+    return results
+
+
+def main():
+    """Parse arguments and load"""
+    parser = argparse.ArgumentParser(description="NHANES bulk loader")
+    parser.add_argument("--clean-dir", type=Path, default=CLEAN_DIR)
+    parser.add_argument(
+        "--cycle", action="append", help="only load these cycles (repeatable)"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="reload unchanged cycles too"
+    )
+    parser.add_argument(
+        "--defer-indexes",
+        action="store_true",
+        help="drop secondary indexes during the load and rebuild them after",
+    )
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    args = parser.parse_args()
+
+    load(
+        args.clean_dir,
+        args.cycle,
+        force=args.force,
+        defer_indexes=args.defer_indexes,
+        batch_rows=args.batch_rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
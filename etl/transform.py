@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+NHANES XPT to columnar transform.
+
+Reads the raw XPT files (``data/raw``) in fixed-size chunks, keeping only the
+columns each output needs, and writes one directory of typed Arrow IPC files
+per cycle (``data/clean/cycles/<suffix>/``), read by ``etl/loader.py`` and
+by analytics through ``etl.clean_store``:
+
+    users.arrow          SEQN, BirthDate, Sex, RaceEthnicity
+    sessions.arrow       SEQN, SessionDate, FastingStatus
+    measurements.arrow   SEQN, SessionDate, BiomarkerID, Value, TakenAt
+    anthropometry.arrow  SEQN, ExamDate, HeightCM, WeightKG, BMI
+    manifest.json        source file hashes, fingerprint, files and row counts
+
+With ``--csv`` a CSV copy of each table is written alongside. Each file is
+written once, in its final layout. Only per-participant lookups
+(exam date, fasting status) are held in memory, so memory is bounded by the
+chunk size rather than by the file sizes. A cycle whose source files (and
+transform version) are unchanged since its manifest was written is skipped.
+
+Usage:
+    python etl/transform.py                    # cycle J (2017-2018)
+    python etl/transform.py --cycle I --cycle J
+    python etl/transform.py --force            # ignore existing manifests
+    python etl/transform.py --csv              # also write CSV copies
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyreadstat
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from etl.clean_store import FORMATS, SCHEMAS, TableOutput
+from etl.cycles import CYCLES, NhanesCycle, get_cycles
+from etl.download_nhanes import file_sha256
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+RAW_DIR = PROJECT_ROOT / "data" / "raw"
+CLEAN_DIR = PROJECT_ROOT / "data" / "clean"
+MANIFEST = "manifest.json"
+
+CHUNK_ROWS = 50_000
+
+# Bump when the output of the transform changes, so every cycle is redone
+TRANSFORM_VERSION = 2
+
+SEX_CODES = {1: "M", 2: "F"}
+RACE_CODES = {
+    1: "Mexican American",
+    2: "Other Hispanic",
+    3: "Non-Hispanic White",
+    4: "Non-Hispanic Black",
+    6: "Non-Hispanic Asian",  # 5 is not used by RIDRETH3
+    7: "Other Race - Including Multi-Racial",
+}
+
+FASTING_THRESHOLD_HOURS = 8
+
+ANTHROPOMETRY_COLUMNS = {"BMXHT": "HeightCM", "BMXWT": "WeightKG", "BMXBMI": "BMI"}
+
+
+# ---- reading ----
+
+
+def xpt_path(raw_dir: Path, stem: str, cycle: NhanesCycle) -> Path:
+    """Path of e.g. DEMO_J.XPT, or None if it was not downloaded"""
+    name = cycle.file_name(stem)
+    for candidate in (name, name[:-4] + ".xpt"):
+        if (raw_dir / candidate).exists():
+            return raw_dir / candidate
+    return None
+
+
+def read_xpt_chunks(path: Path, columns, chunk_rows: int = CHUNK_ROWS):
+    """
+    Yield DataFrames of at most ``chunk_rows`` rows holding only ``columns``
+
+    Columns missing from the file are reported and skipped; SEQN is always
+    read and cast to int.
+    """
+    _, meta = pyreadstat.read_xport(str(path), metadataonly=True)
+    wanted = ["SEQN"] + [column for column in columns if column != "SEQN"]
+    usecols = [column for column in wanted if column in meta.column_names]
+    missing = set(wanted) - set(usecols)
+    if missing:
+        print(f"[WARNING] {path.name}: columns not found, ignored: {sorted(missing)}")
+    if "SEQN" not in usecols:
+        print(f"[WARNING] {path.name}: no SEQN column, skipped")
+        return
+
+    for chunk, _ in pyreadstat.read_file_in_chunks(
+        pyreadstat.read_xport, str(path), chunksize=chunk_rows, usecols=usecols
+    ):
+        chunk = chunk.dropna(subset=["SEQN"])
+        chunk["SEQN"] = chunk["SEQN"].astype(np.int64)
+        yield chunk
+
+
+# ---- transforms (one chunk at a time) ----
+
+
+def exam_dates(exam_period: pd.Series, year: int) -> np.ndarray:
+    """
+    Map RIDEXMON (1 = Nov-Apr, 2 = May-Oct) to a representative exam date
+
+    Nov-Apr is represented as mid-January and May-Oct as mid-July of the
+    later cycle year; unknown periods fall back to January 1st.
+    """
+    return np.select(
+        [exam_period == 1, exam_period == 2],
+        [np.datetime64(f"{year}-01-15"), np.datetime64(f"{year}-07-15")],
+        default=np.datetime64(f"{year}-01-01"),
+    )
+
+
+def transform_demographics(chunk: pd.DataFrame, year: int) -> pd.DataFrame:
+    """DEMO rows -> users rows (age at screening becomes a mid-year BirthDate)"""
+    users = pd.DataFrame(
+        {
+            "SEQN": chunk["SEQN"],
+            "Age": chunk["RIDAGEYR"],
+            "Sex": chunk["RIAGENDR"].map(SEX_CODES),
+            "RaceEthnicity": chunk["RIDRETH3"].map(RACE_CODES),
+        }
+    ).dropna(subset=["Age", "Sex", "RaceEthnicity"])
+    users["BirthDate"] = pd.to_datetime(
+        (year - users["Age"].astype(int)).astype(str) + "-07-01", format="%Y-%m-%d"
+    )
+    return users[SCHEMAS["users"].names]
+
+
+def fasting_flags(chunk: pd.DataFrame) -> pd.Series:
+    """FASTQX rows -> 1/0 fasted flag per SEQN (missing components count as 0)"""
+    hours = chunk.get("PHAFSTHR", pd.Series(0.0, index=chunk.index)).fillna(0)
+    minutes = chunk.get("PHAFSTMN", pd.Series(0.0, index=chunk.index)).fillna(0)
+    fasted = (hours + minutes / 60.0 >= FASTING_THRESHOLD_HOURS).astype(int)
+    return pd.Series(fasted.to_numpy(), index=chunk["SEQN"].to_numpy())
+
+
+def transform_sessions(users: pd.DataFrame, dates: pd.Series, fasting: pd.Series):
+    """One session per user, on the user's exam date"""
+    seqn = users["SEQN"]
+    return pd.DataFrame(
+        {
+            "SEQN": seqn,
+            "SessionDate": seqn.map(dates).to_numpy(),
+            "FastingStatus": seqn.map(fasting).fillna(0).astype(int).to_numpy(),
+        }
+    )
+
+
+def transform_labs(chunk: pd.DataFrame, variables: dict, dates: pd.Series, default):
+    """Wide lab rows -> long measurements rows, dropping missing values"""
+    present = [variable for variable in variables if variable in chunk.columns]
+    long = chunk.melt(
+        id_vars=["SEQN"], value_vars=present, var_name="Variable", value_name="Value"
+    ).dropna(subset=["Value"])
+    taken_at = long["SEQN"].map(dates).fillna(default)
+    return pd.DataFrame(
+        {
+            "SEQN": long["SEQN"],
+            "SessionDate": taken_at,
+            "BiomarkerID": long["Variable"].map(variables).astype(int),
+            "Value": long["Value"],
+            "TakenAt": taken_at,
+        }
+    )
+
+
+def transform_anthropometry(chunk: pd.DataFrame, dates: pd.Series, default):
+    """BMX rows -> anthropometry rows"""
+    anthropometry = chunk.rename(columns=ANTHROPOMETRY_COLUMNS)
+    anthropometry["ExamDate"] = anthropometry["SEQN"].map(dates).fillna(default)
+    return anthropometry.reindex(columns=SCHEMAS["anthropometry"].names)
+
+
+# ---- reporting ----
+
+
+def report(output: TableOutput) -> None:
+    """Print the row count and throughput of one output table"""
+    rate = output.rows / output.seconds if output.seconds else float("inf")
+    print(
+        f"✓ {output.name:<14} {output.rows:>10,} rows "
+        f"in {output.seconds:6.2f}s ({rate:,.0f} rows/s)"
+    )
+
+
+# ---- pipeline ----
+
+
+def source_hashes(cycle: NhanesCycle, raw_dir: Path) -> dict:
+    """SHA-256 of each of the cycle's XPT files that is present"""
+    hashes = {}
+    for stem in cycle.file_stems:
+        path = xpt_path(raw_dir, stem, cycle)
+        if path is not None:
+            hashes[path.name] = file_sha256(path)
+    return hashes
+
+
+def cycle_fingerprint(cycle: NhanesCycle, sources: dict) -> str:
+    """Identify a cycle's inputs: source hashes, variable mapping and version"""
+    payload = json.dumps(
+        {
+            "version": TRANSFORM_VERSION,
+            "labFiles": cycle.lab_files,
+            "sources": sources,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def read_manifest(out_dir: Path):
+    """The cycle's manifest.json, or None if missing/unreadable"""
+    try:
+        return json.loads((out_dir / MANIFEST).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def is_current(out_dir: Path, fingerprint: str, formats=("arrow",)) -> bool:
+    """True if out_dir holds complete output for this fingerprint and formats"""
+    manifest = read_manifest(out_dir)
+    expected = [f"{name}{FORMATS[fmt]}" for name in SCHEMAS for fmt in formats]
+    return (
+        manifest is not None
+        and manifest.get("fingerprint") == fingerprint
+        and set(expected) <= set(manifest.get("files", []))
+        and all((out_dir / name).exists() for name in expected)
+    )
+
+
+def transform_cycle(
+    cycle: NhanesCycle, raw_dir: Path, outputs: dict, chunk_rows: int
+) -> bool:
+    """Stream one cycle's XPT files into its outputs; False if DEMO is missing"""
+    year = cycle.exam_year
+    default_date = pd.Timestamp(f"{year}-01-01")
+
+    demo = xpt_path(raw_dir, "DEMO", cycle)
+    if demo is None:
+        return False
+
+    # Demographics: users, plus the per-participant exam dates
+    dates, users = [], []
+    started = time.perf_counter()
+    for chunk in read_xpt_chunks(
+        demo, ["RIDAGEYR", "RIAGENDR", "RIDRETH3", "RIDEXMON"], chunk_rows
+    ):
+        period = chunk.get("RIDEXMON", pd.Series(np.nan, index=chunk.index))
+        dates.append(pd.Series(exam_dates(period, year), index=chunk["SEQN"]))
+        chunk_users = transform_demographics(chunk, year)
+        users.append(chunk_users[["SEQN"]])
+        outputs["users"].write(chunk_users, started)
+        started = time.perf_counter()
+    dates = pd.concat(dates) if dates else pd.Series(dtype="datetime64[ns]")
+    users = pd.concat(users) if users else pd.DataFrame({"SEQN": []})
+
+    # Fasting questionnaire + users: sessions
+    fasting = [pd.Series(dtype=int)]
+    started = time.perf_counter()
+    fastqx = xpt_path(raw_dir, "FASTQX", cycle)
+    if fastqx is None:
+        print(f"[WARNING] {cycle.file_name('FASTQX')} not found, FastingStatus = 0")
+    else:
+        for chunk in read_xpt_chunks(fastqx, ["PHAFSTHR", "PHAFSTMN"], chunk_rows):
+            fasting.append(fasting_flags(chunk))
+    fasting = pd.concat(fasting)
+    fasting = fasting[~fasting.index.duplicated()]
+    outputs["sessions"].write(transform_sessions(users, dates, fasting), started)
+
+    # Lab files: measurements
+    for stem, variables in cycle.lab_files.items():
+        path = xpt_path(raw_dir, stem, cycle)
+        if path is None:
+            print(f"[WARNING] {cycle.file_name(stem)} not found, skipped")
+            continue
+        started = time.perf_counter()
+        for chunk in read_xpt_chunks(path, list(variables), chunk_rows):
+            outputs["measurements"].write(
+                transform_labs(chunk, variables, dates, default_date), started
+            )
+            started = time.perf_counter()
+
+    # Body measures: anthropometry
+    bmx = xpt_path(raw_dir, "BMX", cycle)
+    if bmx is None:
+        print(f"[WARNING] {cycle.file_name('BMX')} not found, skipped")
+        return True
+    started = time.perf_counter()
+    for chunk in read_xpt_chunks(bmx, list(ANTHROPOMETRY_COLUMNS), chunk_rows):
+        outputs["anthropometry"].write(
+            transform_anthropometry(chunk, dates, default_date), started
+        )
+        started = time.perf_counter()
+    return True
+
+
+def transform(
+    cycles=None,
+    raw_dir: Path = RAW_DIR,
+    clean_dir: Path = CLEAN_DIR,
+    chunk_rows: int = CHUNK_ROWS,
+    force: bool = False,
+    formats=("arrow",),
+):
+    """
+    Transform the given NHANES cycles (suffixes) into per-cycle directories
+
+    ``formats`` selects the files written per table: "arrow" (the default,
+    read by the loader and analytics) and/or "csv".
+
+    Returns:
+        Dict of cycle suffix -> manifest (rows per output), or None if the
+        cycle was skipped because its DEMO file is missing
+    """
+    raw_dir = Path(raw_dir)
+    results = {}
+    for cycle in get_cycles(cycles):
+        out_dir = Path(clean_dir) / "cycles" / cycle.suffix
+        sources = source_hashes(cycle, raw_dir)
+        fingerprint = cycle_fingerprint(cycle, sources)
+        if not force and is_current(out_dir, fingerprint, formats):
+            print(f"✓ cycle {cycle.suffix} ({cycle.label}) unchanged, skipped")
+            results[cycle.suffix] = read_manifest(out_dir)
+            continue
+
+        print(f"Transforming cycle {cycle.suffix} ({cycle.label}) ...")
+        out_dir.mkdir(parents=True, exist_ok=True)
+        outputs = {name: TableOutput(out_dir, name, formats) for name in SCHEMAS}
+        try:
+            found = transform_cycle(cycle, raw_dir, outputs, chunk_rows)
+        except BaseException:
+            found = None
+            raise
+        finally:
+            if not found:  # failed or no DEMO file: leave no partial output
+                for output in outputs.values():
+                    output.abort()
+        if not found:
+            print(f"[WARNING] {cycle.file_name('DEMO')} not found, cycle skipped")
+            results[cycle.suffix] = None
+            continue
+
+        for output in outputs.values():
+            output.close()
+            report(output)
+        manifest = {
+            "cycle": cycle.suffix,
+            "label": cycle.label,
+            "fingerprint": fingerprint,
+            "sources": sources,
+            "files": [name for output in outputs.values() for name in output.files],
+            "rows": {name: output.rows for name, output in outputs.items()},
+            "transformedAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        (out_dir / MANIFEST).write_text(json.dumps(manifest, indent=2))
+        results[cycle.suffix] = manifest
+    return results
+
+
+def main():
+    """Parse arguments and run the transform"""
+    parser = argparse.ArgumentParser(description="NHANES XPT -> Arrow transform")
+    parser.add_argument(
+        "--cycle",
+        action="append",
+        choices=sorted(CYCLES),
+        help="NHANES cycle suffix (repeatable, default: J)",
+    )
+    parser.add_argument("--raw-dir", type=Path, default=RAW_DIR)
+    parser.add_argument("--clean-dir", type=Path, default=CLEAN_DIR)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--force", action="store_true", help="ignore manifests")
+    parser.add_argument(
+        "--csv", action="store_true", help="also write CSV copies of every table"
+    )
+    args = parser.parse_args()
+
+    formats = ("arrow", "csv") if args.csv else ("arrow",)
+    started = time.perf_counter()
+    transform(
+        args.cycle, args.raw_dir, args.clean_dir, args.chunk_rows, args.force, formats
+    )
+    print(f"\nTransform complete in {time.perf_counter() - started:.2f}s")
+    print(f"Clean tables written to: {args.clean_dir / 'cycles'}")
+
+
+if __name__ == "__main__":
+    main()
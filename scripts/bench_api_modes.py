@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark the API in sync and async mode.
+
+Starts one uvicorn worker per mode (API_ASYNC=0 and API_ASYNC=1) against the
+database configured in .env, fires the same concurrent request mix at each and
+prints throughput and latency percentiles side by side.
+
+Usage:
+    python scripts/bench_api_modes.py --requests 2000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_PATHS = [
+    "/api/v1/biomarkers",
+    "/api/v1/users/{user_id}/profile",
+    "/api/v1/users/{user_id}/sessions",
+    "/api/v1/users/{user_id}/bio-age/history",
+]
+
+
+def start_server(async_mode: bool, port: int) -> subprocess.Popen:
+    """Launch a single uvicorn worker in the requested mode"""
+    env = dict(os.environ, API_ASYNC="1" if async_mode else "0", DISABLE_HD="1")
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            "1",
+            "--log-level",
+            "warning",
+        ],
+        cwd=REPO_ROOT / "src" / "api",
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/").status_code == 200:
+                return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"API did not start on port {port}")
+
+
+async def run_load(base_url: str, paths, total: int, concurrency: int):
+    """Issue ``total`` requests with ``concurrency`` in flight; return latencies"""
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                started = time.perf_counter()
+                response = await client.get(paths[i % len(paths)])
+                latencies.append(time.perf_counter() - started)
+                if response.status_code >= 500:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return np.array(latencies), elapsed, errors
+
+
+def report(mode: str, latencies: np.ndarray, elapsed: float, errors: int) -> None:
+    """Print one result row"""
+    p50, p95, p99 = np.percentile(latencies * 1000, [50, 95, 99])
+    print(
+        f"{mode:<6} {len(latencies) / elapsed:>10.1f} {p50:>9.1f} {p95:>9.1f} "
+        f"{p99:>9.1f} {errors:>7}"
+    )
+
+
+def main():
+    """Benchmark both modes and print a comparison table"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    paths = [path.format(user_id=args.user_id) for path in DEFAULT_PATHS]
+
+    print(
+        f"{'mode':<6} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'5xx':>7}"
+    )
+    for mode, async_mode in (("sync", False), ("async", True)):
+        server = start_server(async_mode, args.port)
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            # warm up pools before measuring
+            asyncio.run(run_load(base_url, paths, args.concurrency, args.concurrency))
+            report(
+                mode,
+                *asyncio.run(
+                    run_load(base_url, paths, args.requests, args.concurrency)
+                ),
+            )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark HD scoring throughput and peak memory.
+
+Fits HomeostasisDysregulation on a synthetic reference population, then
+scores 10k, 1M and 10M rows with the chunked whitening core
+(``HomeostasisDysregulation.score``) and with the previous formula
+(z-score, ``z @ cov_inv * z``) for comparison.
+
+Usage:
+    python scripts/bench_hd_scoring.py
+    python scripts/bench_hd_scoring.py --rows 10000 1000000 --legacy-max 1000000
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.analytics.hd import HomeostasisDysregulation
+
+N_BIOMARKERS = 9
+
+
+def fit_model(rng) -> HomeostasisDysregulation:
+    """Fit HD on a correlated synthetic reference population"""
+    names = [f"B{i}" for i in range(N_BIOMARKERS)]
+    mixing = rng.normal(size=(N_BIOMARKERS, N_BIOMARKERS))
+    reference = pd.DataFrame(
+        rng.normal(size=(2000, N_BIOMARKERS)) @ mixing + 50, columns=names
+    )
+    return HomeostasisDysregulation().fit_reference_population(reference, names)
+
+
+def legacy_scores(hd_model, values):
+    """Previous scoring path: full z-score and (z @ cov_inv) * z temporaries"""
+    z = (values - hd_model.reference_means_.values) / hd_model.reference_stds_.values
+    return np.sqrt(np.sum(z @ hd_model.reference_cov_inv_ * z, axis=1))
+
+
+def measure(fn, *args):
+    """Return (seconds, peak traced MB) for one call"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    """Print rows/s and peak temporary memory for each size"""
+    parser = argparse.ArgumentParser(description="HD scoring benchmark")
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000]
+    )
+    parser.add_argument(
+        "--legacy-max",
+        type=int,
+        default=1_000_000,
+        help="skip the legacy path above this many rows",
+    )
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    hd_model = fit_model(rng)
+
+    print(f"\n{'rows':>12} {'path':<8} {'rows/s':>14} {'seconds':>9} {'peak MB':>9}")
+    for n in args.rows:
+        values = rng.normal(50, 10, size=(n, N_BIOMARKERS))
+        out = np.empty(n)
+        hd_model.score(values[:1000], out=out[:1000])  # warm up
+
+        elapsed, peak = measure(hd_model.score, values, out)
+        print(
+            f"{n:>12,} {'core':<8} {n / elapsed:>14,.0f} {elapsed:>9.3f} {peak:>9.1f}"
+        )
+
+        if n <= args.legacy_max:
+            elapsed, peak = measure(legacy_scores, hd_model, values)
+            print(
+                f"{n:>12,} {'legacy':<8} {n / elapsed:>14,.0f} {elapsed:>9.3f} {peak:>9.1f}"
+            )
+            np.testing.assert_allclose(out, legacy_scores(hd_model, values), rtol=1e-8)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark single-subject HD scoring.
+
+Compares calls per second of the original per-request path (Python lists,
+pandas Series z-scoring, quadratic form) with
+``HomeostasisDysregulation.score_one`` for dict and pre-ordered inputs.
+
+Usage:
+    python scripts/bench_hd_single.py --calls 100000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.analytics.hd import HomeostasisDysregulation
+
+BIOMARKER_NAMES = [
+    "Albumin",
+    "Alkaline Phosphatase",
+    "Creatinine",
+    "Fasting Glucose",
+    "High-Sensitivity CRP",
+    "White Blood Cell Count",
+    "Lymphocyte Percentage",
+    "Mean Corpuscular Volume",
+    "Red Cell Distribution Width",
+]
+MEANS = np.array([4.2, 80, 0.9, 5.3, 1.5, 6.5, 30, 90, 13])
+
+
+def legacy_calculate_hd(hd_model, individual_biomarkers):
+    """The per-call path ``calculate_hd`` used before the precompiled scorer"""
+    biomarker_values = []
+    for name in hd_model.biomarker_names_:
+        if name in individual_biomarkers:
+            biomarker_values.append(individual_biomarkers[name])
+        else:
+            raise ValueError(f"Missing biomarker: {name}")
+    values = np.array(biomarker_values)
+    z_scores = (
+        values - hd_model.reference_means_.values
+    ) / hd_model.reference_stds_.values
+    z_scores = z_scores.reshape(1, -1)
+    return np.sqrt(np.sum(z_scores @ hd_model.reference_cov_inv_ * z_scores, axis=1))[0]
+
+
+def calls_per_second(fn, arg, calls):
+    """Best-of-3 calls/s for ``fn(arg)``"""
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(calls):
+            fn(arg)
+        best = min(best, time.perf_counter() - started)
+    return calls / best
+
+
+def main():
+    """Fit a synthetic model and print calls/s for each path"""
+    parser = argparse.ArgumentParser(description="Single-subject HD benchmark")
+    parser.add_argument("--calls", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    reference = pd.DataFrame(
+        np.abs(rng.normal(MEANS, MEANS * 0.15, size=(500, 9))), columns=BIOMARKER_NAMES
+    )
+    hd_model = HomeostasisDysregulation().fit_reference_population(
+        reference, BIOMARKER_NAMES
+    )
+    individual = dict(zip(BIOMARKER_NAMES, (MEANS * 1.1).tolist()))
+    ordered = [individual[name] for name in hd_model.biomarker_names_]
+
+    assert np.isclose(
+        legacy_calculate_hd(hd_model, individual), hd_model.score_one(individual)
+    )
+
+    rows = [
+        ("legacy calculate_hd", lambda b: legacy_calculate_hd(hd_model, b), individual),
+        ("calculate_hd", hd_model.calculate_hd, individual),
+        ("score_one(dict)", hd_model.score_one, individual),
+        ("score_one(sequence)", hd_model.score_one, ordered),
+    ]
+    baseline = None
+    print(f"\n{'path':<22} {'calls/s':>12} {'µs/call':>9} {'speed-up':>9}")
+    for label, fn, arg in rows:
+        rate = calls_per_second(fn, arg, args.calls)
+        baseline = baseline or rate
+        print(f"{label:<22} {rate:>12,.0f} {1e6 / rate:>9.2f} {rate / baseline:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Benchmark UserLatestMeasurement against the v_user_latest_measurements view.
+
+Tops the database up with synthetic users (SEQN >= 8000000) until Measurement
+holds at least ``--measurements`` rows, rebuilds the table, then times the
+per-user profile lookup and the cohort scan both ways.
+
+Usage:
+    python scripts/bench_latest_measurements.py --measurements 1000000
+    python scripts/bench_latest_measurements.py --cleanup
+"""
+
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pymysql
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts.check_latest_measurements import DB_CONFIG, check, rebuild, report
+from scripts.synthetic_data import BIOMARKER_MEANS, SYNTHETIC_SEQN_START, cleanup
+from src.api import queries
+
+SESSIONS_PER_USER = 6
+BATCH_SIZE = 5000
+
+VIEW_USER_LATEST = """
+SELECT BiomarkerID AS biomarkerId, BiomarkerName AS name, Value AS value,
+       Units AS units, TakenAt AS takenAt
+FROM v_user_latest_measurements
+WHERE UserID = %s
+ORDER BY BiomarkerID
+"""
+
+VIEW_COHORT_LATEST = """
+SELECT view_measurements.UserID,
+       TIMESTAMPDIFF(YEAR, User.BirthDate, CURDATE()) AS Age,
+       view_measurements.BiomarkerID, view_measurements.BiomarkerName,
+       view_measurements.Value
+FROM v_user_latest_measurements view_measurements
+JOIN User ON User.UserID = view_measurements.UserID
+WHERE view_measurements.BiomarkerID BETWEEN 1 AND 9
+"""
+
+
+def count_measurements(cursor) -> int:
+    """Total rows in Measurement"""
+    cursor.execute("SELECT COUNT(*) AS n FROM Measurement")
+    return cursor.fetchone()["n"]
+
+
+def generate(connection, n_measurements: int, seed: int = 0) -> None:
+    """Insert synthetic users/sessions/measurements totalling ``n_measurements``"""
+    rng = np.random.default_rng(seed)
+    n_users = -(-n_measurements // (SESSIONS_PER_USER * 9))
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COALESCE(MAX(SEQN), 0) AS s FROM User")
+        first_seqn = max(SYNTHETIC_SEQN_START, cursor.fetchone()["s"] + 1)
+
+        birth_years = rng.integers(1940, 2000, n_users)
+        cursor.executemany(
+            "INSERT INTO User (SEQN, BirthDate, Sex, RaceEthnicity) VALUES (%s, %s, %s, %s)",
+            [
+                (first_seqn + i, f"{birth_years[i]}-07-01", "MF"[i % 2], "Synthetic")
+                for i in range(n_users)
+            ],
+        )
+        cursor.execute(
+            "SELECT UserID FROM User WHERE SEQN >= %s ORDER BY SEQN", (first_seqn,)
+        )
+        user_ids = [row["UserID"] for row in cursor.fetchall()]
+
+        session_dates = [
+            date(2018, 1, 15) + timedelta(days=180 * k)
+            for k in range(SESSIONS_PER_USER)
+        ]
+        for start in range(0, len(user_ids), BATCH_SIZE):
+            batch = user_ids[start : start + BATCH_SIZE]
+            cursor.executemany(
+                "INSERT INTO MeasurementSession (UserID, SessionDate, FastingStatus) VALUES (%s, %s, 1)",
+                [(u, d) for u in batch for d in session_dates],
+            )
+            cursor.execute(
+                "SELECT SessionID, SessionDate FROM MeasurementSession "
+                "WHERE UserID BETWEEN %s AND %s",
+                (batch[0], batch[-1]),
+            )
+            sessions = cursor.fetchall()
+            values = np.abs(
+                rng.normal(BIOMARKER_MEANS, BIOMARKER_MEANS * 0.15, (len(sessions), 9))
+            ).round(4)
+            cursor.executemany(
+                "INSERT INTO Measurement (SessionID, BiomarkerID, Value, TakenAt) VALUES (%s, %s, %s, %s)",
+                [
+                    (
+                        s["SessionID"],
+                        b + 1,
+                        float(values[i, b]),
+                        f"{s['SessionDate']} 09:00:00",
+                    )
+                    for i, s in enumerate(sessions)
+                    for b in range(9)
+                ],
+            )
+            connection.commit()
+            print(
+                f"  generated {start + len(batch):,}/{len(user_ids):,} users", end="\r"
+            )
+    print()
+
+
+def time_query(cursor, query, params_list):
+    """Run ``query`` once per params tuple; return latencies in ms"""
+    latencies = []
+    for params in params_list:
+        started = time.perf_counter()
+        cursor.execute(query, params)
+        cursor.fetchall()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return np.array(latencies)
+
+
+def main():
+    """Prepare data, then print view vs table timings"""
+    parser = argparse.ArgumentParser(description="Latest-measurement benchmark")
+    parser.add_argument("--measurements", type=int, default=1_000_000)
+    parser.add_argument("--sample-users", type=int, default=100)
+    parser.add_argument("--cleanup", action="store_true", help="remove synthetic data")
+    args = parser.parse_args()
+
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        if args.cleanup:
+            cleanup(connection)
+            rebuild(connection)
+            return
+
+        with connection.cursor() as cursor:
+            missing = args.measurements - count_measurements(cursor)
+        if missing > 0:
+            print(f"Generating {missing:,} synthetic measurements ...")
+            generate(connection, missing)
+        print(f"✓ Rebuilt UserLatestMeasurement in {rebuild(connection):.2f}s")
+        report(*check(connection))
+
+        with connection.cursor() as cursor:
+            total = count_measurements(cursor)
+            cursor.execute(
+                "SELECT UserID FROM UserLatestMeasurement GROUP BY UserID "
+                "ORDER BY RAND() LIMIT %s",
+                (args.sample_users,),
+            )
+            users = [(row["UserID"],) for row in cursor.fetchall()]
+
+            print(f"\nMeasurement rows: {total:,}; sampled users: {len(users)}")
+            print(f"{'query':<28} {'p50 ms':>9} {'p95 ms':>9}")
+            for label, query, params in (
+                ("profile (view)", VIEW_USER_LATEST, users),
+                ("profile (table)", queries.USER_LATEST_BIOMARKERS, users),
+                ("cohort scan (view)", VIEW_COHORT_LATEST, [None] * 3),
+                ("cohort scan (table)", queries.COHORT_LATEST_BIOMARKERS, [None] * 3),
+            ):
+                latencies = time_query(cursor, query, params)
+                p50, p95 = np.percentile(latencies, [50, 95])
+                print(f"{label:<28} {p50:>9.1f} {p95:>9.1f}")
+        connection.rollback()
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Check (or rebuild) the UserLatestMeasurement table.
+
+Compares the maintained table with the v_user_latest_measurements view, which
+remains the reference definition, and reports users/biomarkers that are
+missing, stale or orphaned. Exits non-zero on any mismatch.
+
+Usage:
+    python scripts/check_latest_measurements.py            # check only
+    python scripts/check_latest_measurements.py --rebuild  # rebuild, then check
+    python scripts/check_latest_measurements.py --fix      # rebuild if inconsistent
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import pymysql
+from dotenv import load_dotenv
+
+load_dotenv()
+
+REBUILD_SQL = (
+    Path(__file__).resolve().parent.parent / "sql" / "rebuild_latest_measurements.sql"
+)
+
+DB_CONFIG = {
+    "host": os.getenv("MYSQL_HOST", "localhost"),
+    "port": int(os.getenv("MYSQL_PORT", 3307)),
+    "user": os.getenv("MYSQL_USER", "biomarker_user"),
+    "password": os.getenv("MYSQL_PASSWORD", "biomarker_pass"),
+    "database": os.getenv("MYSQL_DATABASE", "longevity"),
+    "charset": "utf8mb4",
+    "cursorclass": pymysql.cursors.DictCursor,
+    "autocommit": False,
+}
+
+VIEW_LATEST = """
+SELECT UserID, BiomarkerID, Value, TakenAt
+FROM v_user_latest_measurements
+"""
+
+TABLE_LATEST = """
+SELECT latest.UserID, latest.BiomarkerID, latest.Value, latest.TakenAt,
+       Measurement.MeasurementID IS NULL AS Orphaned
+FROM UserLatestMeasurement latest
+LEFT JOIN Measurement ON Measurement.MeasurementID = latest.MeasurementID
+"""
+
+
+def rebuild(connection) -> float:
+    """Run sql/rebuild_latest_measurements.sql; return elapsed seconds"""
+    statements = [
+        "\n".join(
+            line for line in chunk.splitlines() if not line.strip().startswith("--")
+        ).strip()
+        for chunk in REBUILD_SQL.read_text().split(";")
+    ]
+    started = time.perf_counter()
+    with connection.cursor() as cursor:
+        for statement in statements:
+            if statement:
+                cursor.execute(statement)
+    connection.commit()
+    return time.perf_counter() - started
+
+
+def compare(view_rows, table_rows):
+    """
+    Diff the view against the table
+
+    The view returns every row tied on MAX(TakenAt); the table holds exactly
+    one of them, so a table row is correct if it matches any tied view row.
+
+    Returns:
+        Dict with lists of (UserID, BiomarkerID) keys: missing, stale, extra
+    """
+    expected = {}
+    for row in view_rows:
+        key = (row["UserID"], row["BiomarkerID"])
+        expected.setdefault(key, set()).add((row["Value"], row["TakenAt"]))
+
+    actual = {(row["UserID"], row["BiomarkerID"]): row for row in table_rows}
+
+    stale = [
+        key
+        for key, row in actual.items()
+        if key in expected
+        and (row.get("Orphaned") or (row["Value"], row["TakenAt"]) not in expected[key])
+    ]
+    return {
+        "missing": sorted(expected.keys() - actual.keys()),
+        "stale": sorted(stale),
+        "extra": sorted(actual.keys() - expected.keys()),
+    }
+
+
+def check(connection):
+    """Read both sides and return the diff"""
+    with connection.cursor() as cursor:
+        cursor.execute(VIEW_LATEST)
+        view_rows = cursor.fetchall()
+        cursor.execute(TABLE_LATEST)
+        table_rows = cursor.fetchall()
+    connection.rollback()
+    return compare(view_rows, table_rows), len(table_rows)
+
+
+def report(diff, table_size) -> bool:
+    """Print the diff summary; return True if consistent"""
+    problems = sum(len(keys) for keys in diff.values())
+    if not problems:
+        print(f"✓ UserLatestMeasurement consistent ({table_size:,} rows)")
+        return True
+    for kind, keys in diff.items():
+        if keys:
+            sample = ", ".join(f"user {u}/biomarker {b}" for u, b in keys[:5])
+            print(f"✗ {len(keys):,} {kind}: {sample}{' ...' if len(keys) > 5 else ''}")
+    return False
+
+
+def main():
+    """Parse arguments, optionally rebuild, and check consistency"""
+    parser = argparse.ArgumentParser(description="UserLatestMeasurement checker")
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--rebuild", action="store_true", help="rebuild first")
+    action.add_argument("--fix", action="store_true", help="rebuild if inconsistent")
+    args = parser.parse_args()
+
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        if args.rebuild:
+            print(f"✓ Rebuilt UserLatestMeasurement in {rebuild(connection):.2f}s")
+        consistent = report(*check(connection))
+        if not consistent and args.fix:
+            print(f"✓ Rebuilt UserLatestMeasurement in {rebuild(connection):.2f}s")
+            consistent = report(*check(connection))
+    finally:
+        connection.close()
+
+    sys.exit(0 if consistent else 1)
+
+
+if __name__ == "__main__":
+    main()
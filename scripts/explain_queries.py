@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Query plan regression check for every statement the API issues.
+
+Generalizes ``explain_trend.py``. Each read/update statement in
+``src/api/queries.py`` is collected, both as written and as composed by the
+query builders in ``src/api/common.py`` (filters, keyset pages, series).
+Sample parameters are bound and ``EXPLAIN FORMAT=JSON`` is run against the
+seeded database. Each plan is summarized per table: access type, chosen
+index and rows examined, plus whether it needs a filesort or a temporary
+table.
+
+The summaries are compared with the checked-in baseline
+(``sql/query_plan_baseline.json``). The check fails when a statement
+regresses to a full table scan, loses its index, or starts to filesort or
+use a temporary table. Statements missing from the baseline also fail, so
+new queries get reviewed. Changes in row estimates or chosen index are only
+reported.
+
+Usage:
+    python scripts/explain_queries.py            # check against the baseline
+    python scripts/explain_queries.py --update   # (re)write the baseline
+    python scripts/explain_queries.py --verbose  # print every plan summary
+"""
+
+import argparse
+import json
+import os
+import re
+import string
+import sys
+from datetime import date, datetime
+from pathlib import Path
+
+import pymysql
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.api import queries
+from src.api.common import (
+    bio_age_history_query,
+    build_user_list_query,
+    multi_trend_query,
+    trend_query,
+)
+
+load_dotenv()
+
+BASELINE = Path(__file__).resolve().parent.parent / "sql" / "query_plan_baseline.json"
+
+DB_CONFIG = {
+    "host": os.getenv("MYSQL_HOST", "localhost"),
+    "port": int(os.getenv("MYSQL_PORT", 3307)),
+    "user": os.getenv("MYSQL_USER", "biomarker_user"),
+    "password": os.getenv("MYSQL_PASSWORD", "biomarker_pass"),
+    "database": os.getenv("MYSQL_DATABASE", "longevity"),
+    "charset": "utf8mb4",
+    "cursorclass": pymysql.cursors.DictCursor,
+}
+
+# INSERTs are single-row or multi-row VALUES writes with no access path to check
+EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH|UPDATE|DELETE)\b", re.IGNORECASE)
+
+# Template fields filled when a statement is explained as written
+TEMPLATE_FILLS = {"placeholders": "%s, %s"}
+
+SAMPLE_DATE = date(2017, 1, 1)
+SAMPLE_TIME = datetime(2030, 1, 1)
+
+# Report (not fail) when rows examined grow past both of these
+ROWS_GROWTH_FACTOR = 10
+ROWS_GROWTH_MIN = 1000
+
+
+# ---- statements ------------------------------------------------------------
+def sample_value(column: str):
+    """Sample value for a placeholder compared with ``column``"""
+    if column.endswith("Date"):
+        return SAMPLE_DATE
+    if column.endswith("At"):
+        return SAMPLE_TIME
+    if column == "Sex":
+        return "F"
+    if column == "RaceEthnicity":
+        return "Other"
+    return 1
+
+
+def sample_params(sql: str) -> list:
+    """Typed sample parameters for every ``%s`` in ``sql``"""
+    params = []
+    for match in re.finditer(r"%s", sql):
+        prefix = sql[: match.start()].rstrip()
+        if re.search(r"\bLIMIT$", prefix, re.IGNORECASE):
+            params.append(20)
+        elif re.search(r"\bINTERVAL$", prefix, re.IGNORECASE):
+            params.append(30)
+        else:
+            column = re.search(
+                r"(\w+)\s*(?:\bIN\b|[<>=!]+)?\s*[(,]?\s*(?:%s,\s*)*$", prefix
+            )
+            name = column.group(1) if column else ""
+            value = sample_value(name)
+            in_list = re.search(r"\bIN$", prefix, re.IGNORECASE)
+            params.append([value, value] if in_list else value)
+    return params
+
+
+def api_statements():
+    """
+    Every explainable statement the API issues, with sample parameters
+
+    Returns:
+        Dict of name -> (sql, params); composed variants are named
+        ``<QUERY>+<variant>``
+    """
+    statements = {}
+    for name, value in vars(queries).items():
+        if not name.isupper() or not isinstance(value, str):
+            continue
+        if not EXPLAINABLE.match(value):
+            continue
+        fields = {field for _, field, _, _ in string.Formatter().parse(value) if field}
+        sql = value.format(**{field: TEMPLATE_FILLS.get(field, "") for field in fields})
+        statements[name] = (sql, sample_params(sql))
+
+    # ---- statements composed by the handlers' query builders ---------------
+    composed = {
+        "LIST_USERS+page": build_user_list_query(after=0, limit=50),
+        "LIST_USERS+filters": build_user_list_query(
+            after=0, limit=50, sex="F", race="Other", min_age=30, max_age=60
+        ),
+        "BIOMARKER_TREND+latest": trend_query(1, 1, SAMPLE_DATE, 20),
+        "BIOMARKER_TREND+series": trend_query(1, 1, SAMPLE_DATE, 20, bucket="week"),
+        "MULTI_BIOMARKER_TREND+all": multi_trend_query(1, SAMPLE_DATE),
+        "MULTI_BIOMARKER_TREND+biomarkers": multi_trend_query(1, SAMPLE_DATE, [1, 2]),
+        "BIO_AGE_HISTORY+all": bio_age_history_query(1),
+        "BIO_AGE_HISTORY+model": bio_age_history_query(1, "Phenotypic Age"),
+        "BIO_AGE_HISTORY+page": bio_age_history_query(
+            1, limit=50, cursor="2:2030-01-01T00:00:00"
+        ),
+        "BIO_AGE_HISTORY+series": bio_age_history_query(1, bucket="week"),
+    }
+    for name, (sql, params) in composed.items():
+        statements[name] = (sql, list(params))
+    return statements
+
+
+# ---- plans -------------------------------------------------------------------
+def summarize_plan(plan: dict) -> dict:
+    """
+    Reduce an ``EXPLAIN FORMAT=JSON`` document to what the check compares
+
+    Returns:
+        {"tables": [{table, access, key, rows}], "filesort": bool,
+        "temporary": bool}, tables in plan order
+    """
+    summary = {"tables": [], "filesort": False, "temporary": False}
+
+    def walk(node):
+        if isinstance(node, list):
+            for item in node:
+                walk(item)
+            return
+        if not isinstance(node, dict):
+            return
+        if node.get("using_filesort"):
+            summary["filesort"] = True
+        if node.get("using_temporary_table"):
+            summary["temporary"] = True
+        table = node.get("table")
+        if isinstance(table, dict) and "table_name" in table:
+            summary["tables"].append(
+                {
+                    "table": table["table_name"],
+                    "access": table.get("access_type"),
+                    "key": table.get("key"),
+                    "rows": table.get("rows_examined_per_scan"),
+                }
+            )
+        for value in node.values():
+            walk(value)
+
+    walk(plan)
+    return summary
+
+
+def explain(connection, sql: str, params) -> dict:
+    """Run EXPLAIN FORMAT=JSON for one statement and summarize it"""
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN FORMAT=JSON " + sql.strip().rstrip(";"), params)
+        row = cursor.fetchone()
+    return summarize_plan(json.loads(row["EXPLAIN"]))
+
+
+# ---- comparison ----------------------------------------------------------------
+def compare(baseline: dict, current: dict):
+    """
+    Compare plan summaries with the baseline
+
+    Returns:
+        (failures, notes): lists of messages; failures are regressions
+    """
+    failures, notes = [], []
+    for name, plan in sorted(current.items()):
+        if name not in baseline:
+            failures.append(f"{name}: not in the baseline (review, then --update)")
+            continue
+        before = baseline[name]
+        for flag, label in (("filesort", "filesort"), ("temporary", "temporary table")):
+            if plan[flag] and not before[flag]:
+                failures.append(f"{name}: now uses a {label}")
+
+        old_tables = {}
+        for table in before["tables"]:
+            old_tables.setdefault(table["table"], []).append(table)
+        seen = {}
+        for table in plan["tables"]:
+            occurrence = seen.get(table["table"], 0)
+            seen[table["table"]] = occurrence + 1
+            candidates = old_tables.get(table["table"], [])
+            if occurrence >= len(candidates):
+                notes.append(f"{name}: new access to {table['table']}")
+                continue
+            old = candidates[occurrence]
+            where = f"{name}: {table['table']}"
+            if table["access"] == "ALL" and old["access"] != "ALL":
+                failures.append(
+                    f"{where} regressed to a full scan (was {old['access']})"
+                )
+            elif table["key"] is None and old["key"] is not None:
+                failures.append(f"{where} no longer uses an index (was {old['key']})")
+            elif table["key"] != old["key"]:
+                notes.append(f"{where} uses {table['key']} (was {old['key']})")
+            if (
+                table["rows"] is not None
+                and old["rows"] is not None
+                and table["rows"]
+                > max(old["rows"] * ROWS_GROWTH_FACTOR, ROWS_GROWTH_MIN)
+            ):
+                notes.append(
+                    f"{where} examines {table['rows']} rows (was {old['rows']})"
+                )
+
+    for name in sorted(set(baseline) - set(current)):
+        notes.append(f"{name}: no longer issued (drop it with --update)")
+    return failures, notes
+
+
+def main():
+    """Explain every statement, then check or update the baseline"""
+    parser = argparse.ArgumentParser(description="API query plan regression check")
+    parser.add_argument("--update", action="store_true", help="rewrite the baseline")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    connection = pymysql.connect(**DB_CONFIG)
+    current, errors = {}, []
+    try:
+        for name, (sql, params) in api_statements().items():
+            try:
+                current[name] = explain(connection, sql, params)
+            except pymysql.MySQLError as e:
+                errors.append(f"{name}: EXPLAIN failed: {e}")
+    finally:
+        connection.close()
+
+    if args.verbose:
+        for name, plan in sorted(current.items()):
+            tables = ", ".join(
+                f"{t['table']}:{t['access']}/{t['key']}/{t['rows']}"
+                for t in plan["tables"]
+            )
+            flags = "".join(
+                f" +{flag}" for flag in ("filesort", "temporary") if plan[flag]
+            )
+            print(f"  {name}: {tables}{flags}")
+
+    for error in errors:
+        print(f"✗ {error}")
+    if args.update:
+        args.baseline.write_text(json.dumps(current, indent=2, sort_keys=True) + "\n")
+        print(f"✓ Wrote {len(current)} plans to {args.baseline}")
+        sys.exit(1 if errors else 0)
+
+    if not args.baseline.exists():
+        print(f"✗ No baseline at {args.baseline}; run with --update and commit it")
+        sys.exit(2)
+    failures, notes = compare(json.loads(args.baseline.read_text()), current)
+    for note in notes:
+        print(f"  note: {note}")
+    for failure in failures:
+        print(f"✗ {failure}")
+    if not failures and not errors:
+        print(f"✓ {len(current)} query plans match the baseline")
+    sys.exit(1 if failures or errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Generate a synthetic population for load and scale testing.
+
+Biomarker panels are drawn from a multivariate normal fitted to the HD
+reference population (the same means and covariance the HD model uses, via
+``load_or_fit_hd_model``), so the nine biomarkers keep their real
+correlations. Each user gets a person-level baseline plus correlated
+session-to-session noise, an age drift per biomarker, and a few sessions
+spread months apart with matching anthropometry (height, weight, BMI).
+
+Users get SEQN >= 8000000 and RaceEthnicity 'Synthetic', like the
+latest-measurement benchmark. UserID/SessionID ranges are allocated up
+front, so rows are streamed with multi-row INSERTs and no read-back.
+UserLatestMeasurement is rebuilt once at the end.
+
+Usage:
+    python scripts/generate_population.py --measurements 1000000
+    python scripts/generate_population.py --measurements 10000000 --defer-indexes
+    python scripts/generate_population.py --cleanup
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pymysql
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from etl.loader import (
+    BATCH_ROWS,
+    TableStats,
+    batches,
+    drop_secondary_indexes,
+    restore_indexes,
+)
+from scripts.check_latest_measurements import DB_CONFIG, rebuild
+from scripts.synthetic_data import (
+    SYNTHETIC_SEQN_START,
+    cleanup,
+    draw_panels,
+    fallback_distribution,
+)
+from src.api.bio_age import GLUCOSE_COLUMN, N_BIOMARKERS, load_or_fit_hd_model
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+HD_MODEL_DIR = os.getenv("HD_MODEL_DIR", str(PROJECT_ROOT / "data" / "models"))
+
+SESSIONS_PER_USER = 6
+CHUNK_USERS = 10_000
+
+MIN_AGE, MAX_AGE = 20, 85
+FIRST_SESSION_FROM = date(2015, 1, 1)
+FIRST_SESSION_SPAN_DAYS = 5 * 365
+SESSION_GAP_DAYS = (90, 400)
+
+HEIGHT_CM = {"M": (176.0, 7.0), "F": (162.0, 6.5)}
+BMI_MEAN, BMI_SD, BMI_RANGE = 27.0, 5.0, (16.0, 50.0)
+BMI_DRIFT_PER_YEAR = 0.1
+
+INSERT_USERS = """
+INSERT INTO User (UserID, SEQN, BirthDate, Sex, RaceEthnicity)
+VALUES (%s, %s, %s, %s, 'Synthetic')
+"""
+INSERT_SESSIONS = """
+INSERT INTO MeasurementSession (SessionID, UserID, SessionDate, FastingStatus)
+VALUES (%s, %s, %s, %s)
+"""
+INSERT_MEASUREMENTS = """
+INSERT INTO Measurement (SessionID, BiomarkerID, Value, TakenAt)
+VALUES (%s, %s, %s, %s)
+"""
+INSERT_ANTHROPOMETRY = """
+INSERT INTO Anthropometry (UserID, ExamDate, HeightCM, WeightKG, BMI)
+VALUES (%s, %s, %s, %s, %s)
+"""
+NEXT_IDS = """
+SELECT
+    (SELECT COALESCE(MAX(UserID), 0) + 1 FROM User) AS userId,
+    (SELECT COALESCE(MAX(SessionID), 0) + 1 FROM MeasurementSession) AS sessionId,
+    (SELECT COALESCE(MAX(SEQN), 0) + 1 FROM User) AS seqn
+"""
+
+
+# ---- distributions ----------------------------------------------------------
+def reference_distribution(hd_model, biomarker_ids):
+    """
+    Means and covariance of the HD reference population in raw units
+
+    Args:
+        hd_model: Fitted ``HomeostasisDysregulation``
+        biomarker_ids: Dict of biomarker name -> BiomarkerID (1-9)
+
+    Returns:
+        (means, cov) in BiomarkerID order, glucose in mg/dL
+    """
+    order = [biomarker_ids[name] - 1 for name in hd_model.biomarker_names_]
+    stds = np.asarray(hd_model.reference_stds_, dtype=float)
+    # The model keeps the whitening of the z-scored covariance: Σz = (WᵀW)⁺
+    cov_z = np.linalg.pinv(hd_model.reference_cov_inv_)
+
+    means = np.empty(N_BIOMARKERS)
+    cov = np.empty((N_BIOMARKERS, N_BIOMARKERS))
+    means[order] = np.asarray(hd_model.reference_means_, dtype=float)
+    cov[np.ix_(order, order)] = cov_z * np.outer(stds, stds)
+
+    # HD is fitted on glucose in mmol/L; the database stores mg/dL
+    means[GLUCOSE_COLUMN] *= 18
+    cov[GLUCOSE_COLUMN, :] *= 18
+    cov[:, GLUCOSE_COLUMN] *= 18
+    return means, cov
+
+
+def session_schedule(rng, n_users: int, sessions_per_user: int):
+    """
+    Session count, first visit and visit gaps for ``n_users`` users
+
+    Returns:
+        (owners, day_offsets, first_ages): per-session user index and days
+        since FIRST_SESSION_FROM, and each user's age at the first session
+    """
+    counts = 1 + rng.poisson(sessions_per_user - 1, n_users)
+    owners = np.repeat(np.arange(n_users), counts)
+    gaps = rng.integers(*SESSION_GAP_DAYS, len(owners))
+    starts = np.cumsum(counts) - counts
+    gaps[starts] = rng.integers(0, FIRST_SESSION_SPAN_DAYS, n_users)
+    # Cumulative gaps, restarted at each user's first session
+    totals = np.cumsum(gaps)
+    day_offsets = totals - np.repeat(totals[starts] - gaps[starts], counts)
+    first_ages = rng.uniform(MIN_AGE, MAX_AGE, n_users)
+    return owners, day_offsets, first_ages
+
+
+def draw_anthropometry(rng, sexes, owners, years_since_first):
+    """
+    Height, weight and BMI per session
+
+    Returns:
+        (height_cm, weight_kg, bmi) arrays aligned with ``owners``
+    """
+    mean = np.array([HEIGHT_CM[s][0] for s in sexes])
+    sd = np.array([HEIGHT_CM[s][1] for s in sexes])
+    height = rng.normal(mean, sd)[owners]
+    bmi = rng.normal(BMI_MEAN, BMI_SD, len(sexes))[owners]
+    bmi += BMI_DRIFT_PER_YEAR * years_since_first + rng.normal(0, 0.5, len(owners))
+    bmi = np.clip(bmi, *BMI_RANGE)
+    weight = bmi * (height / 100) ** 2
+    return height, weight, bmi
+
+
+# ---- rows ------------------------------------------------------------------
+def population_chunk(rng, means, cov, n_users, sessions_per_user, first_ids):
+    """
+    Rows for one chunk of synthetic users
+
+    Args:
+        first_ids: Dict with the first free "userId", "sessionId" and "seqn";
+            advanced past the rows returned
+
+    Returns:
+        Dict of table -> list of row tuples for the INSERT_* statements
+    """
+    owners, day_offsets, first_ages = session_schedule(rng, n_users, sessions_per_user)
+    starts = np.flatnonzero(np.r_[True, np.diff(owners) != 0])
+    years_since_first = (day_offsets - day_offsets[starts][owners]) / 365.25
+    ages = first_ages[owners] + years_since_first
+    panels = draw_panels(rng, means, cov, owners, ages).round(4)
+    sexes = rng.choice(["M", "F"], n_users)
+    height, weight, bmi = draw_anthropometry(rng, sexes, owners, years_since_first)
+    fasting = rng.random(len(owners)) < 0.9
+
+    user_ids = first_ids["userId"] + np.arange(n_users)
+    session_ids = first_ids["sessionId"] + np.arange(len(owners))
+    session_dates = [FIRST_SESSION_FROM + timedelta(days=int(d)) for d in day_offsets]
+    first_dates = [session_dates[i] for i in starts]
+
+    rows = {
+        "User": [
+            (
+                int(user_ids[i]),
+                first_ids["seqn"] + i,
+                first_dates[i] - timedelta(days=int(first_ages[i] * 365.25)),
+                sexes[i],
+            )
+            for i in range(n_users)
+        ],
+        "MeasurementSession": [
+            (int(session_ids[k]), int(user_ids[owners[k]]), d, int(fasting[k]))
+            for k, d in enumerate(session_dates)
+        ],
+        "Measurement": [
+            (int(session_ids[k]), b + 1, float(panels[k, b]), f"{d} 09:00:00")
+            for k, d in enumerate(session_dates)
+            for b in range(N_BIOMARKERS)
+        ],
+        "Anthropometry": [
+            (
+                int(user_ids[owners[k]]),
+                d,
+                round(float(height[k]), 2),
+                round(float(weight[k]), 2),
+                round(float(bmi[k]), 2),
+            )
+            for k, d in enumerate(session_dates)
+        ],
+    }
+    first_ids["userId"] += n_users
+    first_ids["sessionId"] += len(owners)
+    first_ids["seqn"] += n_users
+    return rows
+
+
+# ---- loading ---------------------------------------------------------------
+def panel_distribution(connection, model_dir=HD_MODEL_DIR):
+    """Reference means/covariance from the HD model, or the fallback"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT BiomarkerID, Name FROM Biomarker WHERE BiomarkerID BETWEEN 1 AND 9"
+        )
+        biomarker_ids = {row["Name"]: row["BiomarkerID"] for row in cursor.fetchall()}
+    try:
+        hd_model = load_or_fit_hd_model(connection, model_dir)
+    except Exception as e:
+        print(f"[WARNING] could not load the HD model: {str(e)}")
+        hd_model = None
+    if hd_model is None:
+        print("[WARNING] no HD reference population; biomarkers drawn independently")
+        return fallback_distribution()
+    return reference_distribution(hd_model, biomarker_ids)
+
+
+def generate(
+    connection,
+    n_measurements: int,
+    sessions_per_user: int = SESSIONS_PER_USER,
+    seed: int = 0,
+    batch_rows: int = BATCH_ROWS,
+    defer_indexes: bool = False,
+):
+    """
+    Insert synthetic users until about ``n_measurements`` measurements exist
+
+    Returns:
+        Dict of table -> TableStats
+    """
+    rng = np.random.default_rng(seed)
+    means, cov = panel_distribution(connection)
+    n_users = -(-n_measurements // (sessions_per_user * N_BIOMARKERS))
+
+    with connection.cursor() as cursor:
+        cursor.execute(NEXT_IDS)
+        first_ids = cursor.fetchone()
+    first_ids["seqn"] = max(SYNTHETIC_SEQN_START, first_ids["seqn"])
+
+    statements = {
+        "User": INSERT_USERS,
+        "MeasurementSession": INSERT_SESSIONS,
+        "Measurement": INSERT_MEASUREMENTS,
+        "Anthropometry": INSERT_ANTHROPOMETRY,
+    }
+    stats = {table: TableStats(table) for table in statements}
+    dropped = []
+    try:
+        if defer_indexes:
+            drop_secondary_indexes(connection, dropped)
+        with connection.cursor() as cursor:
+            # IDs are allocated here and every row references its own chunk
+            cursor.execute("SET SESSION foreign_key_checks = 0")
+            for start in range(0, n_users, CHUNK_USERS):
+                chunk = population_chunk(
+                    rng,
+                    means,
+                    cov,
+                    min(CHUNK_USERS, n_users - start),
+                    sessions_per_user,
+                    first_ids,
+                )
+                for table, sql in statements.items():
+                    for batch in batches(chunk[table], batch_rows):
+                        # rewritten by PyMySQL into one multi-row INSERT
+                        cursor.executemany(sql, batch)
+                        stats[table].rows += len(batch)
+                connection.commit()
+                print(f"  generated {stats['User'].rows:,}/{n_users:,} users", end="\r")
+        print()
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SET SESSION foreign_key_checks = 1")
+        if defer_indexes:
+            restore_indexes(connection, dropped)
+    for table_stats in stats.values():
+        table_stats.stop()
+    return stats
+
+
+def main():
+    """Generate (or remove) the synthetic population"""
+    parser = argparse.ArgumentParser(description="Synthetic population generator")
+    parser.add_argument("--measurements", type=int, default=1_000_000)
+    parser.add_argument("--sessions-per-user", type=int, default=SESSIONS_PER_USER)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    parser.add_argument(
+        "--defer-indexes",
+        action="store_true",
+        help="drop secondary indexes during the load and rebuild them after",
+    )
+    parser.add_argument("--cleanup", action="store_true", help="remove synthetic data")
+    args = parser.parse_args()
+    if args.sessions_per_user < 1:
+        parser.error("--sessions-per-user must be at least 1")
+
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        if args.cleanup:
+            cleanup(connection)
+            print(f"✓ Rebuilt UserLatestMeasurement in {rebuild(connection):.2f}s")
+            return
+
+        print(f"Generating ~{args.measurements:,} synthetic measurements ...")
+        started = time.perf_counter()
+        stats = generate(
+            connection,
+            args.measurements,
+            args.sessions_per_user,
+            args.seed,
+            args.batch_rows,
+            args.defer_indexes,
+        )
+        print(f"✓ Rebuilt UserLatestMeasurement in {rebuild(connection):.2f}s")
+        rows = sum(table_stats.rows for table_stats in stats.values())
+        elapsed = time.perf_counter() - started
+        print(
+            f"✓ Loaded {rows:,} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)"
+        )
+        print("  Score them with: python scripts/recalculate_bio_age.py")
+    except pymysql.MySQLError as e:
+        connection.rollback()
+        print(f"✗ Generation failed: {e}")
+        sys.exit(1)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
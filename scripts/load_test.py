@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Replay a realistic endpoint mix against a running API.
+
+Users are sampled from the API itself (by default the synthetic population
+written by ``generate_population.py``). Requests are drawn from a weighted
+endpoint mix with Zipf-skewed user popularity, so a few users are hot, as in
+production and as the response cache expects. ``--writes`` adds new
+measurement sessions to the mix, which also invalidates cached reads. The
+sessions written are deleted from the database (``MYSQL_*`` settings, as for
+the other scripts) when the run ends, so runs can be repeated and the
+population's latest values are left as generated.
+
+Prints throughput plus p50/p90/p99/max latency, error count and cache hit
+rate per endpoint and overall, and optionally writes them as JSON to compare
+runs.
+
+Usage:
+    python scripts/load_test.py --requests 20000 --concurrency 100
+    python scripts/load_test.py --base-url http://127.0.0.1:8000 --writes
+    python scripts/load_test.py --race "" --json results.json
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+import numpy as np
+import pymysql
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts.check_latest_measurements import DB_CONFIG
+from scripts.synthetic_data import draw_panels, fallback_distribution
+
+# Trend ranges reach back past the first generated session (2015), since the
+# API's default of six months would mostly answer with a 404 or no points
+TREND_RANGE = "15years"
+
+# name -> (weight, method, path); {user_id} and {biomarker_id} are filled per request
+ENDPOINT_MIX = {
+    "profile": (30, "GET", "/api/v1/users/{user_id}/profile"),
+    "ranges": (15, "GET", "/api/v1/users/{user_id}/ranges"),
+    "bio-age": (15, "GET", "/api/v1/users/{user_id}/bio-age"),
+    "trend": (
+        10,
+        "GET",
+        "/api/v1/users/{user_id}/biomarkers/{biomarker_id}/trend?range=" + TREND_RANGE,
+    ),
+    "trends": (10, "GET", "/api/v1/users/{user_id}/trends?range=" + TREND_RANGE),
+    "history": (10, "GET", "/api/v1/users/{user_id}/bio-age/history?limit=50"),
+    "sessions": (5, "GET", "/api/v1/users/{user_id}/sessions"),
+    "biomarkers": (5, "GET", "/api/v1/biomarkers"),
+}
+WRITE_MIX = {
+    "measurement": (2, "POST", "/api/v1/users/{user_id}/measurements"),
+}
+ZIPF_EXPONENT = 1.1
+PERCENTILES = (50, 90, 99)
+# Written sessions are dated after any generated one, one day apart, and
+# removed again after the run
+WRITE_DATES_FROM = date(2040, 1, 1)
+
+WRITTEN_USERS = """
+SELECT DISTINCT UserID FROM MeasurementSession WHERE SessionID IN ({placeholders})
+"""
+# Measurements and the latest rows pointing at them cascade
+DELETE_WRITTEN_SESSIONS = """
+DELETE FROM MeasurementSession WHERE SessionID IN ({placeholders})
+"""
+DELETE_USERS_LATEST = """
+DELETE FROM UserLatestMeasurement WHERE UserID IN ({placeholders})
+"""
+INSERT_USERS_LATEST = """
+INSERT INTO UserLatestMeasurement (UserID, BiomarkerID, MeasurementID, Value, TakenAt)
+SELECT UserID, BiomarkerID, MeasurementID, Value, TakenAt
+FROM (
+    SELECT s.UserID, m.BiomarkerID, m.MeasurementID, m.Value, m.TakenAt,
+           ROW_NUMBER() OVER (
+               PARTITION BY s.UserID, m.BiomarkerID
+               ORDER BY m.TakenAt DESC, m.MeasurementID DESC
+           ) AS RowNumber
+    FROM Measurement m
+    JOIN MeasurementSession s ON m.SessionID = s.SessionID
+    WHERE s.UserID IN ({placeholders})
+) ranked
+WHERE RowNumber = 1
+"""
+
+
+def build_schedule(rng, mix, user_ids, n_requests: int, zipf=ZIPF_EXPONENT):
+    """
+    Draw the request sequence up front so the replay itself is cheap
+
+    Returns:
+        List of (endpoint name, method, path) tuples
+    """
+    names = list(mix)
+    weights = np.array([mix[name][0] for name in names], dtype=float)
+    endpoints = rng.choice(len(names), n_requests, p=weights / weights.sum())
+    popularity = 1 / np.arange(1, len(user_ids) + 1) ** zipf
+    users = rng.choice(user_ids, n_requests, p=popularity / popularity.sum())
+    biomarkers = rng.integers(1, 10, n_requests)
+    return [
+        (
+            names[e],
+            mix[names[e]][1],
+            mix[names[e]][2].format(user_id=users[i], biomarker_id=biomarkers[i]),
+        )
+        for i, e in enumerate(endpoints)
+    ]
+
+
+def write_bodies(rng, n: int):
+    """Bodies for POST measurement requests, each on its own session date"""
+    means, cov = fallback_distribution()
+    panels = draw_panels(rng, means, cov, np.arange(n), np.full(n, 45.0)).round(2)
+    return [
+        {
+            "sessionDate": (WRITE_DATES_FROM + timedelta(days=i)).isoformat(),
+            "fastingStatus": True,
+            "measurements": [
+                {"biomarkerId": b + 1, "value": float(value)}
+                for b, value in enumerate(panel)
+            ],
+        }
+        for i, panel in enumerate(panels)
+    ]
+
+
+def summarize(results, elapsed: float):
+    """
+    Aggregate (endpoint, status, seconds, cache) results
+
+    Returns:
+        Dict of endpoint (and "all") -> {requests, rps, p50/p90/p99/max in ms,
+        errors, clientErrors, cacheHitRate}; errors are 5xx responses, 409
+        conflicts (a write colliding with an existing session) and failed
+        requests, clientErrors are the other 4xx responses
+    """
+    groups = {}
+    for result in results:
+        groups.setdefault(result[0], []).append(result)
+    groups["all"] = results
+
+    summary = {}
+    for name, rows in groups.items():
+        latencies = np.array([seconds for _, _, seconds, _ in rows]) * 1000
+        cached = [cache for _, _, _, cache in rows if cache]
+        summary[name] = {
+            "requests": len(rows),
+            "rps": len(rows) / elapsed if elapsed else 0.0,
+            **{
+                f"p{q}": float(value)
+                for q, value in zip(PERCENTILES, np.percentile(latencies, PERCENTILES))
+            },
+            "max": float(latencies.max()),
+            "errors": sum(
+                1
+                for _, status, _, _ in rows
+                if status is None or status >= 500 or status == 409
+            ),
+            "clientErrors": sum(
+                1
+                for _, status, _, _ in rows
+                if status is not None and 400 <= status < 500 and status != 409
+            ),
+            "cacheHitRate": (
+                sum(cache == "HIT" for cache in cached) / len(cached)
+                if cached
+                else None
+            ),
+        }
+    return summary
+
+
+async def sample_users(client, count: int, race: str):
+    """Up to ``count`` user IDs, paged from GET /api/v1/users"""
+    user_ids, after = [], 0
+    while len(user_ids) < count:
+        params = {"limit": min(1000, count - len(user_ids)), "after": after}
+        if race:
+            params["race"] = race
+        response = await client.get("/api/v1/users", params=params)
+        response.raise_for_status()
+        page = response.json()
+        user_ids += [user["userId"] for user in page["users"]]
+        if page["nextCursor"] is None:
+            break
+        after = page["nextCursor"]
+    return user_ids
+
+
+async def replay(client, schedule, bodies, concurrency: int, written=None):
+    """
+    Issue the schedule with ``concurrency`` requests in flight
+
+    The SessionIDs of created sessions are appended to ``written``.
+    """
+    results = []
+    jobs = iter(schedule)
+    bodies = iter(bodies)
+
+    async def worker():
+        for name, method, path in jobs:
+            body = next(bodies) if method == "POST" else None
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                status, cache = response.status_code, response.headers.get("X-Cache")
+                if status == 201 and written is not None:
+                    written.append(response.json()["sessionId"])
+            except httpx.HTTPError:
+                status, cache = None, None
+            results.append((name, status, time.perf_counter() - started, cache))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results, time.perf_counter() - started
+
+
+def report(summary) -> None:
+    """Print one row per endpoint, busiest first, then the total"""
+    print(
+        f"{'endpoint':<12} {'requests':>9} {'req/s':>9} {'p50 ms':>8} {'p90 ms':>8} "
+        f"{'p99 ms':>8} {'max ms':>8} {'errors':>7} {'4xx':>7} {'cache':>6}"
+    )
+    names = sorted(
+        (n for n in summary if n != "all"), key=lambda n: -summary[n]["requests"]
+    )
+    for name in names + ["all"]:
+        row = summary[name]
+        hit_rate = row["cacheHitRate"]
+        cache = "-" if hit_rate is None else f"{hit_rate:.0%}"
+        print(
+            f"{name:<12} {row['requests']:>9,} {row['rps']:>9.1f} {row['p50']:>8.1f} "
+            f"{row['p90']:>8.1f} {row['p99']:>8.1f} {row['max']:>8.1f} "
+            f"{row['errors']:>7} {row['clientErrors']:>7} {cache:>6}"
+        )
+
+
+def remove_written_sessions(session_ids) -> None:
+    """Delete the sessions a run wrote and refresh their users' latest values"""
+    placeholders = ", ".join(["%s"] * len(session_ids))
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(WRITTEN_USERS.format(placeholders=placeholders), session_ids)
+            user_ids = [row["UserID"] for row in cursor.fetchall()]
+            cursor.execute(
+                DELETE_WRITTEN_SESSIONS.format(placeholders=placeholders), session_ids
+            )
+            if user_ids:
+                users = ", ".join(["%s"] * len(user_ids))
+                cursor.execute(DELETE_USERS_LATEST.format(placeholders=users), user_ids)
+                cursor.execute(INSERT_USERS_LATEST.format(placeholders=users), user_ids)
+        connection.commit()
+    finally:
+        connection.close()
+    print(f"✓ Removed {len(session_ids):,} written sessions")
+
+
+async def run(args):
+    """Sample users, warm up, replay and summarize"""
+    rng = np.random.default_rng(args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout)
+    async with httpx.AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=timeout
+    ) as client:
+        user_ids = await sample_users(client, args.users, args.race)
+        if not user_ids:
+            raise RuntimeError("no users to replay against; run generate_population.py")
+        # Shuffle so popularity is not tied to UserID order
+        user_ids = rng.permutation(user_ids)
+
+        mix = {**ENDPOINT_MIX, **(WRITE_MIX if args.writes else {})}
+        schedule = build_schedule(rng, mix, user_ids, args.requests)
+        n_writes = sum(1 for _, method, _ in schedule if method == "POST")
+        bodies = write_bodies(rng, n_writes)
+        print(
+            f"Replaying {len(schedule):,} requests ({n_writes:,} writes) over "
+            f"{len(user_ids):,} users with {args.concurrency} in flight ..."
+        )
+
+        # warm up pools before measuring
+        warmup = build_schedule(rng, ENDPOINT_MIX, user_ids, args.concurrency)
+        await replay(client, warmup, [], args.concurrency)
+        written = []
+        try:
+            results, elapsed = await replay(
+                client, schedule, bodies, args.concurrency, written
+            )
+        finally:
+            if written:
+                remove_written_sessions(written)
+                await client.post("/api/v1/admin/cache/invalidate")
+    return summarize(results, elapsed)
+
+
+def main():
+    """Run the load test and print (and optionally save) the summary"""
+    parser = argparse.ArgumentParser(description="API load test")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=10_000, help="users to sample")
+    parser.add_argument(
+        "--race", default="Synthetic", help="only sample these users ('' for all)"
+    )
+    parser.add_argument("--writes", action="store_true", help="add POST measurements")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="also write the summary here")
+    args = parser.parse_args()
+
+    try:
+        summary = asyncio.run(run(args))
+    except (httpx.HTTPError, pymysql.MySQLError, RuntimeError) as e:
+        print(f"✗ Load test failed: {e}")
+        sys.exit(1)
+
+    report(summary)
+    if args.json:
+        args.json.write_text(json.dumps(summary, indent=2) + "\n")
+        print(f"✓ Wrote summary to {args.json}")
+    sys.exit(1 if summary["all"]["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Recalculate biological age for many users in one pass.
+
+Uses the same set-based scoring as POST /api/v1/bio-age/calculate-batch.
+
+Usage:
+    python scripts/recalculate_bio_age.py --all
+    python scripts/recalculate_bio_age.py --users 1 2 3 --model "Phenotypic Age"
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import pymysql
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.api.bio_age import BIO_AGE_MODEL_IDS, calculate_batch, load_or_fit_hd_model
+
+load_dotenv()
+
+HD_MODEL_DIR = os.getenv(
+    "HD_MODEL_DIR", str(Path(__file__).resolve().parent.parent / "data" / "models")
+)
+
+DB_CONFIG = {
+    "host": os.getenv("MYSQL_HOST", "localhost"),
+    "port": int(os.getenv("MYSQL_PORT", 3307)),
+    "user": os.getenv("MYSQL_USER", "biomarker_user"),
+    "password": os.getenv("MYSQL_PASSWORD", "biomarker_pass"),
+    "database": os.getenv("MYSQL_DATABASE", "longevity"),
+    "charset": "utf8mb4",
+    "cursorclass": pymysql.cursors.DictCursor,
+    "autocommit": False,
+}
+
+
+def main():
+    """Parse arguments, score the cohort and print the summary"""
+    parser = argparse.ArgumentParser(description="Batch biological age calculation")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--all", action="store_true", help="score every user")
+    target.add_argument("--users", type=int, nargs="+", help="user IDs to score")
+    parser.add_argument(
+        "--model", choices=list(BIO_AGE_MODEL_IDS), help="only this model"
+    )
+    args = parser.parse_args()
+
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        models = [args.model] if args.model else list(BIO_AGE_MODEL_IDS)
+        hd_model = None
+        if "Homeostatic Dysregulation" in models:
+            hd_model = load_or_fit_hd_model(connection, HD_MODEL_DIR)
+            if hd_model is None:
+                if args.model:
+                    sys.exit("HD model unavailable (reference population too small)")
+                models.remove("Homeostatic Dysregulation")
+
+        started = time.perf_counter()
+        summary = calculate_batch(
+            connection, None if args.all else args.users, models, hd_model
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        connection.close()
+
+    print(json.dumps(summary, indent=2))
+    print(
+        f"✓ Scored {summary['usersScored']} users in {elapsed:.2f}s "
+        f"({summary['usersScored'] / max(elapsed, 1e-9):,.0f} users/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Synthetic users shared by the benchmark, population and load-test scripts.
+
+Synthetic users get SEQN >= ``SYNTHETIC_SEQN_START`` and RaceEthnicity
+'Synthetic', so they never collide with NHANES participants and ``cleanup``
+removes them all (sessions, measurements and latest rows cascade).
+"""
+
+import numpy as np
+
+SYNTHETIC_SEQN_START = 8_000_000
+# Typical value of each biomarker, in BiomarkerID order
+BIOMARKER_MEANS = np.array([4.2, 80, 0.9, 95, 1.5, 6.5, 30, 90, 13])
+
+# Share of the reference covariance that is between people (stable
+# baseline) vs. between sessions of one person; they sum to 1
+BETWEEN_PERSON_SHARE = 0.7
+WITHIN_PERSON_SHARE = 0.3
+
+# The reference population is 20-30 years old; later ages drift by this many
+# reference SDs per decade (BiomarkerID order)
+REFERENCE_AGE = 25
+AGE_DRIFT_PER_DECADE = np.array([-0.25, 0.15, 0.15, 0.3, 0.25, 0.05, -0.2, 0.15, 0.3])
+# Values are kept above this fraction of the reference mean
+VALUE_FLOOR = 0.05
+# Fallback when no HD model can be fitted: independent biomarkers
+FALLBACK_CV = 0.15
+
+
+def fallback_distribution():
+    """Independent biomarkers around typical means, when HD is unavailable"""
+    return BIOMARKER_MEANS.astype(float), np.diag((BIOMARKER_MEANS * FALLBACK_CV) ** 2)
+
+
+def draw_panels(rng, means, cov, owners, ages):
+    """
+    Correlated biomarker panels, one row per session
+
+    Args:
+        owners: Index of the user each session belongs to (0..n_users-1)
+        ages: Age in years at each session
+
+    Returns:
+        (n_sessions, 9) array in BiomarkerID order
+    """
+    n_users = int(owners.max()) + 1 if len(owners) else 0
+    zeros = np.zeros(len(means))
+    baseline = rng.multivariate_normal(
+        zeros, cov * BETWEEN_PERSON_SHARE, n_users, method="eigh"
+    )
+    noise = rng.multivariate_normal(
+        zeros, cov * WITHIN_PERSON_SHARE, len(owners), method="eigh"
+    )
+    drift = np.outer(
+        (ages - REFERENCE_AGE) / 10, AGE_DRIFT_PER_DECADE * np.sqrt(np.diag(cov))
+    )
+    panels = means + baseline[owners] + noise + drift
+    return np.maximum(panels, means * VALUE_FLOOR)
+
+
+def cleanup(connection) -> None:
+    """Delete the synthetic users (cascades to sessions/measurements/latest)"""
+    with connection.cursor() as cursor:
+        deleted = cursor.execute(
+            "DELETE FROM User WHERE SEQN >= %s AND RaceEthnicity = 'Synthetic'",
+            (SYNTHETIC_SEQN_START,),
+        )
+    connection.commit()
+    print(f"✓ Removed {deleted:,} synthetic users")
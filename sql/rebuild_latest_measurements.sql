@@ -0,0 +1,27 @@
+-- Rebuild UserLatestMeasurement from Measurement in one set-based pass
+-- Run after bulk loads that bypass the API (etl/load.sh, demo_users.sql).
+-- Readers keep seeing the previous contents until COMMIT.
+
+START TRANSACTION;
+
+DELETE FROM UserLatestMeasurement;
+
+INSERT INTO UserLatestMeasurement (UserID, BiomarkerID, MeasurementID, Value, TakenAt)
+SELECT UserID, BiomarkerID, MeasurementID, Value, TakenAt
+FROM (
+    SELECT
+        s.UserID,
+        m.BiomarkerID,
+        m.MeasurementID,
+        m.Value,
+        m.TakenAt,
+        ROW_NUMBER() OVER (
+            PARTITION BY s.UserID, m.BiomarkerID
+            ORDER BY m.TakenAt DESC, m.MeasurementID DESC
+        ) AS RowNumber
+    FROM Measurement        AS m
+    JOIN MeasurementSession AS s ON m.SessionID = s.SessionID
+) ranked
+WHERE RowNumber = 1;
+
+COMMIT;
@@ -11,6 +11,8 @@ DROP VIEW IF EXISTS
     v_user_anthro_history;
 
 -- then the tables (children → parents)
+DROP TABLE IF EXISTS NhanesCycleLoad;
+DROP TABLE IF EXISTS UserLatestMeasurement;
 DROP TABLE IF EXISTS BiologicalAgeResult;
 DROP TABLE IF EXISTS ModelUsesBiomarker;
 DROP TABLE IF EXISTS BiologicalAgeModel;
@@ -34,13 +36,17 @@ CREATE TABLE User (
 );
 
 /* --------- MeasurementSession --------- */
+-- SourceCycle is the NHANES cycle that created the session (NULL for sessions
+-- entered through the API); a reload only prunes its own cycle's sessions
 CREATE TABLE MeasurementSession (
     SessionID INT AUTO_INCREMENT PRIMARY KEY,
     UserID INT NOT NULL,
     SessionDate DATE NOT NULL,
     FastingStatus BOOLEAN,
+    SourceCycle VARCHAR(4),
     CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UNIQUE KEY (UserID, SessionDate),
+    KEY (SourceCycle),
     CONSTRAINT fk_session_user FOREIGN KEY (UserID) REFERENCES User (UserID) ON DELETE CASCADE
 );
 
@@ -69,7 +75,26 @@ CREATE TABLE Measurement (
     CONSTRAINT fk_measurement_biomarker FOREIGN KEY (BiomarkerID) REFERENCES Biomarker (BiomarkerID) ON DELETE RESTRICT
 );
 
+/* --------- UserLatestMeasurement (maintained latest value per user/biomarker) --------- */
+-- Upserted by POST /users/{id}/measurements, rebuilt in bulk after ETL loads
+-- with sql/rebuild_latest_measurements.sql. Ties on TakenAt keep the highest
+-- MeasurementID. Check against v_user_latest_measurements with
+-- scripts/check_latest_measurements.py
+CREATE TABLE UserLatestMeasurement (
+    UserID INT NOT NULL,
+    BiomarkerID INT NOT NULL,
+    MeasurementID INT NOT NULL,
+    Value DECIMAL(12, 4) NOT NULL,
+    TakenAt TIMESTAMP NOT NULL,
+    UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (UserID, BiomarkerID),
+    CONSTRAINT fk_latest_user FOREIGN KEY (UserID) REFERENCES User (UserID) ON DELETE CASCADE,
+    CONSTRAINT fk_latest_biomarker FOREIGN KEY (BiomarkerID) REFERENCES Biomarker (BiomarkerID) ON DELETE RESTRICT,
+    CONSTRAINT fk_latest_measurement FOREIGN KEY (MeasurementID) REFERENCES Measurement (MeasurementID) ON DELETE CASCADE
+);
+
 /* --------- Anthropometry (NEW) --------- */
+-- SourceCycle as for MeasurementSession
 CREATE TABLE Anthropometry (
     AnthroID INT AUTO_INCREMENT PRIMARY KEY,
     UserID INT NOT NULL,
@@ -77,8 +102,10 @@ CREATE TABLE Anthropometry (
     HeightCM DECIMAL(5, 2),
     WeightKG DECIMAL(5, 2),
     BMI DECIMAL(4, 2),
+    SourceCycle VARCHAR(4),
     CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UNIQUE KEY (UserID, ExamDate),
+    KEY (SourceCycle),
     CONSTRAINT fk_anthro_user FOREIGN KEY (UserID) REFERENCES User (UserID) ON DELETE CASCADE
 );
 
@@ -131,6 +158,21 @@ CREATE TABLE BiologicalAgeResult (
     CONSTRAINT fk_bio_age_model FOREIGN KEY (ModelID) REFERENCES BiologicalAgeModel (ModelID) ON DELETE RESTRICT
 );
 
+/* --------- NhanesCycleLoad (ETL bookkeeping) --------- */
+-- One row per NHANES cycle loaded by etl/load.sh. Fingerprint is copied from
+-- data/clean/cycles/<Cycle>/manifest.json; a cycle whose manifest still has
+-- the same fingerprint is skipped on the next load. SeqnLow/SeqnHigh bound
+-- the participants loaded, so a reload can prune ones dropped from the files
+-- (only rows the loader wrote: see SourceCycle).
+CREATE TABLE NhanesCycleLoad (
+    Cycle VARCHAR(4) PRIMARY KEY,
+    Label VARCHAR(20) NOT NULL,
+    Fingerprint CHAR(64) NOT NULL,
+    SeqnLow INT,
+    SeqnHigh INT,
+    LoadedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
 /* --------- Analytics Indexes --------- */
 -- Covering index for trend queries (fixed to use SessionID)
 CREATE INDEX Idx_Measurement_Trend ON Measurement (SessionID, BiomarkerID, TakenAt, Value);
@@ -144,9 +186,10 @@ CREATE INDEX Idx_Bio_Age_User_Model ON BiologicalAgeResult (UserID, ModelID, Com
 -- Index for anthropometry BMI lookups (covered by UNIQUE key, no additional index needed)
 
 /* --------- Performance Notes --------- */
--- v_user_latest_measurements is a non-materialized view
--- MySQL query planner merges it with base tables for optimal performance
--- The covering index on Measurement supports both direct queries and view queries
+-- v_user_latest_measurements is a non-materialized view; its MAX(TakenAt)
+-- derived table scans every measurement, so the API reads the maintained
+-- UserLatestMeasurement table instead. The view is kept as the reference
+-- definition for the consistency checker and benchmarks.
 
 /* --------- Optimized Views for API/Analytics --------- */
 
@@ -0,0 +1,217 @@
+"""
+Cohort Percentile Module.
+
+Implementation for Longevity Biomarker Tracker
+
+Precomputes population percentile tables per (feature, sex, age band), where
+a feature is a BiomarkerID (latest values) or a bio-age ModelID (age gaps).
+All groups are quantiled at once over one lexsorted array, and a value's
+population percentile is found with a binary search over its group's
+quantiles instead of a scan over the population.
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+
+# Bump when the table layout changes; old artifacts are rebuilt
+COHORT_ARTIFACT_VERSION = 1
+
+# Age bands: <20, 20-29, ..., 70-79, 80+ (NHANES top-codes age at 80)
+AGE_BAND_EDGES = np.array([20, 30, 40, 50, 60, 70, 80])
+SEX_CODES = {"M": 0, "F": 1}
+SEX_NAMES = {code: sex for sex, code in SEX_CODES.items()}
+
+# Quantiles stored per group (every whole percentile)
+PERCENTILES = np.arange(101)
+# Quantiles served by ``describe``
+SUMMARY_PERCENTILES = (1, 5, 10, 25, 50, 75, 90, 95, 99)
+
+# Groups with fewer values are left out of the table
+MIN_GROUP_SIZE = 20
+
+
+def age_band(ages) -> np.ndarray:
+    """Band index of each age (0 = under 20, len(AGE_BAND_EDGES) = 80+)"""
+    return np.searchsorted(AGE_BAND_EDGES, np.asarray(ages), side="right")
+
+
+def band_label(band: int) -> str:
+    """Human-readable label of an age band, e.g. '40-49'"""
+    if band == 0:
+        return f"<{AGE_BAND_EDGES[0]}"
+    if band == len(AGE_BAND_EDGES):
+        return f"{AGE_BAND_EDGES[-1]}+"
+    return f"{AGE_BAND_EDGES[band - 1]}-{AGE_BAND_EDGES[band] - 1}"
+
+
+class PercentileTable:
+    """
+    Quantiles of a value per (feature, sex, age band) group
+
+    ``keys`` holds one (feature, sex code, band) row per group, sorted, and
+    ``quantiles`` the matching row of ``PERCENTILES`` quantiles (linear
+    interpolation, as ``np.quantile``).
+    """
+
+    def __init__(self, keys: np.ndarray, quantiles: np.ndarray, counts: np.ndarray):
+        """Wrap precomputed arrays (see ``build``)"""
+        self.keys = np.asarray(keys, dtype=np.int64).reshape(-1, 3)
+        self.quantiles = np.asarray(quantiles, dtype=float).reshape(
+            -1, len(PERCENTILES)
+        )
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self._index = {tuple(key): row for row, key in enumerate(self.keys.tolist())}
+
+    def __len__(self) -> int:
+        """Number of groups"""
+        return len(self.keys)
+
+    @classmethod
+    def build(
+        cls,
+        feature_ids,
+        sexes,
+        ages,
+        values,
+        min_count: int = MIN_GROUP_SIZE,
+    ) -> "PercentileTable":
+        """
+        Quantile every group in one vectorized pass
+
+        Args:
+            feature_ids: BiomarkerID / ModelID per observation
+            sexes: "M" / "F" per observation (others are ignored)
+            ages: Age in years per observation
+            values: Observed values (NaN is ignored)
+            min_count: Smallest group that gets a table row
+        """
+        feature_ids = np.asarray(feature_ids, dtype=np.int64)
+        values = np.asarray(values, dtype=float)
+        sex_codes = np.array([SEX_CODES.get(sex, -1) for sex in sexes], dtype=np.int64)
+        bands = age_band(np.asarray(ages, dtype=float))
+
+        keep = (sex_codes >= 0) & np.isfinite(values)
+        feature_ids, sex_codes, bands, values = (
+            feature_ids[keep],
+            sex_codes[keep],
+            bands[keep],
+            values[keep],
+        )
+        if not len(values):
+            return cls(np.empty((0, 3)), np.empty((0, len(PERCENTILES))), [])
+
+        # Sort by group, then value: each group becomes one sorted run
+        order = np.lexsort((values, bands, sex_codes, feature_ids))
+        keys = np.column_stack((feature_ids, sex_codes, bands))[order]
+        values = values[order]
+        boundaries = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+        starts = np.concatenate(([0], boundaries))
+        counts = np.diff(np.concatenate((starts, [len(values)])))
+
+        large = counts >= min_count
+        starts, counts = starts[large], counts[large]
+
+        # Linear interpolation between order statistics, for all groups at once
+        positions = (counts - 1)[:, None] * (PERCENTILES / 100.0)[None, :]
+        lower = np.floor(positions).astype(np.int64)
+        upper = np.minimum(lower + 1, (counts - 1)[:, None])
+        fraction = positions - lower
+        low_values = values[starts[:, None] + lower]
+        high_values = values[starts[:, None] + upper]
+        quantiles = low_values + fraction * (high_values - low_values)
+        return cls(keys[starts], quantiles, counts)
+
+    def row(self, feature_id: int, sex: str, age: float) -> Optional[int]:
+        """Table row of a group, or None if it has no (or too little) data"""
+        return self._index.get(
+            (int(feature_id), SEX_CODES.get(sex, -1), int(age_band(age)))
+        )
+
+    def percentile(
+        self, feature_id: int, sex: str, age: float, value: float
+    ) -> Optional[float]:
+        """
+        Rank of ``value`` within its group, as a population percentile 0-100
+
+        A binary search over the group's quantiles, interpolating between
+        neighbouring percentiles; None if the group is not in the table.
+        """
+        row = self.row(feature_id, sex, age)
+        if row is None or value is None:
+            return None
+        quantiles = self.quantiles[row]
+        value = float(value)
+        if value <= quantiles[0]:
+            return 0.0
+        if value >= quantiles[-1]:
+            return 100.0
+        upper = int(np.searchsorted(quantiles, value, side="right"))
+        low, high = quantiles[upper - 1], quantiles[upper]
+        return round(float(upper - 1 + (value - low) / (high - low)), 1)
+
+    def describe(
+        self, feature_id: Optional[int] = None, id_name: str = "id"
+    ) -> List[Dict]:
+        """Summary quantiles of every group (optionally of one feature)"""
+        columns = [int(p) for p in SUMMARY_PERCENTILES]
+        groups = []
+        for row, (feature, sex, band) in enumerate(self.keys.tolist()):
+            if feature_id is not None and feature != feature_id:
+                continue
+            groups.append(
+                {
+                    id_name: feature,
+                    "sex": SEX_NAMES[sex],
+                    "ageBand": band_label(band),
+                    "n": int(self.counts[row]),
+                    "percentiles": {
+                        f"p{p}": round(float(self.quantiles[row, p]), 4)
+                        for p in columns
+                    },
+                }
+            )
+        return groups
+
+    def save(self, path: Union[str, Path], **metadata) -> Path:
+        """Write the table to an ``.npz`` artifact (atomically, like HD)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        metadata = {**metadata, "version": COHORT_ARTIFACT_VERSION}
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(
+                    f,
+                    keys=self.keys,
+                    quantiles=self.quantiles,
+                    counts=self.counts,
+                    metadata=np.array(json.dumps(metadata, default=str)),
+                )
+            os.replace(tmp_name, path)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+        return path
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "PercentileTable":
+        """
+        Restore a table written by ``save``
+
+        Raises:
+            ValueError: If the artifact was written by an incompatible version
+        """
+        with np.load(path, allow_pickle=False) as artifact:
+            metadata = json.loads(str(artifact["metadata"]))
+            if metadata.get("version") != COHORT_ARTIFACT_VERSION:
+                raise ValueError(
+                    f"Cohort artifact version {metadata.get('version')} "
+                    f"!= {COHORT_ARTIFACT_VERSION}"
+                )
+            return cls(artifact["keys"], artifact["quantiles"], artifact["counts"])
@@ -6,12 +6,63 @@ Implementation for Longevity Biomarker Tracker
 Based on Cohen et al. 2013 and Belsky et al. 2015 methodology
 """
 
+import json
+import math
+import os
+import tempfile
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence, Union
 from dataclasses import dataclass
 
 
+# Bump when the fitted state or scoring math changes; old artifacts are refit
+HD_ARTIFACT_VERSION = 2
+
+# Covariance matrices with a larger condition number are shrunk toward a
+# scaled identity before factorization
+MAX_CONDITION_NUMBER = 1e10
+SHRINKAGE_STEPS = (0.01, 0.05, 0.1, 0.25, 0.5)
+
+# Rows scored per block in ``score``; bounds the temporary buffer size
+DEFAULT_CHUNK_SIZE = 65536
+
+
+def whitening_matrix(cov_matrix: np.ndarray):
+    """
+    Factor a covariance matrix into a whitening matrix W with W Σ Wᵀ = I
+
+    Tries a Cholesky factorization (W = L⁻¹), shrinking an ill-conditioned
+    Σ toward (tr Σ / d)·I first, and falls back to an eigendecomposition
+    pseudo-inverse that drops null directions.
+
+    Returns:
+        (W, method) where method is "cholesky", "shrinkage" or "pinv"
+    """
+    cov_matrix = np.atleast_2d(np.asarray(cov_matrix, dtype=float))
+    d = cov_matrix.shape[0]
+    target = np.trace(cov_matrix) / d * np.eye(d)
+
+    if np.all(np.isfinite(cov_matrix)) and np.trace(cov_matrix) > 0:
+        for alpha in (0.0,) + SHRINKAGE_STEPS:
+            candidate = (1 - alpha) * cov_matrix + alpha * target
+            if np.linalg.cond(candidate) > MAX_CONDITION_NUMBER:
+                continue
+            try:
+                cholesky = np.linalg.cholesky(candidate)
+            except np.linalg.LinAlgError:
+                continue
+            # Triangular inverse of L; d is tiny (9), so solve against I once
+            W = np.linalg.solve(cholesky, np.eye(d))
+            return W, "cholesky" if alpha == 0.0 else "shrinkage"
+
+    eigenvalues, eigenvectors = np.linalg.eigh(np.nan_to_num(cov_matrix))
+    keep = eigenvalues > eigenvalues.max(initial=0) * d * np.finfo(float).eps
+    W = (eigenvectors[:, keep] / np.sqrt(eigenvalues[keep])).T
+    return W, "pinv"
+
+
 @dataclass
 class HDResult:
     """Container for HD calculation results"""
@@ -38,9 +89,17 @@ class HomeostasisDysregulation:
         self.reference_means_ = None
         self.reference_stds_ = None
         self.reference_cov_inv_ = None
+        self.whitening_ = None
+        self.covariance_method_ = None
+        # Raw values -> whitened vector: x @ projection_ - offset_
+        self.projection_ = None
+        self.offset_ = None
+        self.name_index_ = None  # biomarker name -> column in fit order
         self.biomarker_names_ = None
         self.age_regression_slope_ = None
         self.age_regression_intercept_ = None
+        self.reference_n_ = None
+        self.metadata_ = {}
 
     def fit_reference_population(
         self,
@@ -68,6 +127,7 @@ class HomeostasisDysregulation:
         # Remove rows with any missing biomarkers
         biomarker_data = biomarker_data.dropna()
 
+        self.reference_n_ = len(biomarker_data)
         print(f"HD reference population: {len(biomarker_data)} individuals")
         print(f"Using biomarkers: {biomarker_columns}")
 
@@ -78,9 +138,15 @@ class HomeostasisDysregulation:
         # Z-score the biomarker data
         z_scored = (biomarker_data - self.reference_means_) / self.reference_stds_
 
-        # Calculate covariance matrix and its inverse
+        # Factor the covariance matrix once; scoring is then a whitening
+        # projection and a sum of squares (no explicit inverse in the hot path)
         cov_matrix = np.cov(z_scored.T)
-        self.reference_cov_inv_ = np.linalg.inv(cov_matrix)
+        self.whitening_, self.covariance_method_ = whitening_matrix(cov_matrix)
+        if self.covariance_method_ != "cholesky":
+            print(
+                f"[WARNING] HD covariance ill-conditioned, using {self.covariance_method_}"
+            )
+        self._prepare_scoring()
 
         # Optional: fit HD score to chronological age for "HD years" conversion
         if age_column in reference_df.columns:
@@ -100,6 +166,173 @@ class HomeostasisDysregulation:
 
         return self
 
+    def _prepare_scoring(self) -> None:
+        """Fold z-scoring into the whitening projection"""
+        means = np.asarray(self.reference_means_, dtype=float)
+        stds = np.asarray(self.reference_stds_, dtype=float)
+        # ((x - μ) / σ) Wᵀ == x (Wᵀ / σ[:, None]) - (μ / σ) Wᵀ
+        self.projection_ = np.ascontiguousarray(self.whitening_.T / stds[:, None])
+        self.offset_ = (means / stds) @ self.whitening_.T
+        self.reference_cov_inv_ = self.whitening_.T @ self.whitening_
+        self.name_index_ = {name: i for i, name in enumerate(self.biomarker_names_)}
+
+    def score_one(
+        self, biomarkers: Union[Mapping[str, float], Sequence[float]]
+    ) -> float:
+        """
+        HD score for a single individual with no pandas and minimal allocation
+
+        Args:
+            biomarkers: Dict of biomarker name -> value, or a float sequence
+                already in ``biomarker_names_`` order
+
+        Returns:
+            Mahalanobis distance as a Python float
+        """
+        if self.projection_ is None:
+            raise ValueError("Must fit model first using fit_reference_population()")
+
+        d = len(self.name_index_)
+        if isinstance(biomarkers, Mapping):
+            try:
+                x = np.fromiter(
+                    (biomarkers[name] for name in self.biomarker_names_), float, d
+                )
+            except KeyError as e:
+                raise ValueError(f"Missing biomarker: {e.args[0]}")
+        else:
+            x = np.asarray(biomarkers, dtype=float)
+            if x.shape != (d,):
+                raise ValueError(f"Expected {d} biomarker values, got {x.shape}")
+
+        whitened = x.dot(self.projection_)
+        whitened -= self.offset_
+        return math.sqrt(whitened.dot(whitened))
+
+    def score(
+        self,
+        values: np.ndarray,
+        out: Optional[np.ndarray] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> np.ndarray:
+        """
+        HD scores for raw biomarker values with bounded temporary memory
+
+        Args:
+            values: Array-like (n_samples, n_biomarkers) in ``biomarker_names_``
+                order; may be a ``np.memmap`` larger than RAM
+            out: Optional preallocated float64 array of length n_samples
+            chunk_size: Rows whitened per block (temporary is chunk x d)
+
+        Returns:
+            ``out`` filled with Mahalanobis distances
+        """
+        if self.projection_ is None:
+            raise ValueError("Must fit model first using fit_reference_population()")
+
+        if not isinstance(values, np.ndarray):
+            values = np.asarray(values, dtype=float)
+        n, d = values.shape
+        if d != len(self.biomarker_names_):
+            raise ValueError(f"Expected {len(self.biomarker_names_)} biomarker columns")
+        if out is None:
+            out = np.empty(n)
+
+        k = self.projection_.shape[1]
+        buffer = np.empty((min(chunk_size, n), k))
+        for start in range(0, n, chunk_size):
+            stop = min(start + chunk_size, n)
+            block = buffer[: stop - start]
+            np.matmul(values[start:stop], self.projection_, out=block)
+            block -= self.offset_
+            np.square(block, out=block)
+            np.sum(block, axis=1, out=out[start:stop])
+        return np.sqrt(out, out=out)
+
+    def save(self, path: Union[str, Path], **metadata) -> Path:
+        """
+        Write the fitted model to a compressed ``.npz`` artifact
+
+        The file is written next to ``path`` and renamed into place, so
+        concurrent readers never see a partial artifact.
+
+        Args:
+            path: Destination file
+            **metadata: JSON-serializable fit metadata (e.g. fingerprint)
+
+        Returns:
+            Path of the written artifact
+        """
+        if self.reference_cov_inv_ is None:
+            raise ValueError("Must fit model first using fit_reference_population()")
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        metadata = {
+            **self.metadata_,
+            **metadata,
+            "version": HD_ARTIFACT_VERSION,
+            "reference_n": self.reference_n_,
+            "covariance_method": self.covariance_method_,
+        }
+        slope = self.age_regression_slope_
+        intercept = self.age_regression_intercept_
+
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(
+                    f,
+                    biomarker_names=np.array(self.biomarker_names_, dtype=str),
+                    means=np.asarray(self.reference_means_, dtype=float),
+                    stds=np.asarray(self.reference_stds_, dtype=float),
+                    whitening=np.asarray(self.whitening_, dtype=float),
+                    age_regression=np.array(
+                        [
+                            np.nan if slope is None else slope,
+                            np.nan if intercept is None else intercept,
+                        ]
+                    ),
+                    metadata=np.array(json.dumps(metadata, default=str)),
+                )
+            os.replace(tmp_name, path)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+        self.metadata_ = metadata
+        return path
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "HomeostasisDysregulation":
+        """
+        Restore a model written by ``save``
+
+        Raises:
+            ValueError: If the artifact was written by an incompatible version
+        """
+        with np.load(path, allow_pickle=False) as artifact:
+            metadata = json.loads(str(artifact["metadata"]))
+            if metadata.get("version") != HD_ARTIFACT_VERSION:
+                raise ValueError(
+                    f"HD artifact version {metadata.get('version')} != {HD_ARTIFACT_VERSION}"
+                )
+            names = [str(name) for name in artifact["biomarker_names"]]
+            slope, intercept = artifact["age_regression"]
+
+            model = cls()
+            model.biomarker_names_ = names
+            model.reference_means_ = pd.Series(artifact["means"], index=names)
+            model.reference_stds_ = pd.Series(artifact["stds"], index=names)
+            model.whitening_ = artifact["whitening"]
+        if not np.isnan(slope):
+            model.age_regression_slope_ = float(slope)
+            model.age_regression_intercept_ = float(intercept)
+        model.reference_n_ = metadata.get("reference_n")
+        model.covariance_method_ = metadata.get("covariance_method")
+        model.metadata_ = metadata
+        model._prepare_scoring()
+        return model
+
     def _compute_hd_scores(self, z_scores: np.ndarray) -> np.ndarray:
         """
         Compute HD scores using Mahalanobis distance
@@ -110,13 +343,13 @@ class HomeostasisDysregulation:
         Returns:
             Array of HD scores
         """
-        if self.reference_cov_inv_ is None:
+        if self.whitening_ is None:
             raise ValueError("Must fit model first using fit_reference_population()")
 
         # Mahalanobis distance formula: sqrt((x - μ)ᵀ Σ⁻¹ (x - μ))
-        # Since we're using z-scores, μ = 0, so it's just: sqrt(xᵀ Σ⁻¹ x)
-        md_squared = np.sum(z_scores @ self.reference_cov_inv_ * z_scores, axis=1)
-        return np.sqrt(md_squared)
+        # Since we're using z-scores, μ = 0, and with Σ⁻¹ = WᵀW it is ‖W x‖
+        whitened = z_scores @ self.whitening_.T
+        return np.sqrt(np.einsum("ij,ij->i", whitened, whitened))
 
     def calculate_hd(
         self, individual_biomarkers: Dict[str, float], convert_to_years: bool = True
@@ -134,23 +367,9 @@ class HomeostasisDysregulation:
         if self.reference_means_ is None:
             raise ValueError("Must fit model first using fit_reference_population()")
 
-        # Extract biomarker values in correct order
-        biomarker_values = []
-        used_biomarkers = []
-
-        for name in self.biomarker_names_:
-            if name in individual_biomarkers:
-                biomarker_values.append(individual_biomarkers[name])
-                used_biomarkers.append(name)
-            else:
-                raise ValueError(f"Missing biomarker: {name}")
-
-        # Convert to numpy array and z-score
-        values = np.array(biomarker_values)
-        z_scores = (values - self.reference_means_.values) / self.reference_stds_.values
-
-        # Calculate HD score
-        hd_score = self._compute_hd_scores(z_scores.reshape(1, -1))[0]
+        # Calculate HD score via the precompiled single-subject path
+        hd_score = self.score_one(individual_biomarkers)
+        used_biomarkers = list(self.biomarker_names_)
 
         # Convert to years if requested and possible
         hd_years = None
@@ -184,12 +403,8 @@ class HomeostasisDysregulation:
         if missing_cols:
             raise ValueError(f"Missing biomarker columns: {missing_cols}")
 
-        # Extract and z-score biomarker data
-        biomarker_data = biomarker_df[self.biomarker_names_].copy()
-        z_scores = (biomarker_data - self.reference_means_) / self.reference_stds_
-
-        # Calculate HD scores for all individuals
-        hd_scores = self._compute_hd_scores(z_scores.values)
+        # Calculate HD scores for all individuals (z-scoring is folded in)
+        hd_scores = self.score(biomarker_df[self.biomarker_names_].to_numpy(float))
 
         # Create results DataFrame
         results = pd.DataFrame({"HD_score": hd_scores}, index=biomarker_df.index)
@@ -0,0 +1,133 @@
+"""
+Phenotypic Age Calculation Module.
+
+Implementation for Longevity Biomarker Tracker
+
+Based on Levine et al. 2018 (PMID 29676998) methodology
+"""
+
+import numpy as np
+from typing import Dict, Iterable, Optional, Sequence
+from dataclasses import dataclass
+
+
+# Levine et al. 2018 coefficients keyed by BiomarkerID (see sql/01_seed.sql)
+LEVINE_COEFFICIENTS = {
+    1: (-0.0336, "linear"),  # Albumin
+    2: (0.00188, "linear"),  # Alkaline phosphatase
+    3: (0.0095, "linear"),  # Creatinine
+    4: (0.1953, "linear"),  # Glucose
+    5: (0.0954, "log"),  # CRP
+    6: (0.0554, "log"),  # WBC
+    7: (-0.0120, "linear"),  # Lymphocyte %
+    8: (0.0268, "linear"),  # MCV
+    9: (0.3306, "linear"),  # RDW
+}
+
+# Glucose is stored in mg/dL but the model expects mmol/L
+UNIT_CONVERSIONS = {4: 1 / 18.0}
+
+AGE_COEFFICIENT = 0.0804
+INTERCEPT = -19.9067
+MAX_MORTALITY_RISK = 0.999999
+
+
+@dataclass
+class PhenotypicAgeResult:
+    """Container for Phenotypic Age calculation results"""
+
+    mortality_score: np.ndarray
+    mortality_risk: np.ndarray
+    phenotypic_age: np.ndarray
+
+
+class PhenotypicAge:
+    """
+    Vectorized Phenotypic Age calculator
+
+    Scores an (n_users x n_biomarkers) matrix whose columns follow
+    ``biomarker_ids``. Unit conversions are folded into the coefficients (for
+    linear terms) or into a constant offset (for log terms), so the input
+    matrix is never copied.
+
+    Reference:
+    - Levine, M.E. et al. (2018). An epigenetic biomarker of aging for lifespan
+      and healthspan. PMID 29676998
+    """
+
+    def __init__(
+        self,
+        coefficients: Optional[Dict[int, tuple]] = None,
+        unit_conversions: Optional[Dict[int, float]] = None,
+    ):
+        """
+        Initialize the calculator
+
+        Args:
+            coefficients: BiomarkerID -> (coefficient, "linear" | "log")
+            unit_conversions: BiomarkerID -> multiplier applied before transform
+        """
+        coefficients = LEVINE_COEFFICIENTS if coefficients is None else coefficients
+        unit_conversions = (
+            UNIT_CONVERSIONS if unit_conversions is None else unit_conversions
+        )
+
+        self.biomarker_ids = sorted(coefficients)
+        weights = np.array([coefficients[i][0] for i in self.biomarker_ids], float)
+        scales = np.array([unit_conversions.get(i, 1.0) for i in self.biomarker_ids])
+        is_log = np.array([coefficients[i][1] == "log" for i in self.biomarker_ids])
+
+        self.linear_columns_ = np.flatnonzero(~is_log)
+        self.log_columns_ = np.flatnonzero(is_log)
+        # c * (s * x) == (c * s) * x  and  c * log(s * x) == c * log(x) + c * log(s)
+        self.linear_weights_ = weights[~is_log] * scales[~is_log]
+        self.log_weights_ = weights[is_log]
+        self.offset_ = INTERCEPT + float(
+            np.sum(weights[is_log] * np.log(scales[is_log]))
+        )
+
+    @classmethod
+    def from_coefficients(cls, rows: Iterable[Dict]) -> "PhenotypicAge":
+        """Build from ModelUsesBiomarker rows (biomarkerId, coefficient, transform)"""
+        return cls(
+            {
+                int(row["biomarkerId"]): (float(row["coefficient"]), row["transform"])
+                for row in rows
+            }
+        )
+
+    def score(self, values: np.ndarray, ages: np.ndarray) -> PhenotypicAgeResult:
+        """
+        Score many individuals at once
+
+        Args:
+            values: Array (n_samples, n_biomarkers) in ``biomarker_ids`` order
+            ages: Chronological ages (n_samples,)
+
+        Returns:
+            PhenotypicAgeResult with mortality score, risk R and phenotypic age
+        """
+        values = np.asarray(values, dtype=float)
+        if values.ndim != 2 or values.shape[1] != len(self.biomarker_ids):
+            raise ValueError(
+                f"Expected an (n, {len(self.biomarker_ids)}) biomarker matrix, got {values.shape}"
+            )
+
+        mortality_score = values[:, self.linear_columns_] @ self.linear_weights_
+        mortality_score += np.log(values[:, self.log_columns_]) @ self.log_weights_
+        mortality_score += np.asarray(ages, dtype=float) * AGE_COEFFICIENT
+        mortality_score += self.offset_
+
+        # R = 1 - exp(-exp(xb)), capped so the inverse below stays finite
+        risk = -np.expm1(-np.exp(mortality_score))
+        np.minimum(risk, MAX_MORTALITY_RISK, out=risk)
+
+        phenotypic_age = np.log(-np.log1p(-risk))
+        phenotypic_age /= 0.09165
+        phenotypic_age += 141.50
+        return PhenotypicAgeResult(mortality_score, risk, phenotypic_age)
+
+    def calculate(self, biomarker_values: Sequence[float], age: float) -> float:
+        """Phenotypic age for one individual (values in ``biomarker_ids`` order)"""
+        result = self.score(np.asarray(biomarker_values, dtype=float)[None, :], [age])
+        return float(result.phenotypic_age[0])
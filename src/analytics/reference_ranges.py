@@ -0,0 +1,167 @@
+"""
+Reference Range Evaluation Module.
+
+Implementation for Longevity Biomarker Tracker
+
+Classifies biomarker values against the clinical and longevity reference
+ranges. ``ReferenceRange`` rows are compiled once into dense interval arrays
+indexed by (biomarker, range type, sex, age band), where the age bands are
+the sorted distinct AgeMin/AgeMax boundaries of all ranges. Classifying one
+user or a whole (n_users x n_biomarkers) matrix is then a few array gathers
+and comparisons, with AgeMin/AgeMax and sex-specific ranges honoured.
+"""
+
+import json
+from typing import Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+
+
+RANGE_TYPES = ("clinical", "longevity")
+SEX_CODES = {"M": 0, "F": 1}
+
+# Status by the number of range types the value falls in (0, 1 or 2)
+STATUS_NAMES = np.array(["OutOfRange", "Normal", "Optimal"])
+
+
+class ReferenceRangeEngine:
+    """
+    Reference ranges compiled into ``(biomarker, type, sex, band)`` arrays
+
+    ``lower``/``upper`` hold NaN where no range applies. A sex-specific range
+    takes precedence over an "All" range covering the same ages.
+    """
+
+    def __init__(self, rows: Iterable[Mapping]):
+        """
+        Compile reference range rows
+
+        Args:
+            rows: Dicts with biomarkerId, rangeType, sex, ageMin, ageMax,
+                minVal and maxVal (the catalog's REFERENCE_RANGES rows)
+        """
+        rows = [row for row in rows if row["rangeType"] in RANGE_TYPES]
+        self.biomarker_ids = sorted({int(row["biomarkerId"]) for row in rows})
+        self._column = {biomarker: i for i, biomarker in enumerate(self.biomarker_ids)}
+
+        # Band b covers ages [edges[b - 1], edges[b]); band 0 is below every range
+        self.edges = np.unique(
+            [int(row["ageMin"]) for row in rows]
+            + [int(row["ageMax"]) + 1 for row in rows]
+        )
+        shape = (len(self.biomarker_ids), len(RANGE_TYPES), 2, len(self.edges) + 1)
+        self.lower = np.full(shape, np.nan)
+        self.upper = np.full(shape, np.nan)
+
+        band_start = np.concatenate(([-np.inf], self.edges))
+        # "All" rows first, so sex-specific rows overwrite them
+        for row in sorted(rows, key=lambda row: row["sex"] != "All"):
+            sexes = [0, 1] if row["sex"] == "All" else [SEX_CODES[row["sex"]]]
+            bands = np.flatnonzero(
+                (band_start >= int(row["ageMin"])) & (band_start <= int(row["ageMax"]))
+            )
+            index = (
+                self._column[int(row["biomarkerId"])],
+                RANGE_TYPES.index(row["rangeType"]),
+            )
+            for sex in sexes:
+                self.lower[index + (sex, bands)] = _to_float(row["minVal"])
+                self.upper[index + (sex, bands)] = _to_float(row["maxVal"])
+
+    def bounds(self, biomarker_ids, ages, sexes):
+        """
+        Applicable (lower, upper) bounds for every user and biomarker
+
+        Returns:
+            Two arrays of shape (n_users, n_biomarkers, 2); the last axis is
+            RANGE_TYPES, NaN where no range applies
+        """
+        ages = np.asarray(ages, dtype=float)
+        columns = np.array([self._column.get(int(b), -1) for b in biomarker_ids])
+        sex_codes = np.array([SEX_CODES.get(sex, -1) for sex in sexes])
+        bands = np.searchsorted(self.edges, ages, side="right")
+
+        shape = (len(ages), len(columns), len(RANGE_TYPES))
+        lower, upper = np.full(shape, np.nan), np.full(shape, np.nan)
+        valid_users = (sex_codes >= 0) & ~np.isnan(ages)
+        valid_columns = columns >= 0
+        if not valid_users.any() or not valid_columns.any():
+            return lower, upper
+
+        users = np.flatnonzero(valid_users)[:, None, None]
+        cols = np.flatnonzero(valid_columns)[None, :, None]
+        types = np.arange(len(RANGE_TYPES))[None, None, :]
+        gather = (
+            columns[cols],
+            types,
+            sex_codes[users],
+            bands[users],
+        )
+        lower[users, cols, types] = self.lower[gather]
+        upper[users, cols, types] = self.upper[gather]
+        return lower, upper
+
+    def classify(self, biomarker_ids, values, ages, sexes):
+        """
+        Range status of a (n_users x n_biomarkers) value matrix
+
+        Returns:
+            (status, lower, upper): status is an object array of STATUS_NAMES,
+            None where the value is missing or no range applies
+        """
+        values = np.asarray(values, dtype=float)
+        lower, upper = self.bounds(biomarker_ids, ages, sexes)
+        within = (lower <= values[..., None]) & (values[..., None] <= upper)
+        status = STATUS_NAMES[within.sum(axis=2)].astype(object)
+        applicable = ~np.isnan(lower).all(axis=2) | ~np.isnan(upper).all(axis=2)
+        status[~applicable | np.isnan(values)] = None
+        return status, lower, upper
+
+    def evaluate_user(self, biomarkers: List[Dict], age, sex) -> List[Dict]:
+        """
+        The ``/ranges`` rows for one user's latest biomarker rows
+
+        Biomarkers without an applicable range are left out, as before.
+        """
+        if not biomarkers:
+            return []
+        biomarker_ids = [row["biomarkerId"] for row in biomarkers]
+        values = [[_to_float(row["value"]) for row in biomarkers]]
+        status, lower, upper = self.classify(biomarker_ids, values, [age], [sex])
+
+        ranges = []
+        for j, row in enumerate(biomarkers):
+            if status[0, j] is None:
+                continue
+            ranges.append(
+                {
+                    "biomarkerId": row["biomarkerId"],
+                    "name": row["name"],
+                    "value": row["value"],
+                    "status": status[0, j],
+                    **{
+                        f"{range_type}Range": _range_json(
+                            lower[0, j, t], upper[0, j, t]
+                        )
+                        for t, range_type in enumerate(RANGE_TYPES)
+                    },
+                }
+            )
+        return ranges
+
+
+def _to_float(value) -> float:
+    """Decimal/None -> float/NaN"""
+    return np.nan if value is None else float(value)
+
+
+def _range_json(lower: float, upper: float) -> Optional[str]:
+    """JSON string of one range, as the old JSON_OBJECT column (None if absent)"""
+    if np.isnan(lower) and np.isnan(upper):
+        return None
+    return json.dumps(
+        {
+            "max": None if np.isnan(upper) else float(upper),
+            "min": None if np.isnan(lower) else float(lower),
+        }
+    )
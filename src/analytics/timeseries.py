@@ -0,0 +1,136 @@
+"""
+Biomarker Time Series Module.
+
+Implementation for Longevity Biomarker Tracker
+
+Server-side reductions for trend charts: calendar bucketing (day/week/month),
+Largest-Triangle-Three-Buckets downsampling to a fixed number of points, and
+rolling mean/slope over a trailing window. Everything works on NumPy arrays
+of day-resolution dates and float values sorted by date.
+
+Reference:
+- Steinarsson, S. (2013). Downsampling Time Series for Visual Representation.
+  MSc thesis, University of Iceland
+"""
+
+from typing import Dict
+
+import numpy as np
+
+
+BUCKET_UNITS = ("day", "week", "month")
+DAYS_PER_YEAR = 365.25
+
+
+def bucket_starts(dates: np.ndarray, unit: str) -> np.ndarray:
+    """The day itself, or the first day of its week (Monday) or month"""
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    if unit == "day":
+        return dates
+    if unit == "month":
+        return dates.astype("datetime64[M]").astype("datetime64[D]")
+    if unit == "week":
+        # 1970-01-01 was a Thursday: shift so that weeks start on Monday
+        days = dates.astype(np.int64)
+        return (days - (days + 3) % 7).astype("datetime64[D]")
+    raise ValueError(f"bucket must be one of {BUCKET_UNITS}")
+
+
+def bucket_series(dates: np.ndarray, values: np.ndarray, unit: str) -> Dict:
+    """
+    Aggregate a series into calendar buckets
+
+    Returns:
+        Dict of equal-length arrays: date (bucket start), value (mean), min,
+        max, last (value of the bucket's last point) and count, ordered by date
+    """
+    values = np.asarray(values, dtype=float)
+    starts, index = np.unique(bucket_starts(dates, unit), return_inverse=True)
+    counts = np.bincount(index, minlength=len(starts))
+    minimum = np.full(len(starts), np.inf)
+    maximum = np.full(len(starts), -np.inf)
+    np.minimum.at(minimum, index, values)
+    np.maximum.at(maximum, index, values)
+    # ``index`` is non-decreasing for date-sorted input: a bucket ends where it steps
+    last = np.append(np.flatnonzero(np.diff(index)), len(index) - 1)
+    return {
+        "date": starts,
+        "value": np.bincount(index, weights=values, minlength=len(starts)) / counts,
+        "min": minimum,
+        "max": maximum,
+        "last": values[last],
+        "count": counts,
+    }
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets
+
+    The first and last points are always kept; the rest are split into
+    ``n_out - 2`` buckets and from each the point forming the largest
+    triangle with the previously kept point and the next bucket's mean is
+    chosen. Series no longer than ``n_out`` are returned whole.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_start, next_stop = stop, edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[next_start:next_stop].mean() if next_stop > next_start else x[-1]
+        next_y = y[next_start:next_stop].mean() if next_stop > next_start else y[-1]
+        # Twice the triangle area; the constant factor does not change argmax
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        kept[i + 1] = previous
+    return kept
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Mean of each point and the ``window - 1`` before it (NaN until full)"""
+    values = np.asarray(values, dtype=float)
+    out = np.full(len(values), np.nan)
+    if window < 1 or len(values) < window:
+        return out
+    sums = np.cumsum(np.concatenate(([0.0], values)))
+    out[window - 1 :] = (sums[window:] - sums[:-window]) / window
+    return out
+
+
+def rolling_slope(days: np.ndarray, values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Least-squares slope per year over each trailing window (NaN until full)
+
+    Computed from windowed sums of x, y, xy and x², so the cost is linear in
+    the series length whatever the window.
+    """
+    y = np.asarray(values, dtype=float)
+    out = np.full(len(y), np.nan)
+    if window < 2 or len(y) < window:
+        return out
+    x = np.asarray(days, dtype=float)
+    x = (x - x[0]) / DAYS_PER_YEAR  # years since the first point, for stability
+
+    def windowed(series):
+        sums = np.cumsum(np.concatenate(([0.0], series)))
+        return sums[window:] - sums[:-window]
+
+    sum_x, sum_y = windowed(x), windowed(y)
+    sum_xy, sum_xx = windowed(x * y), windowed(x * x)
+    denominator = window * sum_xx - sum_x**2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (window * sum_xy - sum_x * sum_y) / denominator
+    slope[denominator <= 1e-12] = np.nan  # all points on the same day
+    out[window - 1 :] = slope
+    return out
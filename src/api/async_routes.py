@@ -0,0 +1,410 @@
+"""
+Async read endpoints for the Longevity Biomarker API.
+
+Enabled with ``API_ASYNC=1``. The handlers are ``async def`` and talk to MySQL
+through an aiomysql pool, so a single uvicorn worker can keep hundreds of
+requests in flight instead of being capped by Starlette's threadpool. They run
+the same SQL (``queries.py``) and shaping helpers (``common.py``) as the sync
+handlers, so responses are identical in both modes. Write endpoints stay sync.
+"""
+
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from src.api import queries
+from src.api.catalog import catalog
+from src.api.cohort import cohort
+from src.api.profiling import async_cursor_class, profiler
+from src.api.ranges import user_ranges
+from src.api.response_cache import response_cache
+from src.api.common import (
+    MAX_HISTORY_PAGE_SIZE,
+    MAX_TREND_POINTS,
+    MAX_TREND_WINDOW,
+    MAX_USERS_PAGE_SIZE,
+    NDJSON_BATCH_ROWS,
+    bio_age_history_query,
+    build_user_list_query,
+    ndjson_lines,
+    multi_trend_query,
+    parse_biomarker_ids,
+    parse_trend_range,
+    trend_query,
+    shape_bio_age_history,
+    shape_bio_ages,
+    shape_multi_trend,
+    shape_session,
+    shape_trend,
+    shape_user_page,
+    shape_user_profile,
+)
+
+try:
+    import aiomysql
+except ImportError:  # optional dependency, only needed when API_ASYNC is set
+    aiomysql = None
+
+
+_pool_settings = {}
+async_pool = None
+
+
+def configure(**settings) -> None:
+    """Store connection settings used to create the aiomysql pool on startup"""
+    if aiomysql is None:
+        raise RuntimeError("API_ASYNC requires the aiomysql package")
+    _pool_settings.update(settings)
+
+
+async def open_async_pool():
+    """Create the aiomysql pool"""
+    global async_pool
+    try:
+        async_pool = await aiomysql.create_pool(
+            cursorclass=async_cursor_class(aiomysql.DictCursor),
+            autocommit=False,
+            **_pool_settings,
+        )
+    except Exception as e:
+        print(f"[WARNING] could not open async database pool: {str(e)}")
+        async_pool = None
+
+
+async def close_async_pool():
+    """Close the aiomysql pool and wait for its connections to finish"""
+    global async_pool
+    if async_pool is not None:
+        async_pool.close()
+        await async_pool.wait_closed()
+        async_pool = None
+
+
+router = APIRouter(on_startup=[open_async_pool], on_shutdown=[close_async_pool])
+
+
+async def get_async_db():
+    """Yield a pooled aiomysql connection and roll it back before release"""
+    if async_pool is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Async database pool unavailable",
+        )
+    started = time.perf_counter()
+    async with async_pool.acquire() as connection:
+        profiler.record_connect(time.perf_counter() - started)
+        try:
+            yield connection
+        finally:
+            await connection.rollback()
+
+
+# get_async_db as a plain context manager, for handlers that only sometimes need it
+async_connection = asynccontextmanager(get_async_db)
+
+
+async def stream_rows_async(sql, params):
+    """Async counterpart of ``main.stream_rows`` on an aiomysql SSDictCursor"""
+    async with async_connection() as connection:
+        async with connection.cursor(
+            async_cursor_class(aiomysql.SSDictCursor)
+        ) as cursor:
+            await cursor.execute(sql, params)
+            while True:
+                rows = await cursor.fetchmany(NDJSON_BATCH_ROWS)
+                if not rows:
+                    break
+                for chunk in ndjson_lines(rows):
+                    yield chunk
+
+
+async def cache_lookup(userId: int, request: Request):
+    """``response_cache.lookup``, off the event loop when a shared backend is set"""
+    if response_cache.shared is None:
+        return response_cache.lookup(userId, request)
+    return await run_in_threadpool(response_cache.lookup, userId, request)
+
+
+async def cache_store(slot, content, request: Request):
+    """``response_cache.store``, off the event loop when a shared backend is set"""
+    if response_cache.shared is None:
+        return response_cache.store(slot, content, request)
+    return await run_in_threadpool(response_cache.store, slot, content, request)
+
+
+async def fetch_user_profile(userId: int, db):
+    """Async counterpart of ``main.get_user_profile``"""
+    async with db.cursor() as cursor:
+        await cursor.execute(queries.USER_BASIC, (userId,))
+        user = await cursor.fetchone()
+
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+            )
+
+        await cursor.execute(queries.USER_LATEST_BIOMARKERS, (userId,))
+        biomarkers = await cursor.fetchall()
+
+    return shape_user_profile(user, biomarkers)
+
+
+# ---------------------------------------------------------------------
+# User-profile endpoints
+# ---------------------------------------------------------------------
+@router.get("/api/v1/users")
+async def list_all_users_async(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_USERS_PAGE_SIZE),
+    after: int = Query(0, ge=0),
+    sex: Optional[str] = None,
+    race: Optional[str] = None,
+    minAge: Optional[int] = Query(None, ge=0),
+    maxAge: Optional[int] = Query(None, ge=0),
+    format: str = "json",
+):
+    """Query 1: List users, optionally filtered, paginated by UserID or streamed"""
+    if format not in {"json", "ndjson"}:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format must be 'json' or 'ndjson'",
+        )
+    sql, params = build_user_list_query(after, limit, sex, race, minAge, maxAge)
+    if format == "ndjson":
+        if async_pool is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Async database pool unavailable",
+            )
+        return StreamingResponse(
+            stream_rows_async(sql, params), media_type="application/x-ndjson"
+        )
+
+    async with async_connection() as db:
+        async with db.cursor() as cursor:
+            await cursor.execute(sql, params)
+            users = await cursor.fetchall()
+    return shape_user_page(users, limit)
+
+
+@router.get("/api/v1/users/{userId}/profile")
+async def user_profile_async(userId: int, request: Request):
+    """Query 2: Retrieve the user's profile and latest biomarker data"""
+    cached, slot = await cache_lookup(userId, request)
+    if cached is not None:
+        return cached
+    async with async_connection() as db:
+        profile = await fetch_user_profile(userId, db)
+    return await cache_store(slot, profile, request)
+
+
+@router.get("/api/v1/users/{userId}/bio-age")
+async def get_current_biological_age_async(userId: int, request: Request):
+    """Query 3: Get current biological age (agegap = biological age - chronological age)"""
+    cached, slot = await cache_lookup(userId, request)
+    if cached is not None:
+        return cached
+    async with async_connection() as db:
+        async with db.cursor() as cursor:
+            await cursor.execute(queries.CURRENT_BIO_AGE, (userId,))
+            biological_ages = await cursor.fetchall()
+    if not biological_ages:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No biological age results for user {userId}",
+        )
+    return await cache_store(
+        slot, {"bioAges": shape_bio_ages(biological_ages)}, request
+    )
+
+
+@router.get("/api/v1/users/{userId}/ranges")
+async def reference_range_comparison_async(
+    userId: int, request: Request, type: str = "both"
+):
+    """Query 5: Compare each biomarker against clinical and longevity reference ranges"""
+    cached, slot = await cache_lookup(userId, request)
+    if cached is not None:
+        return cached
+    async with async_connection() as db:
+        async with db.cursor() as cursor:
+            await cursor.execute(queries.USER_BASIC, (userId,))
+            user = await cursor.fetchone()
+            await cursor.execute(queries.USER_LATEST_BIOMARKERS, (userId,))
+            biomarkers = await cursor.fetchall()
+    if catalog.expired():
+        await run_in_threadpool(catalog.get)  # reload uses the sync pool
+    ranges = user_ranges(catalog.get().range_engine, user, biomarkers)
+    return await cache_store(slot, {"ranges": cohort.annotate(ranges, user)}, request)
+
+
+@router.get("/api/v1/users/{userId}/biomarkers/{biomarkerId}/trend")
+async def biomarker_trends_async(
+    userId: int,
+    biomarkerId: int,
+    limit: int = 20,
+    range: str = "6months",
+    bucket: Optional[str] = None,
+    points: Optional[int] = Query(None, ge=3, le=MAX_TREND_POINTS),
+    window: Optional[int] = Query(None, ge=2, le=MAX_TREND_WINDOW),
+    db=Depends(get_async_db),
+):
+    """Query 6: Show historical values for specific biomarker over time"""
+    range_days, range_period = parse_trend_range(range)
+    sql, params = trend_query(userId, biomarkerId, range_period, limit, bucket, points)
+
+    async with db.cursor() as cursor:
+        await cursor.execute(sql, params)
+        trend = await cursor.fetchall()
+    if not trend:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No measurements for this biomarker: {biomarkerId}, user: {userId}, within {range_days} days",
+        )
+    return {"trend": shape_trend(trend, bucket, points, window)}
+
+
+@router.get("/api/v1/users/{userId}/trends")
+async def multi_biomarker_trends_async(
+    userId: int,
+    biomarkerIds: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    range: str = "6months",
+    db=Depends(get_async_db),
+):
+    """Query 6.5: Time series of many (default: all) biomarkers in one query"""
+    range_days, range_period = parse_trend_range(range)
+    sql, params = multi_trend_query(
+        userId, range_period, parse_biomarker_ids(biomarkerIds)
+    )
+
+    async with db.cursor() as cursor:
+        await cursor.execute(sql, params)
+        rows = await cursor.fetchall()
+    return shape_multi_trend(rows, limit)
+
+
+@router.get("/api/v1/users/{userId}/bio-age/history")
+async def get_biological_age_history_async(
+    userId: int,
+    request: Request,
+    model: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_HISTORY_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    bucket: Optional[str] = None,
+    aggregate: str = "last",
+    format: str = "json",
+):
+    """Query 7: Show how biological age has changed over multiple calculations"""
+    query, query_parameters = bio_age_history_query(
+        userId, model, limit, cursor, bucket, aggregate, format
+    )
+    cached, slot = await cache_lookup(userId, request)
+    if cached is not None:
+        return cached
+    async with async_connection() as db:
+        async with db.cursor() as db_cursor:
+            await db_cursor.execute(query, tuple(query_parameters))
+            age_history = await db_cursor.fetchall()
+    return await cache_store(
+        slot,
+        shape_bio_age_history(age_history, limit, cursor, bucket, aggregate, format),
+        request,
+    )
+
+
+@router.get("/api/v1/users/{userId}/sessions/{sessionId}")
+async def get_session_details_async(userId: int, sessionId: int, request: Request):
+    """Query 8: Show all biomarkers measured in a specific lab session"""
+    cached, slot = await cache_lookup(userId, request)
+    if cached is not None:
+        return cached
+    async with async_connection() as db:
+        async with db.cursor() as cursor:
+            await cursor.execute(queries.SESSION_DETAILS, (userId, sessionId))
+            session_data = await cursor.fetchone()
+            if not session_data:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="User's session not found",
+                )
+            shape_session(session_data)
+            await cursor.execute(queries.SESSION_MEASUREMENTS, (sessionId,))
+            measurement_data = await cursor.fetchall()
+    if not measurement_data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No measurements for this session",
+        )
+    return await cache_store(
+        slot, session_data | {"measurements": measurement_data}, request
+    )
+
+
+@router.get("/api/v1/users/{userId}/sessions")
+async def get_user_sessions_async(userId: int, request: Request):
+    """Query 8.5: Get all session IDs (and dates) for a given user."""
+    cached, slot = await cache_lookup(userId, request)
+    if cached is not None:
+        return cached
+    async with async_connection() as db:
+        async with db.cursor() as cursor:
+            await cursor.execute(queries.USER_SESSIONS, (userId,))
+            sessions = await cursor.fetchall()
+    return await cache_store(slot, {"sessions": sessions}, request)
+
+
+# ---------------------------------------------------------------------
+# Catalog and population endpoints
+# ---------------------------------------------------------------------
+@router.get("/api/v1/biomarkers")
+async def biomarker_catalog_async(request: Request):
+    """Query 9: Return all biomarkers with metadata (served from the catalog cache)"""
+    if catalog.expired():
+        await run_in_threadpool(catalog.get)  # reload uses the sync pool
+    return catalog.response("biomarkers", request.headers.get("if-none-match"))
+
+
+@router.get("/api/v1/biomarkers/{biomarkerId}/ranges")
+async def biomarker_reference_ranges_async(biomarkerId: int, request: Request):
+    """Query 10: Get all reference ranges for specific biomarker (cached)"""
+    if catalog.expired():
+        await run_in_threadpool(catalog.get)
+    response = catalog.response(
+        f"ranges/{biomarkerId}", request.headers.get("if-none-match")
+    )
+    if response is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Biomarker not found"
+        )
+    return response
+
+
+@router.get("/api/v1/users/age-distribution")
+async def get_age_distribution_async(db=Depends(get_async_db)):
+    """Query 11: Show user count by age groups"""
+    async with db.cursor() as cursor:
+        await cursor.execute(queries.AGE_DISTRIBUTION)
+        return {"ageDistribution": await cursor.fetchall()}
+
+
+@router.get("/api/v1/biomarkers/measurement-summary")
+async def get_biomarkers_with_counts_async(db=Depends(get_async_db)):
+    """Query 12: List all biomarkers with their measurement count"""
+    async with db.cursor() as cursor:
+        await cursor.execute(queries.MEASUREMENT_SUMMARY)
+        return {"biomarkers": await cursor.fetchall()}
+
+
+@router.get("/api/v1/cohort/percentiles")
+async def get_cohort_percentiles_async(biomarkerId: Optional[int] = None):
+    """Query 13: Population percentiles per biomarker, sex and age band"""
+    return cohort.response("biomarkers", biomarkerId, "biomarkerId")
+
+
+@router.get("/api/v1/cohort/bio-age-gaps")
+async def get_cohort_bio_age_gaps_async(model: Optional[str] = None):
+    """Query 14: Distribution of biological age gaps per model, sex and age band"""
+    return cohort.bio_age_gap_response(model)
@@ -0,0 +1,286 @@
+"""
+Biological age scoring shared by the API and the batch CLI.
+
+Fits the HD model from the reference population and scores whole cohorts:
+the latest biomarkers for every requested user are read in one set-based
+query, Phenotypic Age and HD are computed over the full (n_users x 9) matrix
+with NumPy, and results are written with multi-row INSERTs.
+"""
+
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.hd import HD_ARTIFACT_VERSION, HomeostasisDysregulation
+from src.analytics.phenotypic_age import PhenotypicAge
+from src.api import queries
+
+
+BIO_AGE_MODEL_IDS = {"Phenotypic Age": 1, "Homeostatic Dysregulation": 2}
+N_BIOMARKERS = 9
+GLUCOSE_COLUMN = 3  # BiomarkerID 4, converted mg/dL → mmol/L before scoring
+
+
+@dataclass
+class BiomarkerMatrix:
+    """Latest biomarker values for a cohort, one row per user"""
+
+    user_ids: np.ndarray
+    ages: np.ndarray
+    values: np.ndarray  # (n_users, 9), column j holds BiomarkerID j + 1
+    biomarker_names: List[str]
+    sexes: Optional[np.ndarray] = None
+
+
+def fit_hd_model(connection) -> Optional[HomeostasisDysregulation]:
+    """Fit HD on the healthy young reference population (None if too small)"""
+    with connection.cursor() as cursor:
+        cursor.execute(queries.HD_REFERENCE_POPULATION)
+        reference_df = cursor.fetchall()
+    if not reference_df:
+        # raise RuntimeError("No reference population available for HD calculation")
+        print("No reference population available for HD calculation")
+
+    reference_df = pd.DataFrame(reference_df)
+
+    # Convert all decimal.Decimal columns to float
+    reference_df["Value"] = reference_df["Value"].astype(float)
+    reference_df["BMI"] = reference_df["BMI"].astype(float)
+
+    # Unit conversion: mg/dL → mmol/L - RD: Small fix to resolve Pandas warning in API
+    glucose_mask = reference_df["BiomarkerID"] == 4
+    reference_df.loc[glucose_mask, "Value"] = (
+        reference_df.loc[glucose_mask, "Value"] / 18
+    )
+    biomarker_columns = reference_df["BiomarkerName"].unique()
+
+    # Pivot to get biomarkers as columns
+    reference_df = reference_df.pivot_table(
+        index=["UserID", "Age", "BMI", "Sex"],
+        columns="BiomarkerName",
+        values="Value",
+    ).reset_index()
+
+    # Ensure we have all 9 biomarkers for each person
+    reference_df = reference_df.dropna()
+
+    print(
+        f"HD reference population: {len(reference_df)} people with complete biomarker data"
+    )
+
+    # RD 5-27 final review: Guard against empty reference population
+    if len(reference_df) < 20:
+        print(
+            f"[WARNING] HD reference population too small ({len(reference_df)} < 20). HD model disabled."
+        )
+        return None
+
+    hd_model = HomeostasisDysregulation()
+    hd_model.fit_reference_population(reference_df, biomarker_columns, "Age")
+    return hd_model
+
+
+def hd_reference_fingerprint(connection) -> str:
+    """Hash of the HD reference population (and artifact format version)"""
+    with connection.cursor() as cursor:
+        cursor.execute(queries.HD_REFERENCE_FINGERPRINT)
+        row = cursor.fetchone()
+    summary = f"{HD_ARTIFACT_VERSION}:{row['rowCount']}:{row['checksum']}"
+    return hashlib.sha256(summary.encode()).hexdigest()[:16]
+
+
+def load_or_fit_hd_model(connection, model_dir) -> Optional[HomeostasisDysregulation]:
+    """
+    Load the HD artifact for the current reference population, fitting it once
+
+    Artifacts are stored as ``<model_dir>/hd-<fingerprint>.npz``; when the
+    reference population changes the fingerprint changes, the model is refit
+    and artifacts for older fingerprints are removed.
+    """
+    fingerprint = hd_reference_fingerprint(connection)
+    model_dir = Path(model_dir)
+    path = model_dir / f"hd-{fingerprint}.npz"
+
+    if path.exists():
+        try:
+            hd_model = HomeostasisDysregulation.load(path)
+            print(f"HD model loaded from {path}")
+            return hd_model
+        except Exception as e:
+            print(f"[WARNING] could not load HD artifact {path}: {str(e)}; refitting")
+
+    hd_model = fit_hd_model(connection)
+    if hd_model is None:
+        return None
+    try:
+        hd_model.save(
+            path,
+            fingerprint=fingerprint,
+            fitted_at=datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        )
+        for stale in model_dir.glob("hd-*.npz"):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+        print(f"HD model saved to {path}")
+    except OSError as e:
+        print(f"[WARNING] could not save HD artifact {path}: {str(e)}")
+    return hd_model
+
+
+def fetch_latest_biomarker_matrix(cursor, user_ids=None) -> BiomarkerMatrix:
+    """
+    Read the latest value of each of the 9 biomarkers for many users at once
+
+    Args:
+        cursor: DictCursor on an open connection
+        user_ids: Iterable of user IDs, or None for every user
+
+    Returns:
+        BiomarkerMatrix with NaN where a user has no value for a biomarker
+    """
+    if user_ids is None:
+        cursor.execute(queries.COHORT_LATEST_BIOMARKERS)
+    else:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return BiomarkerMatrix(
+                np.empty(0, dtype=np.int64),
+                np.empty(0),
+                np.empty((0, 9)),
+                [],
+                np.empty(0, dtype=object),
+            )
+        placeholders = ", ".join(["%s"] * len(user_ids))
+        cursor.execute(
+            queries.COHORT_LATEST_BIOMARKERS_FOR_USERS.format(
+                placeholders=placeholders
+            ),
+            user_ids,
+        )
+    rows = cursor.fetchall()
+
+    names = [""] * N_BIOMARKERS
+    row_user_ids = np.fromiter((row["UserID"] for row in rows), np.int64, len(rows))
+    columns = np.fromiter((row["BiomarkerID"] - 1 for row in rows), np.int64, len(rows))
+    row_values = np.fromiter((float(row["Value"]) for row in rows), float, len(rows))
+    row_ages = np.fromiter((row["Age"] for row in rows), float, len(rows))
+    row_sexes = np.array([row.get("Sex") for row in rows], dtype=object)
+    for row in rows:
+        names[row["BiomarkerID"] - 1] = row["BiomarkerName"]
+
+    unique_ids, row_index = np.unique(row_user_ids, return_inverse=True)
+    values = np.full((len(unique_ids), N_BIOMARKERS), np.nan)
+    values[row_index, columns] = row_values
+    ages = np.empty(len(unique_ids))
+    ages[row_index] = row_ages
+    sexes = np.empty(len(unique_ids), dtype=object)
+    sexes[row_index] = row_sexes
+
+    return BiomarkerMatrix(unique_ids, ages, values, names, sexes)
+
+
+def hd_age_batch(
+    hd_model: HomeostasisDysregulation,
+    values: np.ndarray,
+    ages: np.ndarray,
+    biomarker_names: List[str],
+) -> np.ndarray:
+    """HD ages via the chunked ``HomeostasisDysregulation.score`` core"""
+    converted = values.copy()
+    # Unit conversion for fasting glucose
+    converted[:, GLUCOSE_COLUMN] /= 18.0
+    # Columns arrive in BiomarkerID order; the model keeps its fit order
+    order = [biomarker_names.index(name) for name in hd_model.biomarker_names_]
+    hd_scores = hd_model.score(converted[:, order])
+    return np.round(ages + (hd_scores - 2.5) * 4, 2)
+
+
+def calculate_batch(
+    connection,
+    user_ids=None,
+    models=None,
+    hd_model=None,
+    phenotypic_age: Optional[PhenotypicAge] = None,
+) -> Dict:
+    """
+    Compute and store biological ages for a cohort in one transaction
+
+    Args:
+        connection: PyMySQL connection (committed on success)
+        user_ids: List of user IDs, or None for all users
+        models: Model names to compute (default: all available)
+        hd_model: Fitted HD model, required for "Homeostatic Dysregulation"
+        phenotypic_age: Engine built from cached coefficients (read from the
+            database when omitted)
+
+    Returns:
+        Summary dict with per-model counts and users skipped for missing or
+        out-of-domain data (no finite age from every requested model)
+    """
+    models = list(models or BIO_AGE_MODEL_IDS)
+    if "Homeostatic Dysregulation" in models and hd_model is None:
+        raise ValueError("HD model unavailable, only Phenotypic Age model available")
+
+    computed_at = datetime.now()
+    timestamp = computed_at.strftime("%Y-%m-%d %H:%M:%S")
+
+    with connection.cursor() as cursor:
+        matrix = fetch_latest_biomarker_matrix(cursor, user_ids)
+        complete = np.isfinite(matrix.values).all(axis=1) & np.isfinite(matrix.ages)
+        values = matrix.values[complete]
+        ages = matrix.ages[complete]
+        scored_ids = matrix.user_ids[complete]
+
+        bio_ages = {}
+        # Non-positive CRP/WBC make the log terms -inf/NaN; those users are
+        # dropped below instead of failing the whole INSERT
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if "Phenotypic Age" in models:
+                if phenotypic_age is None:
+                    cursor.execute(queries.PHENOTYPIC_COEFFICIENTS)
+                    phenotypic_age = PhenotypicAge.from_coefficients(cursor.fetchall())
+                bio_ages["Phenotypic Age"] = np.round(
+                    phenotypic_age.score(values, ages).phenotypic_age, 2
+                )
+            if "Homeostatic Dysregulation" in models and len(values):
+                bio_ages["Homeostatic Dysregulation"] = hd_age_batch(
+                    hd_model, values, ages, matrix.biomarker_names
+                )
+        finite = np.ones(len(scored_ids), dtype=bool)
+        for model_ages in bio_ages.values():
+            finite &= np.isfinite(model_ages)
+        scored_ids = scored_ids[finite]
+        bio_ages = {model: model_ages[finite] for model, model_ages in bio_ages.items()}
+
+        rows = [
+            (
+                int(user_id),
+                BIO_AGE_MODEL_IDS[model],
+                float(bio_age),
+                timestamp,
+                timestamp,
+            )
+            for model, model_ages in bio_ages.items()
+            for user_id, bio_age in zip(scored_ids, model_ages)
+        ]
+        # PyMySQL rewrites executemany on INSERT ... VALUES into multi-row statements
+        if rows:
+            cursor.executemany(queries.INSERT_BIO_AGE_RESULT, rows)
+    connection.commit()
+
+    requested = set(matrix.user_ids.tolist())
+    if user_ids is not None:
+        requested |= set(user_ids)
+    skipped = sorted(requested - set(scored_ids.tolist()))
+    return {
+        "computedAt": computed_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "usersScored": int(len(scored_ids)),
+        "usersSkipped": skipped,
+        "resultsInserted": len(rows),
+        "models": {model: int(len(ages)) for model, ages in bio_ages.items()},
+    }
@@ -0,0 +1,210 @@
+"""
+In-process cache of the static catalog tables.
+
+``Biomarker``, ``BiologicalAgeModel``, ``ModelUsesBiomarker`` and
+``ReferenceRange`` only change when the seed or ETL runs, so they are read
+once into an immutable, versioned snapshot that is refreshed after a TTL or
+on explicit invalidation (``POST /api/v1/admin/cache/invalidate``). The
+catalog endpoints are pre-rendered to JSON with an ETag per resource, so they
+are served, or answered with 304, without touching the database.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Response, status
+from fastapi.encoders import jsonable_encoder
+
+from src.analytics.phenotypic_age import PhenotypicAge
+from src.analytics.reference_ranges import ReferenceRangeEngine
+from src.api import queries
+from src.api.bio_age import BIO_AGE_MODEL_IDS
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """One consistent read of the catalog tables"""
+
+    version: int
+    loaded_at: float
+    biomarkers: List[Dict]
+    models: List[Dict]
+    coefficients: Dict[int, List[Dict]]  # ModelID -> ModelUsesBiomarker rows
+    reference_ranges: Dict[int, List[Dict]]  # BiomarkerID -> ranges
+    phenotypic_age: Optional[PhenotypicAge] = None
+    range_engine: Optional[ReferenceRangeEngine] = None
+    rendered: Dict[str, Tuple[bytes, str]] = field(default_factory=dict)
+
+
+def render(content) -> Tuple[bytes, str]:
+    """Serialize like FastAPI's JSONResponse and derive a strong ETag"""
+    body = json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    return body, '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evaluate an If-None-Match header (weak comparison, as for GET)"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in (tag.removeprefix("W/") for tag in candidates)
+
+
+class CatalogCache:
+    """
+    TTL cache holding the latest ``CatalogSnapshot``
+
+    Args:
+        ttl: Seconds a snapshot is served before it is reloaded
+        connection: Callable returning a context manager that yields a
+            DictCursor connection (e.g. ``ConnectionPool.connection``)
+    """
+
+    def __init__(self, ttl: float = 300.0, connection: Optional[Callable] = None):
+        """Create an empty cache; nothing is loaded until first use"""
+        self.ttl = ttl
+        self.connection = connection
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock = threading.Lock()
+        self._version = 0
+        self._hits = 0
+        self._loads = 0
+        self._load_errors = 0
+        self._invalidations = 0
+
+    def bind(self, connection: Callable, ttl: Optional[float] = None) -> None:
+        """Set the connection source (and optionally the TTL)"""
+        self.connection = connection
+        if ttl is not None:
+            self.ttl = ttl
+
+    def expired(self) -> bool:
+        """True if the next ``get`` will have to hit the database"""
+        snapshot = self._snapshot
+        return snapshot is None or time.monotonic() - snapshot.loaded_at >= self.ttl
+
+    def get(self) -> CatalogSnapshot:
+        """Return the current snapshot, reloading it if missing or expired"""
+        if not self.expired():
+            self._hits += 1
+            return self._snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if not self.expired():
+                self._hits += 1
+                return snapshot
+            try:
+                self._snapshot = self._load()
+            except Exception as e:
+                self._load_errors += 1
+                if snapshot is None:
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail=f"Catalog unavailable: {str(e)}",
+                    )
+                # Keep serving the stale snapshot rather than failing requests
+                print(f"[WARNING] catalog reload failed, serving stale copy: {e}")
+                return snapshot
+            return self._snapshot
+
+    def invalidate(self) -> None:
+        """Drop the snapshot so the next request reloads from the database"""
+        with self._lock:
+            self._snapshot = None
+            self._invalidations += 1
+
+    def response(self, key: str, if_none_match: Optional[str] = None):
+        """
+        Serve a pre-rendered catalog resource
+
+        Returns:
+            Response (200 with ETag or 304), or None if ``key`` is unknown
+        """
+        rendered = self.get().rendered.get(key)
+        if rendered is None:
+            return None
+        body, etag = rendered
+        if etag_matches(if_none_match, etag):
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+            )
+        return Response(
+            content=body, media_type="application/json", headers={"ETag": etag}
+        )
+
+    def stats(self) -> Dict:
+        """Report snapshot version/age and hit/load counters"""
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot else None,
+            "ageSeconds": (
+                round(time.monotonic() - snapshot.loaded_at, 3) if snapshot else None
+            ),
+            "ttlSeconds": self.ttl,
+            "hits": self._hits,
+            "loads": self._loads,
+            "loadErrors": self._load_errors,
+            "invalidations": self._invalidations,
+        }
+
+    def _load(self) -> CatalogSnapshot:
+        """Read all catalog tables in one transaction and pre-render responses"""
+        if self.connection is None:
+            raise RuntimeError("catalog cache has no database connection bound")
+        with self.connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(queries.BIOMARKER_CATALOG)
+                biomarkers = cursor.fetchall()
+                cursor.execute(queries.BIO_AGE_MODEL_CATALOG)
+                models = cursor.fetchall()
+                cursor.execute(queries.MODEL_COEFFICIENTS)
+                coefficient_rows = cursor.fetchall()
+                cursor.execute(queries.REFERENCE_RANGES)
+                range_rows = cursor.fetchall()
+
+        range_engine = ReferenceRangeEngine(range_rows)
+        coefficients = defaultdict(list)
+        for row in coefficient_rows:
+            coefficients[row.pop("modelId")].append(row)
+        reference_ranges = defaultdict(list)
+        for row in range_rows:
+            reference_ranges[row.pop("biomarkerId")].append(row)
+
+        phenotypic_rows = coefficients.get(BIO_AGE_MODEL_IDS["Phenotypic Age"])
+        rendered = {"biomarkers": render({"biomarkers": biomarkers})}
+        for biomarker_id, ranges in reference_ranges.items():
+            rendered[f"ranges/{biomarker_id}"] = render({"ranges": ranges})
+
+        self._version += 1
+        self._loads += 1
+        return CatalogSnapshot(
+            version=self._version,
+            loaded_at=time.monotonic(),
+            biomarkers=biomarkers,
+            models=models,
+            coefficients=dict(coefficients),
+            reference_ranges=dict(reference_ranges),
+            phenotypic_age=(
+                PhenotypicAge.from_coefficients(phenotypic_rows)
+                if phenotypic_rows
+                else None
+            ),
+            range_engine=range_engine,
+            rendered=rendered,
+        )
+
+
+# Shared by the sync and async handlers; bound to the pool in main.py
+catalog = CatalogCache()
@@ -0,0 +1,167 @@
+"""
+Population percentile tables served by the API.
+
+Built by ``src.analytics.cohort`` from the latest value of every user and
+biomarker, and from the age gap of every user's latest bio-age result per
+model. The tables are persisted as ``.npz`` artifacts keyed by a fingerprint
+of their source rows (so a restart reuses them, as for the HD model) and are
+held in process, which lets ``/ranges`` attach each value's population
+percentile with a binary search instead of a query over the population.
+"""
+
+import hashlib
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, status
+
+from src.analytics.cohort import COHORT_ARTIFACT_VERSION, PercentileTable
+from src.api import queries
+from src.api.bio_age import BIO_AGE_MODEL_IDS
+
+
+def cohort_fingerprint(connection) -> str:
+    """Hash of the rows the tables are built from (and the artifact version)"""
+    with connection.cursor() as cursor:
+        cursor.execute(queries.COHORT_FINGERPRINT)
+        row = cursor.fetchone()
+    summary = f"{COHORT_ARTIFACT_VERSION}:" + ":".join(
+        str(row[column])
+        for column in (
+            "asOf",
+            "latestRows",
+            "latestChecksum",
+            "resultRows",
+            "lastResultId",
+        )
+    )
+    return hashlib.sha256(summary.encode()).hexdigest()[:16]
+
+
+def build_tables(connection):
+    """Read the source rows and build (biomarker table, bio-age gap table)"""
+    with connection.cursor() as cursor:
+        cursor.execute(queries.COHORT_PERCENTILE_SOURCE)
+        values = cursor.fetchall()
+        cursor.execute(queries.BIO_AGE_GAP_SOURCE)
+        gaps = cursor.fetchall()
+    biomarkers = PercentileTable.build(
+        [row["BiomarkerID"] for row in values],
+        [row["Sex"] for row in values],
+        [row["Age"] for row in values],
+        [float(row["Value"]) for row in values],
+    )
+    bio_age_gaps = PercentileTable.build(
+        [row["ModelID"] for row in gaps],
+        [row["Sex"] for row in gaps],
+        [row["Age"] for row in gaps],
+        [float(row["AgeGap"]) for row in gaps],
+    )
+    return biomarkers, bio_age_gaps
+
+
+class CohortStore:
+    """The current percentile tables, shared by the sync and async handlers"""
+
+    TABLES = ("biomarkers", "bio-age-gaps")
+
+    def __init__(self):
+        """Start empty; ``refresh`` loads or builds the tables"""
+        self.tables: Dict[str, PercentileTable] = {}
+        self.fingerprint: Optional[str] = None
+        self.built_at: Optional[str] = None
+        self._lock = threading.Lock()
+        self._builds = 0
+        self._loads = 0
+
+    def refresh(self, connection, model_dir, force: bool = False) -> None:
+        """
+        Load the artifacts for the current fingerprint, building them if needed
+
+        Artifacts are ``<model_dir>/cohort-<table>-<fingerprint>.npz``; those
+        of older fingerprints are removed after a build.
+        """
+        with self._lock:
+            fingerprint = cohort_fingerprint(connection)
+            model_dir = Path(model_dir)
+            paths = {
+                name: model_dir / f"cohort-{name}-{fingerprint}.npz"
+                for name in self.TABLES
+            }
+
+            if not force and all(path.exists() for path in paths.values()):
+                try:
+                    self.tables = {
+                        name: PercentileTable.load(path) for name, path in paths.items()
+                    }
+                    self.fingerprint = fingerprint
+                    self._loads += 1
+                    return
+                except Exception as e:
+                    print(
+                        f"[WARNING] could not load cohort tables: {str(e)}; rebuilding"
+                    )
+
+            tables = dict(zip(self.TABLES, build_tables(connection)))
+            built_at = datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
+            self.tables, self.fingerprint, self.built_at = tables, fingerprint, built_at
+            self._builds += 1
+            try:
+                for name, table in tables.items():
+                    table.save(paths[name], fingerprint=fingerprint, built_at=built_at)
+                for stale in model_dir.glob("cohort-*.npz"):
+                    if stale not in paths.values():
+                        stale.unlink(missing_ok=True)
+            except OSError as e:
+                print(f"[WARNING] could not save cohort tables: {str(e)}")
+
+    def annotate(self, ranges: List[Dict], user: Optional[Dict]) -> List[Dict]:
+        """Add each range row's population ``percentile`` (None if unknown)"""
+        table = self.tables.get("biomarkers")
+        for row in ranges:
+            row["percentile"] = (
+                table.percentile(
+                    row["biomarkerId"], user["sex"], user["age"], row["value"]
+                )
+                if table is not None and user
+                else None
+            )
+        return ranges
+
+    def response(self, name: str, feature_id: Optional[int], id_name: str) -> Dict:
+        """Summary percentiles of one table, or 503 before the first refresh"""
+        table = self.tables.get(name)
+        if table is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Cohort percentile tables not built yet",
+            )
+        return {
+            "fingerprint": self.fingerprint,
+            "groups": table.describe(feature_id, id_name),
+        }
+
+    def bio_age_gap_response(self, model: Optional[str]) -> Dict:
+        """Age-gap percentiles of every model, or of one model by name"""
+        if model is not None and model not in BIO_AGE_MODEL_IDS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid model"
+            )
+        model_id = BIO_AGE_MODEL_IDS.get(model)
+        return self.response("bio-age-gaps", model_id, "modelId")
+
+    def stats(self) -> Dict:
+        """Report table sizes and build/load counters"""
+        return {
+            "fingerprint": self.fingerprint,
+            "builtAt": self.built_at,
+            "groups": {name: len(table) for name, table in self.tables.items()},
+            "builds": self._builds,
+            "loads": self._loads,
+        }
+
+
+# Shared by the sync and async handlers; refreshed on startup in main.py
+cohort = CohortStore()
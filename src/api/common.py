@@ -0,0 +1,444 @@
+"""
+Helpers shared by the sync and async route handlers.
+
+Used by ``main.py`` and ``async_routes.py`` so both modes return identical
+response shapes.
+"""
+
+from datetime import date, datetime, timedelta
+from itertools import groupby
+import json
+import re
+import numpy as np
+from fastapi import HTTPException, status
+
+from src.analytics.timeseries import (
+    BUCKET_UNITS,
+    bucket_series,
+    lttb,
+    rolling_mean,
+    rolling_slope,
+)
+from src.api import queries
+from src.api.bio_age import BIO_AGE_MODEL_IDS
+
+
+TREND_RANGE_PATTERN = re.compile(r"^(\d+)\s*(day|week|month|year)s?$")
+MAX_USERS_PAGE_SIZE = 1000
+NDJSON_BATCH_ROWS = 500
+MAX_TREND_POINTS = 1000
+MAX_TREND_WINDOW = 365
+MAX_HISTORY_PAGE_SIZE = 1000
+HISTORY_AGGREGATES = ("last", "mean")
+HISTORY_FORMATS = ("json", "columnar")
+# Rows read for a bucketed/downsampled trend; bounds memory per request
+TREND_SERIES_ROWS = 100_000
+HISTORY_SERIES_ROWS = 100_000
+
+
+def format_timestamp(value):
+    """Format a DATETIME/TIMESTAMP as the API's ISO-8601 UTC string"""
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return value
+
+
+def shape_user_profile(user, biomarkers):
+    """Build the /profile payload from the user row and latest biomarker rows"""
+    if isinstance(user.get("birthDate"), date):
+        user["birthDate"] = user["birthDate"].isoformat()
+
+    for biomarker in biomarkers:
+        if isinstance(biomarker.get("takenAt"), date):
+            biomarker["takenAt"] = biomarker["takenAt"].isoformat()
+
+    return {"user": user, "biomarkers": biomarkers}
+
+
+def shape_bio_ages(rows):
+    """Format computedAt on biological age result rows in place"""
+    for row in rows:
+        row["computedAt"] = format_timestamp(row.get("computedAt"))
+    return rows
+
+
+def shape_session(session_data):
+    """Normalize sessionDate and fastingStatus on a session row in place"""
+    if isinstance(session_data.get("sessionDate"), date):
+        session_data["sessionDate"] = session_data["sessionDate"].isoformat()
+    if session_data.get("fastingStatus"):
+        session_data["fastingStatus"] = True if session_data["fastingStatus"] else False
+    return session_data
+
+
+def parse_trend_range(range: str):
+    """Parse '<number> <days|weeks|months|years>' into (days, cutoff datetime)"""
+    range = range.strip()
+
+    # RD 5-27 Fix: More flexible parsing: "6 months", "6months", "6 month" all work
+    match = TREND_RANGE_PATTERN.match(range.lower())
+    if not match:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Range must be in format: '<number> <days|weeks|months|years>' (e.g., '6 months')",
+        )
+
+    number, text = int(match.group(1)), match.group(2)
+    years, months, weeks, days = 0, 0, 0, 0
+    if text in {"day", "d"}:
+        days = number
+    elif text in {"week", "w"}:
+        weeks = number
+    elif text in {"month", "m"}:
+        months = number
+    elif text in {"year", "y"}:
+        years = number
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Input range must be in '<number> <days|weeks|months|years>' format",
+        )
+    range_days = 1 * days + 7 * weeks + 31 * months + 365 * years
+    return range_days, datetime.today() - timedelta(days=range_days)
+
+
+def parse_user_ids(body):
+    """``userIds`` of a batch request body: a list of ints, or None for all"""
+    user_ids = body.get("userIds", "all")
+    if user_ids == "all":
+        return None
+    if not isinstance(user_ids, list) or not all(
+        isinstance(user_id, int) for user_id in user_ids
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='userIds must be a list of integers or "all"',
+        )
+    return user_ids
+
+
+def bad_request(detail):
+    """A 400 HTTPException with ``detail``"""
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def history_cursor(row):
+    """Keyset cursor of a history row: '<modelId>:<computedAt>'"""
+    return f"{row['modelId']}:{row['computedAt']:%Y-%m-%dT%H:%M:%S}"
+
+
+def parse_history_cursor(cursor):
+    """'<modelId>:<computedAt>' -> (model ID, datetime), 400 if malformed"""
+    try:
+        model_id, computed_at = cursor.split(":", 1)
+        return int(model_id), datetime.fromisoformat(computed_at)
+    except ValueError:
+        raise bad_request("Invalid cursor")
+
+
+def bio_age_history_query(
+    user_id,
+    model=None,
+    limit=None,
+    cursor=None,
+    bucket=None,
+    aggregate="last",
+    format="json",
+):
+    """
+    The bio-age history statement and params
+
+    Without ``limit`` or ``bucket`` every result is returned newest first, as
+    before. ``limit`` (and ``cursor``) select a keyset page, ``bucket`` a
+    per-model aggregated series; the two cannot be combined.
+    """
+    if bucket is not None and bucket not in BUCKET_UNITS:
+        raise bad_request(f"bucket must be one of {', '.join(BUCKET_UNITS)}")
+    if aggregate not in HISTORY_AGGREGATES:
+        raise bad_request(f"aggregate must be one of {', '.join(HISTORY_AGGREGATES)}")
+    if format not in HISTORY_FORMATS:
+        raise bad_request(f"format must be one of {', '.join(HISTORY_FORMATS)}")
+    if bucket is not None and (limit is not None or cursor is not None):
+        raise bad_request("bucket cannot be combined with limit or cursor")
+
+    query, params = queries.BIO_AGE_HISTORY, [user_id, user_id]
+    if model in BIO_AGE_MODEL_IDS:
+        query += queries.BIO_AGE_HISTORY_MODEL_FILTER
+        params.append(BIO_AGE_MODEL_IDS[model])
+
+    if bucket is not None:
+        query += queries.BIO_AGE_HISTORY_SERIES_ORDER
+        params.append(HISTORY_SERIES_ROWS)
+    elif limit is not None or cursor is not None:
+        if cursor is not None:
+            model_id, computed_at = parse_history_cursor(cursor)
+            query += queries.BIO_AGE_HISTORY_CURSOR_FILTER
+            params += [model_id, model_id, computed_at]
+        query += queries.BIO_AGE_HISTORY_PAGE_ORDER
+        params.append(limit or MAX_HISTORY_PAGE_SIZE)
+    else:
+        query += queries.BIO_AGE_HISTORY_ORDER
+    return query, params
+
+
+def _optional_float(value):
+    """Decimal/None -> float/NaN"""
+    return np.nan if value is None else float(value)
+
+
+def _json_float(value, digits=2):
+    """Float/NaN -> rounded float/None"""
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def bucket_bio_age_history(rows, bucket, aggregate="last"):
+    """
+    Aggregate history rows (ordered by model, then time) per model and bucket
+
+    Each bucket keeps the last value or the mean of bioAgeYears and ageGap.
+    """
+    pick = "value" if aggregate == "mean" else "last"
+    bucketed = []
+    for model_id, model_rows in groupby(rows, key=lambda row: row["modelId"]):
+        model_rows = list(model_rows)
+        dates = np.array(
+            [row["computedAt"] for row in model_rows], dtype="datetime64[D]"
+        )
+        bio_ages = bucket_series(
+            dates, [_optional_float(row["bioAgeYears"]) for row in model_rows], bucket
+        )
+        gaps = bucket_series(
+            dates, [_optional_float(row["ageGap"]) for row in model_rows], bucket
+        )
+        bucketed.extend(
+            {
+                "modelId": model_id,
+                "modelName": model_rows[0]["modelName"],
+                "date": str(day),
+                "bioAgeYears": _json_float(bio_age),
+                "ageGap": _json_float(gap),
+                "count": int(count),
+            }
+            for day, bio_age, gap, count in zip(
+                bio_ages["date"], bio_ages[pick], gaps[pick], bio_ages["count"]
+            )
+        )
+    return bucketed
+
+
+def columnar_bio_age_history(rows, time_key):
+    """Per-model columns (oldest first): {modelName: {time_key, bioAgeYears, ageGap}}"""
+    models = {}
+    for row in sorted(rows, key=lambda row: row[time_key]):
+        columns = models.setdefault(
+            row["modelName"], {time_key: [], "bioAgeYears": [], "ageGap": []}
+        )
+        columns[time_key].append(row[time_key])
+        columns["bioAgeYears"].append(
+            None if row["bioAgeYears"] is None else float(row["bioAgeYears"])
+        )
+        columns["ageGap"].append(
+            None if row["ageGap"] is None else float(row["ageGap"])
+        )
+    return models
+
+
+def shape_bio_age_history(
+    rows, limit=None, cursor=None, bucket=None, aggregate="last", format="json"
+):
+    """
+    Build the /bio-age/history payload from ``bio_age_history_query`` rows
+
+    ``nextCursor`` is added for keyset pages, set only when more may follow.
+    """
+    keyset = bucket is None and (limit is not None or cursor is not None)
+    next_cursor = None
+    if keyset and len(rows) == (limit or MAX_HISTORY_PAGE_SIZE):
+        next_cursor = history_cursor(rows[-1])
+
+    if bucket is not None:
+        rows, time_key = bucket_bio_age_history(rows, bucket, aggregate), "date"
+    else:
+        rows, time_key = shape_bio_ages(rows), "computedAt"
+    for row in rows:
+        row.pop("modelId")
+
+    if format == "columnar":
+        payload = {"models": columnar_bio_age_history(rows, time_key)}
+    else:
+        payload = {"history": rows}
+    if keyset:
+        payload["nextCursor"] = next_cursor
+    return payload
+
+
+def trend_query(user_id, biomarker_id, since, limit, bucket=None, points=None):
+    """The trend statement and params: latest ``limit`` rows, or the range"""
+    if bucket is not None and bucket not in BUCKET_UNITS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"bucket must be one of {', '.join(BUCKET_UNITS)}",
+        )
+    if bucket is None and points is None:
+        return queries.BIOMARKER_TREND, (user_id, biomarker_id, since, limit)
+    return queries.BIOMARKER_TREND_SERIES, (
+        user_id,
+        biomarker_id,
+        since,
+        TREND_SERIES_ROWS,
+    )
+
+
+def parse_biomarker_ids(biomarker_ids):
+    """Comma-separated BiomarkerIDs ("1,4,9") -> list of ints, None for all"""
+    if not biomarker_ids:
+        return None
+    try:
+        return sorted({int(part) for part in biomarker_ids.split(",") if part.strip()})
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="biomarkerIds must be comma-separated integers",
+        )
+
+
+def multi_trend_query(user_id, since, biomarker_ids=None):
+    """The multi-biomarker trend statement and params"""
+    params = [user_id, since]
+    biomarkers = ""
+    if biomarker_ids:
+        biomarkers = queries.MULTI_TREND_BIOMARKER_FILTER
+        params.append(biomarker_ids)
+    params.append(TREND_SERIES_ROWS)
+    return queries.MULTI_BIOMARKER_TREND.format(biomarkers=biomarkers), params
+
+
+def shape_multi_trend(rows, limit=None):
+    """
+    Group (date, session, biomarker, value) rows into columnar series
+
+    Rows arrive newest first. Only the ``limit`` most recent session dates
+    are kept. ``dates`` and ``sessionIds`` are listed once, oldest first, and
+    ``series`` maps each BiomarkerID to values aligned with them (None where
+    that session has no value).
+    """
+    positions, dates, session_ids, series = {}, [], [], {}
+    for row in rows:
+        day = row["date"]
+        position = positions.get(day)
+        if position is None:
+            if limit is not None and len(dates) == limit:
+                break
+            position = positions[day] = len(dates)
+            dates.append(day.isoformat() if isinstance(day, date) else day)
+            session_ids.append(row["sessionId"])
+        values = series.setdefault(row["biomarkerId"], [])
+        values.extend([None] * (position + 1 - len(values)))
+        values[position] = float(row["value"])
+
+    for values in series.values():
+        values.extend([None] * (len(dates) - len(values)))
+        values.reverse()
+    dates.reverse()
+    session_ids.reverse()
+    return {"dates": dates, "sessionIds": session_ids, "series": series}
+
+
+def shape_trend(rows, bucket=None, points=None, window=None):
+    """
+    Order, bucket, smooth and downsample trend rows
+
+    Steps run in that order: rows are put in date order, aggregated into
+    day/week/month buckets, given a trailing rolling mean and slope (per year)
+    over ``window`` points, and finally reduced to ``points`` with LTTB.
+    """
+    rows = sorted(rows, key=lambda row: row["date"])
+    if not rows:
+        return rows
+    dates = np.array([row["date"] for row in rows], dtype="datetime64[D]")
+    values = np.array([float(row["value"]) for row in rows])
+
+    if bucket is not None:
+        series = bucket_series(dates, values, bucket)
+        dates, values = series["date"], series["value"]
+        rows = [
+            {
+                "date": str(day),
+                "value": round(float(mean), 4),
+                "min": float(low),
+                "max": float(high),
+                "count": int(count),
+            }
+            for day, mean, low, high, count in zip(
+                dates, values, series["min"], series["max"], series["count"]
+            )
+        ]
+
+    days = dates.astype(np.int64)
+    if window is not None:
+        means = rolling_mean(values, window)
+        slopes = rolling_slope(days, values, window)
+        for row, mean, slope in zip(rows, means, slopes):
+            row["rollingMean"] = None if np.isnan(mean) else round(float(mean), 4)
+            row["rollingSlopePerYear"] = (
+                None if np.isnan(slope) else round(float(slope), 4)
+            )
+
+    if points is not None:
+        rows = [rows[i] for i in lttb(days, values, points)]
+    return rows
+
+
+def build_user_list_query(
+    after=0, limit=None, sex=None, race=None, min_age=None, max_age=None
+):
+    """Compose the keyset-paginated, filtered LIST_USERS statement and params"""
+    if sex is not None and sex not in {"M", "F"}:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="sex must be 'M' or 'F'"
+        )
+    if min_age is not None and max_age is not None and min_age > max_age:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="minAge must not exceed maxAge",
+        )
+
+    filters, params = "", [after]
+    if sex is not None:
+        filters += queries.LIST_USERS_SEX_FILTER
+        params.append(sex)
+    if race is not None:
+        filters += queries.LIST_USERS_RACE_FILTER
+        params.append(race)
+    if min_age is not None:
+        filters += queries.LIST_USERS_MIN_AGE_FILTER
+        params.append(min_age)
+    if max_age is not None:
+        filters += queries.LIST_USERS_MAX_AGE_FILTER
+        params.append(max_age + 1)
+
+    limit_clause = ""
+    if limit is not None:
+        limit_clause = queries.LIST_USERS_LIMIT
+        params.append(limit)
+    return queries.LIST_USERS.format(filters=filters, limit=limit_clause), params
+
+
+def shape_user_page(users, limit):
+    """Wrap a page of users; nextCursor is set only when more may follow"""
+    page = {"users": users}
+    if limit is not None:
+        page["nextCursor"] = users[-1]["userId"] if len(users) == limit else None
+    return page
+
+
+def ndjson_lines(rows):
+    """Encode rows as newline-delimited JSON, a few hundred rows per chunk"""
+    batch = []
+    for row in rows:
+        batch.append(json.dumps(row, default=str))
+        if len(batch) == NDJSON_BATCH_ROWS:
+            yield ("\n".join(batch) + "\n").encode()
+            batch = []
+    if batch:
+        yield ("\n".join(batch) + "\n").encode()
@@ -0,0 +1,200 @@
+"""
+Bulk measurement ingestion.
+
+Lab integrations post full panels for many sessions (of many users) at once.
+Entries are validated in memory first (dates, values and BiomarkerIDs, the
+latter against the cached catalog), then the valid sessions, their
+measurements and the matching ``UserLatestMeasurement`` rows are written with
+multi-row statements in one transaction. IDs are read back with one query
+per table instead of per-row ``lastrowid``, so a request costs a handful of
+round trips however many values it carries. Every session gets its own
+result, so one bad entry does not reject the rest of the request.
+"""
+
+import math
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, List, Tuple
+
+from src.api import queries
+
+
+MAX_BULK_SESSIONS = 1000
+
+
+@dataclass
+class SessionEntry:
+    """One validated session of a bulk request"""
+
+    index: int
+    user_id: int
+    session_date: date
+    fasting: bool
+    measurements: List[Tuple[int, float]]  # (BiomarkerID, Value)
+
+
+def parse_entry(index: int, entry, biomarker_ids) -> SessionEntry:
+    """Validate one request entry; raises ValueError with the reason"""
+    if not isinstance(entry, dict):
+        raise ValueError("session must be an object")
+    user_id = entry.get("userId")
+    if not isinstance(user_id, int) or isinstance(user_id, bool):
+        raise ValueError("userId must be an integer")
+    try:
+        session_date = date.fromisoformat(entry.get("sessionDate"))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid date format")
+    if entry.get("fastingStatus") is None:
+        raise ValueError("fastingStatus is required")
+    measurements = entry.get("measurements")
+    if not isinstance(measurements, list) or not measurements:
+        raise ValueError("measurements must be a non-empty list")
+
+    values = {}
+    for measurement in measurements:
+        if not isinstance(measurement, dict):
+            raise ValueError("measurement must be an object")
+        biomarker_id = measurement.get("biomarkerId")
+        if not isinstance(biomarker_id, int) or isinstance(biomarker_id, bool):
+            raise ValueError("biomarkerId must be an integer")
+        if biomarker_id not in biomarker_ids:
+            raise ValueError(f"Invalid value for biomarkerId {biomarker_id}")
+        if biomarker_id in values:
+            raise ValueError(f"biomarkerId {biomarker_id} given more than once")
+        value = measurement.get("value")
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"value for biomarkerId {biomarker_id} must be a number")
+        if not math.isfinite(value):
+            raise ValueError(f"value for biomarkerId {biomarker_id} must be finite")
+        values[biomarker_id] = float(value)
+
+    return SessionEntry(
+        index, user_id, session_date, bool(entry["fastingStatus"]), list(values.items())
+    )
+
+
+def validate_sessions(sessions, biomarker_ids):
+    """
+    Validate a bulk request without touching the database
+
+    Returns:
+        (valid entries, results) where results holds one dict per request
+        entry, in request order; rejected entries are already filled in
+    """
+    entries, results, seen = [], [], set()
+    for index, raw in enumerate(sessions):
+        result = {"index": index}
+        if isinstance(raw, dict):
+            result.update(userId=raw.get("userId"), sessionDate=raw.get("sessionDate"))
+        results.append(result)
+        try:
+            entry = parse_entry(index, raw, biomarker_ids)
+            if (entry.user_id, entry.session_date) in seen:
+                raise ValueError("session given more than once in this request")
+        except ValueError as e:
+            result.update(status="rejected", error=str(e))
+            continue
+        seen.add((entry.user_id, entry.session_date))
+        entries.append(entry)
+    return entries, results
+
+
+def ingest_sessions(db, entries: List[SessionEntry], results: List[Dict]) -> None:
+    """
+    Write validated sessions in one transaction and fill in their results
+
+    Sessions of unknown users are rejected and sessions that already exist
+    are reported as conflicts; the rest are inserted. Commits on success;
+    an IntegrityError from a concurrent writer propagates (nothing is
+    committed).
+    """
+    if not entries:
+        return
+    user_ids = sorted({entry.user_id for entry in entries})
+    session_dates = sorted({entry.session_date for entry in entries})
+
+    with db.cursor() as cursor:
+        # ---- existence checks, one query each ----------------------------------
+        cursor.execute(queries.KNOWN_USERS, (user_ids,))
+        known_users = {row["UserID"] for row in cursor.fetchall()}
+        cursor.execute(queries.SESSIONS_FOR_USERS, (user_ids, session_dates))
+        existing = {(row["UserID"], row["SessionDate"]) for row in cursor.fetchall()}
+
+        accepted = []
+        for entry in entries:
+            result = results[entry.index]
+            if entry.user_id not in known_users:
+                result.update(status="rejected", error="User not found")
+            elif (entry.user_id, entry.session_date) in existing:
+                result.update(
+                    status="conflict",
+                    error=f"Measurement session for {entry.session_date} already exists",
+                )
+            else:
+                accepted.append(entry)
+        if not accepted:
+            return
+
+        # ---- sessions, then their IDs ------------------------------------------
+        now = datetime.now()
+        created_at = now.strftime("%Y-%m-%d %H:%M:%S")
+        cursor.executemany(
+            queries.INSERT_SESSION,
+            [
+                (entry.user_id, entry.session_date, int(entry.fasting), created_at)
+                for entry in accepted
+            ],
+        )
+        cursor.execute(queries.SESSIONS_FOR_USERS, (user_ids, session_dates))
+        session_ids = {
+            (row["UserID"], row["SessionDate"]): row["SessionID"]
+            for row in cursor.fetchall()
+        }
+
+        # ---- measurements, then their IDs --------------------------------------
+        measurement_rows, taken = [], {}
+        for entry in accepted:
+            entry_session_id = session_ids[(entry.user_id, entry.session_date)]
+            taken_at = datetime.combine(entry.session_date, now.time()).strftime(
+                "%Y-%m-%d %H:%M:%S"
+            )
+            taken[entry.index] = taken_at
+            for biomarker_id, value in entry.measurements:
+                measurement_rows.append(
+                    (entry_session_id, biomarker_id, value, taken_at, created_at)
+                )
+        cursor.executemany(queries.INSERT_MEASUREMENT, measurement_rows)
+        cursor.execute(
+            queries.MEASUREMENT_IDS_FOR_SESSIONS,
+            (sorted({row[0] for row in measurement_rows}),),
+        )
+        measurement_ids = {
+            (row["SessionID"], row["BiomarkerID"]): row["MeasurementID"]
+            for row in cursor.fetchall()
+        }
+
+        # ---- maintain UserLatestMeasurement in the same transaction ------------
+        latest_rows = []
+        for entry in accepted:
+            entry_session_id = session_ids[(entry.user_id, entry.session_date)]
+            ids = [
+                measurement_ids[(entry_session_id, biomarker_id)]
+                for biomarker_id, _ in entry.measurements
+            ]
+            latest_rows.extend(
+                (entry.user_id, biomarker_id, measurement_id, value, taken[entry.index])
+                for (biomarker_id, value), measurement_id in zip(
+                    entry.measurements, ids
+                )
+            )
+            results[entry.index].update(
+                status="created", sessionId=entry_session_id, measurementIds=ids
+            )
+        cursor.executemany(queries.UPSERT_LATEST_MEASUREMENT, latest_rows)
+    db.commit()
+
+
+def summarize(results: List[Dict]) -> Dict:
+    """Wrap per-session results with created/failed counts"""
+    created = sum(1 for result in results if result.get("status") == "created")
+    return {"created": created, "failed": len(results) - created, "results": results}
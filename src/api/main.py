@@ -1,14 +1,14 @@
 """Longevity Biomarker API"""
 
-from datetime import date, datetime, timedelta
-from fastapi import FastAPI, Depends, HTTPException, Body, status
+from contextlib import contextmanager
+from datetime import date, datetime
+from fastapi import FastAPI, Depends, HTTPException, Body, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-import math
+from fastapi.responses import PlainTextResponse, StreamingResponse
 import os
-import re
-import pandas as pd
 import pymysql
 import sys
+import time
 from typing import Optional
 
 
@@ -16,7 +16,41 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from src.analytics.hd import HomeostasisDysregulation
+from src.api import queries
+from src.api.bio_age import BIO_AGE_MODEL_IDS, calculate_batch, load_or_fit_hd_model
+from src.api.catalog import catalog
+from src.api.cohort import cohort
+from src.api.ingest import (
+    MAX_BULK_SESSIONS,
+    ingest_sessions,
+    summarize,
+    validate_sessions,
+)
+from src.api.common import (
+    MAX_HISTORY_PAGE_SIZE,
+    MAX_TREND_POINTS,
+    MAX_TREND_WINDOW,
+    MAX_USERS_PAGE_SIZE,
+    bio_age_history_query,
+    build_user_list_query,
+    ndjson_lines,
+    parse_trend_range,
+    multi_trend_query,
+    parse_biomarker_ids,
+    parse_user_ids,
+    trend_query,
+    shape_bio_age_history,
+    shape_bio_ages,
+    shape_multi_trend,
+    shape_session,
+    shape_trend,
+    shape_user_page,
+    shape_user_profile,
+)
+from src.api.pool import ConnectionPool, PoolTimeout
+from src.api.profiling import ProfilingMiddleware, cursor_class, profiler
+from src.api.ranges import range_status_batch, user_ranges
+from src.api.response_cache import response_cache, shared_backend
 
 
 DB_HOST = os.getenv("MYSQL_HOST", "localhost")
@@ -25,6 +59,73 @@ DB_USER = os.getenv("MYSQL_USER", "biomarker_user")
 DB_PASSWORD = os.getenv("MYSQL_PASSWORD", "biomarker_pass")
 DB_NAME = os.getenv("MYSQL_DATABASE", "longevity")
 
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 5))
+DB_POOL_RECYCLE = float(os.getenv("DB_POOL_RECYCLE", 300))
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", 60))
+
+# Seconds the biomarker/model/reference-range catalog is cached in-process
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", 300))
+
+# Per-user response cache: local LRU entries, seconds served, and an optional
+# shared Redis backend (requires the redis package)
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 10_000))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 60))
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL")
+
+# Per-request connect/SQL/Python timing served at /metrics; statements slower
+# than SLOW_QUERY_MS are logged (a SLOW_QUERY_SAMPLE fraction of them)
+API_PROFILING = os.getenv("API_PROFILING", "").lower() in {"1", "true"}
+SLOW_QUERY_MS = (
+    float(os.getenv("SLOW_QUERY_MS")) if os.getenv("SLOW_QUERY_MS") else None
+)
+SLOW_QUERY_SAMPLE = float(os.getenv("SLOW_QUERY_SAMPLE", 1.0))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG")
+profiler.configure(
+    enabled=API_PROFILING,
+    slow_query_ms=SLOW_QUERY_MS,
+    slow_query_sample=SLOW_QUERY_SAMPLE,
+    slow_query_log=SLOW_QUERY_LOG,
+)
+
+# Fitted HD models are persisted here, keyed by reference-population fingerprint
+HD_MODEL_DIR = os.getenv("HD_MODEL_DIR", os.path.join(project_root, "data", "models"))
+
+# Serve read endpoints from async handlers on an aiomysql pool
+API_ASYNC = os.getenv("API_ASYNC", "").lower() in {"1", "true"}
+
+
+def connect_db():
+    """Open a new PyMySQL connection with the API's settings"""
+    return pymysql.connect(
+        host=DB_HOST,
+        port=DB_PORT,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        db=DB_NAME,
+        cursorclass=cursor_class(pymysql.cursors.DictCursor),
+        autocommit=False,
+    )
+
+
+db_pool = ConnectionPool(
+    connect_db,
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    timeout=DB_POOL_TIMEOUT,
+    recycle=DB_POOL_RECYCLE,
+    max_idle=DB_POOL_MAX_IDLE,
+)
+catalog.bind(db_pool.connection, ttl=CATALOG_CACHE_TTL)
+response_cache.configure(
+    max_entries=RESPONSE_CACHE_SIZE,
+    ttl=RESPONSE_CACHE_TTL,
+    shared=(
+        shared_backend(RESPONSE_CACHE_REDIS_URL) if RESPONSE_CACHE_REDIS_URL else None
+    ),
+)
+
 
 app = FastAPI(
     title="Longevity Biomarker API",
@@ -42,6 +143,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added last, so it is the outermost middleware and times the whole request
+if API_PROFILING:
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+# Async routes are registered first so they take precedence over the sync
+# handlers for the same paths; endpoints without an async twin stay sync.
+if API_ASYNC:
+    from src.api import async_routes
+
+    async_routes.configure(
+        host=DB_HOST,
+        port=DB_PORT,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        db=DB_NAME,
+        minsize=DB_POOL_MIN_SIZE,
+        maxsize=DB_POOL_MAX_SIZE,
+        pool_recycle=int(DB_POOL_RECYCLE),
+    )
+    app.include_router(async_routes.router)
+
 
 # RD: Need to explicitly handle OPTIONS method in FastAPI
 @app.options("/api/v1/users")
@@ -56,123 +178,86 @@ hd_model = None
 def startup():
     global hd_model
 
-    if os.getenv("DISABLE_HD", "").lower() in {"1", "true"}:
-        print("[INFO] HD model fitting skipped via DISABLE_HD flag.")
-        return
-
-    connection = pymysql.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        db=DB_NAME,
-        cursorclass=pymysql.cursors.DictCursor,
-        autocommit=False,
-    )
     try:
-        with connection.cursor() as cursor:
-            query = """
-            SELECT
-                view_reference.UserID,
-                view_reference.Age,
-                view_reference.BMI,
-                view_reference.Sex,
-                view_measurements.BiomarkerID,
-                view_measurements.BiomarkerName,
-                view_measurements.Value
-            FROM v_hd_reference_candidates view_reference
-            JOIN v_user_latest_measurements view_measurements ON view_reference.UserID=view_measurements.userID
-            WHERE view_measurements.BiomarkerID BETWEEN 1 AND 9
-            """
-            cursor.execute(query)
-            reference_df = cursor.fetchall()
-        if not reference_df:
-            # raise RuntimeError("No reference population available for HD calculation")
-            print("No reference population available for HD calculation")
-
-        reference_df = pd.DataFrame(reference_df)
-
-        # Convert all decimal.Decimal columns to float
-        reference_df["Value"] = reference_df["Value"].astype(float)
-        reference_df["BMI"] = reference_df["BMI"].astype(float)
-
-        # Unit conversion: mg/dL → mmol/L - RD: Small fix to resolve Pandas warning in API
-        glucose_mask = reference_df["BiomarkerID"] == 4
-        reference_df.loc[glucose_mask, "Value"] = (
-            reference_df.loc[glucose_mask, "Value"] / 18
-        )
-        biomarker_columns = reference_df["BiomarkerName"].unique()
-
-        # Pivot to get biomarkers as columns
-        reference_df = reference_df.pivot_table(
-            index=["UserID", "Age", "BMI", "Sex"],
-            columns="BiomarkerName",
-            values="Value",
-        ).reset_index()
-
-        # Ensure we have all 9 biomarkers for each person
-        reference_df = reference_df.dropna()
+        db_pool.open()
+    except Exception as e:
+        print(f"[WARNING] could not pre-open database connections: {str(e)}")
 
-        print(
-            f"HD reference population: {len(reference_df)} people with complete biomarker data"
-        )
+    try:
+        catalog.get()
+    except Exception as e:
+        print(f"[WARNING] could not preload catalog cache: {str(e)}")
 
-        # RD 5-27 final review: Guard against empty reference population
-        if len(reference_df) < 20:
-            print(
-                f"[WARNING] HD reference population too small ({len(reference_df)} < 20). HD model disabled."
-            )
-            hd_model = None
-            return
+    try:
+        with db_pool.connection() as connection:
+            cohort.refresh(connection, HD_MODEL_DIR)
+    except Exception as e:
+        print(f"[WARNING] could not build cohort percentile tables: {str(e)}")
 
-        hd_model = HomeostasisDysregulation()
-        hd_model.fit_reference_population(reference_df, biomarker_columns, "Age")
+    if os.getenv("DISABLE_HD", "").lower() in {"1", "true"}:
+        print("[INFO] HD model fitting skipped via DISABLE_HD flag.")
+        return
 
+    try:
+        connection = db_pool.acquire()
+    except Exception as e:
+        print(f"error: failed to initialize HD model on startup: {str(e)}")
+        hd_model = None
+        return
+    try:
+        hd_model = load_or_fit_hd_model(connection, HD_MODEL_DIR)
     except Exception as e:
         print(f"error: failed to initialize HD model on startup: {str(e)}")
         hd_model = None
     finally:
-        connection.close()
+        db_pool.release(connection)
+
+
+@app.on_event("shutdown")
+def shutdown():
+    db_pool.close()
 
 
 # RD 5-27 final review: fixed potential connection leak
 def get_db():
-    """Yield a PyMySQL connection and close it after"""
-    connection = pymysql.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        db=DB_NAME,
-        cursorclass=pymysql.cursors.DictCursor,
-        autocommit=False,
-    )
+    """Yield a pooled PyMySQL connection and return it to the pool after"""
+    started = time.perf_counter()
+    try:
+        connection = db_pool.acquire()
+    except PoolTimeout as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e)
+        )
+    profiler.record_connect(time.perf_counter() - started)
     try:
         yield connection
     finally:
-        try:
-            connection.rollback()  # Rollback any uncommitted transactions
-        except Exception:
-            pass  # Connection might already be closed
-        connection.close()
+        db_pool.release(connection)  # Rolls back any uncommitted transactions
+
+
+# get_db as a plain context manager, for handlers that only sometimes need it
+pooled_connection = contextmanager(get_db)
+
+
+def stream_rows(sql, params):
+    """
+    Yield NDJSON for a query through an unbuffered server-side cursor
+
+    Checks out its own pooled connection for the lifetime of the stream (a
+    Depends(get_db) connection is released before the body is sent), and the
+    result set is read row by row instead of being materialized.
+    """
+    with pooled_connection() as connection:
+        with connection.cursor(cursor_class(pymysql.cursors.SSDictCursor)) as cursor:
+            cursor.execute(sql, params)
+            yield from ndjson_lines(cursor)
 
 
 def get_user_profile(userId: int, db):
     """Retrieve the user's profile and latest biomarker data"""
     with db.cursor() as cursor:
         # ---- basic user data --------------------------------------------------
-        query = """
-        SELECT
-            UserID AS userId,
-            SEQN AS seqn,
-            BirthDate AS birthDate,
-            Sex AS sex,
-            RaceEthnicity AS raceEthnicity,
-            TIMESTAMPDIFF(YEAR, BirthDate, CURDATE()) AS age
-        FROM User
-        WHERE UserID = %s
-        """
-        cursor.execute(query, (userId,))
+        cursor.execute(queries.USER_BASIC, (userId,))
         user = cursor.fetchone()
 
         if not user:
@@ -181,28 +266,10 @@ def get_user_profile(userId: int, db):
             )
 
         # ---- latest biomarker values -----------------------------------------
-        query = """
-        SELECT
-            BiomarkerID AS biomarkerId,
-            BiomarkerName AS name,
-            Value AS value,
-            Units AS units,
-            TakenAt AS takenAt
-        FROM v_user_latest_measurements
-        WHERE UserID = %s
-        ORDER BY BiomarkerID
-        """
-        cursor.execute(query, (userId,))
+        cursor.execute(queries.USER_LATEST_BIOMARKERS, (userId,))
         biomarkers = cursor.fetchall()
 
-    if isinstance(user.get("birthDate"), date):
-        user["birthDate"] = user["birthDate"].isoformat()
-
-    for biomarker in biomarkers:
-        if isinstance(biomarker.get("takenAt"), date):
-            biomarker["takenAt"] = biomarker["takenAt"].isoformat()
-
-    return {"user": user, "biomarkers": biomarkers}
+    return shape_user_profile(user, biomarkers)
 
 
 @app.get("/")
@@ -215,66 +282,62 @@ def root():
 # User-profile endpoints
 # ---------------------------------------------------------------------
 @app.get("/api/v1/users")
-def list_all_users(db=Depends(get_db)):
-    """Query 1: List All Users"""
-    with db.cursor() as cursor:
-        query = """
-        SELECT
-            view_age.UserID AS userId,
-            view_age.SEQN AS seqn,
-            view_age.Age AS age,
-            view_age.Sex AS sex,
-            view_age.RaceEthnicity AS raceEthnicity,
-            COUNT(DISTINCT MeasurementSession.SessionID) AS sessionCount
-        FROM
-            v_user_with_age view_age
-        LEFT JOIN
-            MeasurementSession ON view_age.UserID = MeasurementSession.UserID
-        GROUP BY
-            view_age.UserID, view_age.SEQN, view_age.Age, view_age.Sex, view_age.RaceEthnicity
-        ORDER BY
-            view_age.UserID;
-        """
-        cursor.execute(query)
-        all_users = cursor.fetchall()
-    return {"users": all_users}
+def list_all_users(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_USERS_PAGE_SIZE),
+    after: int = Query(0, ge=0),
+    sex: Optional[str] = None,
+    race: Optional[str] = None,
+    minAge: Optional[int] = Query(None, ge=0),
+    maxAge: Optional[int] = Query(None, ge=0),
+    format: str = "json",
+):
+    """Query 1: List users, optionally filtered, paginated by UserID or streamed"""
+    if format not in {"json", "ndjson"}:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format must be 'json' or 'ndjson'",
+        )
+    sql, params = build_user_list_query(after, limit, sex, race, minAge, maxAge)
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_rows(sql, params), media_type="application/x-ndjson"
+        )
+
+    with pooled_connection() as db:
+        with db.cursor() as cursor:
+            cursor.execute(sql, params)
+            users = cursor.fetchall()
+    return shape_user_page(users, limit)
 
 
 @app.get("/api/v1/users/{userId}/profile")
-def user_profile(userId: int, db=Depends(get_db)):
+def user_profile(userId: int, request: Request):
     """Query 2: Retrieve the user's profile and latest biomarker data"""
-    return get_user_profile(userId, db)
+    cached, slot = response_cache.lookup(userId, request)
+    if cached is not None:
+        return cached
+    with pooled_connection() as db:
+        return response_cache.store(slot, get_user_profile(userId, db), request)
 
 
 @app.get("/api/v1/users/{userId}/bio-age")
-def get_current_biological_age(userId: int, db=Depends(get_db)):
+def get_current_biological_age(userId: int, request: Request):
     """Query 3: Get current biological age (agegap = biological age - chronological age)"""
-    with db.cursor() as cursor:
-        query = """
-        SELECT
-            BiologicalAgeModel.ModelName AS modelName,
-            BiologicalAgeResult.BioAgeYears AS bioAgeYears,
-            BiologicalAgeResult.BioAgeYears - view_age.AGE AS ageGap,
-            BiologicalAgeResult.ComputedAt AS computedAt
-        FROM v_user_with_age view_age
-        JOIN BiologicalAgeResult ON view_age.UserID=BiologicalAgeResult.UserID
-        JOIN BiologicalAgeModel ON BiologicalAgeResult.ModelID=BiologicalAgeModel.ModelID
-        WHERE view_age.UserID = %s
-        ORDER BY BiologicalAgeResult.ModelID;
-        """
-        cursor.execute(query, (userId,))
-        biological_ages = cursor.fetchall()
-        if not biological_ages:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"No biological age results for user {userId}",
-            )
-        for biological_age in biological_ages:
-            if isinstance(biological_age.get("computedAt"), date):
-                biological_age["computedAt"] = biological_age["computedAt"].strftime(
-                    "%Y-%m-%dT%H:%M:%SZ"
+    cached, slot = response_cache.lookup(userId, request)
+    if cached is not None:
+        return cached
+    with pooled_connection() as db:
+        with db.cursor() as cursor:
+            cursor.execute(queries.CURRENT_BIO_AGE, (userId,))
+            biological_ages = cursor.fetchall()
+            if not biological_ages:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"No biological age results for user {userId}",
                 )
-    return {"bioAges": biological_ages}
+        return response_cache.store(
+            slot, {"bioAges": shape_bio_ages(biological_ages)}, request
+        )
 
 
 @app.post("/api/v1/users/{userId}/bio-age/calculate")
@@ -282,7 +345,7 @@ def calculate_biological_age(
     userId: int, body: dict = Body(default={"modelName": ""}), db=Depends(get_db)
 ):
     """Query 3.5: Calculate and Post Biological Age"""
-    models = {"Phenotypic Age": 1, "Homeostatic Dysregulation": 2}
+    models = BIO_AGE_MODEL_IDS
     if body.get("modelName"):
         models_to_use = [body.get("modelName")]
         if models_to_use[0] not in models.keys():
@@ -306,39 +369,22 @@ def calculate_biological_age(
             biomarker["biomarkerId"]: [biomarker["value"], biomarker["name"]]
             for biomarker in user_profile["biomarkers"]
         }
+        snapshot = catalog.get()  # cached ModelUsesBiomarker coefficients
         try:
             for model in models_to_use:
                 computed_at = datetime.now()
                 bioAgeYears = None
                 # ---- Phenotypic Age -----------------------------------------
                 if model == "Phenotypic Age":
-                    query = """
-                    SELECT
-                        BiomarkerID AS biomarkerId,
-                        Coefficient AS coefficient,
-                        Transform AS transform
-                    FROM ModelUsesBiomarker
-                    WHERE ModelID = 1
-                    """
-                    cursor.execute(query)
-                    phenotypic_coefficients = cursor.fetchall()
-                    linear_term = 0
-                    for coefficient in phenotypic_coefficients:
-                        biomarker_value = float(
-                            biomarkers_dict[coefficient["biomarkerId"]][0]
-                        )
-                        # Unit conversion for fasting glucose
-                        if coefficient["biomarkerId"] == 4:
-                            biomarker_value /= 18.0
-                        if coefficient["transform"] == "log":
-                            biomarker_value = math.log(biomarker_value)
-                        linear_term += biomarker_value * float(
-                            coefficient["coefficient"]
-                        )
-                    mortality_score = linear_term + chronological_age * 0.0804 - 19.9067
-                    R = min(0.999999, 1 - math.exp(-math.exp(mortality_score)))
+                    engine = snapshot.phenotypic_age
+                    if engine is None:
+                        raise ValueError("Phenotypic Age coefficients not loaded")
+                    biomarker_values = [
+                        float(biomarkers_dict[biomarker_id][0])
+                        for biomarker_id in engine.biomarker_ids
+                    ]
                     phenotypic_age = round(
-                        141.50 + math.log(-math.log(1 - R)) / 0.09165, 2
+                        engine.calculate(biomarker_values, chronological_age), 2
                     )
                     bioAgeYears = phenotypic_age
 
@@ -361,24 +407,17 @@ def calculate_biological_age(
                             biomarker_value /= 18.0
                         user_biomarkers_named[biomarker_name] = biomarker_value
 
-                    # Calculate HD using pre-fitted model
-                    hd_result = hd_model.calculate_hd(
-                        user_biomarkers_named, convert_to_years=False
-                    )
+                    # Calculate HD using pre-fitted model (single-subject fast path)
+                    hd_score = hd_model.score_one(user_biomarkers_named)
 
                     # Convert to age
-                    hd_score = hd_result.hd_score
                     age_adjustment = (hd_score - 2.5) * 4
                     hd_age = round(chronological_age + age_adjustment, 2)
                     bioAgeYears = hd_age
 
                 # ---- Insert into BiologicalAgeResult -----------------------------------------
-                query = """
-                INSERT INTO BiologicalAgeResult(UserID, ModelID, BioAgeYears, ComputedAt, CreatedAt)
-                    VALUES(%s, %s, %s, %s, %s);
-                """
                 cursor.execute(
-                    query,
+                    queries.INSERT_BIO_AGE_RESULT,
                     (
                         userId,
                         models[model],
@@ -402,9 +441,53 @@ def calculate_biological_age(
                 detail=f"error: {str(e)}",
             )
         db.commit()
+    response_cache.invalidate(userId)
     return {"calculations": return_responses}
 
 
+@app.post("/api/v1/bio-age/calculate-batch")
+def calculate_biological_age_batch(
+    body: dict = Body(default={"userIds": "all", "modelName": ""}),
+    db=Depends(get_db),
+):
+    """Query 3.6: Calculate and Post Biological Age for many users at once"""
+    user_ids = parse_user_ids(body)
+
+    if body.get("modelName"):
+        if body["modelName"] not in BIO_AGE_MODEL_IDS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid model"
+            )
+        models = [body["modelName"]]
+    else:
+        models = [
+            model
+            for model in BIO_AGE_MODEL_IDS
+            if model != "Homeostatic Dysregulation" or hd_model is not None
+        ]
+    if "Homeostatic Dysregulation" in models and hd_model is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="HD model unavailable, only Phenotypic Age model available",
+        )
+
+    try:
+        summary = calculate_batch(
+            db, user_ids, models, hd_model, phenotypic_age=catalog.get().phenotypic_age
+        )
+    # ---- ComputedAt is per second: another run stored results in this one ------
+    except pymysql.err.IntegrityError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Request conflicted with a concurrent calculation, retry it: {e}",
+        )
+    if user_ids is None:
+        response_cache.clear()
+    else:
+        response_cache.invalidate_many(user_ids)
+    return summary
+
+
 @app.post("/api/v1/users/{userId}/measurements", status_code=status.HTTP_201_CREATED)
 def add_new_measurement(userId: int, body=Body(), db=Depends(get_db)):
     """Query 4: Create new measurement session for specific date"""
@@ -426,17 +509,15 @@ def add_new_measurement(userId: int, body=Body(), db=Depends(get_db)):
 
     new_session_id = None
     inserted_measurement_ids = []
+    latest_rows = []
 
     with db.cursor() as cursor:
         created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         # ---- insert into MeasurementSession -----------------------------------------
         try:
-            query = """
-            INSERT INTO MeasurementSession(UserID, SessionDate, FastingStatus, CreatedAt)
-                VALUES(%s, %s, %s, %s);
-            """
             cursor.execute(
-                query, (userId, session_date, 1 if fasting_status else 0, created_at)
+                queries.INSERT_SESSION,
+                (userId, session_date, 1 if fasting_status else 0, created_at),
             )
             new_session_id = cursor.lastrowid
         # ---- 409 Conflict (duplicate (UserID, SessionDate)) -----------------------------------------
@@ -457,14 +538,14 @@ def add_new_measurement(userId: int, body=Body(), db=Depends(get_db)):
             biomarker_id = measurement.get("biomarkerId")
             value = measurement.get("value")
             try:
-                query = """
-                INSERT INTO Measurement(SessionID, BiomarkerID, Value, TakenAt, CreatedAt)
-                    VALUES(%s, %s, %s, %s, %s);
-                """
                 cursor.execute(
-                    query, (new_session_id, biomarker_id, value, taken_at, created_at)
+                    queries.INSERT_MEASUREMENT,
+                    (new_session_id, biomarker_id, value, taken_at, created_at),
                 )
                 inserted_measurement_ids.append(cursor.lastrowid)
+                latest_rows.append(
+                    (userId, biomarker_id, cursor.lastrowid, value, taken_at)
+                )
             # ----  check if BiomarkerID foreign key exist -----------------------------------------
             except pymysql.err.IntegrityError as e:
                 if e.args[0] == 1452:
@@ -473,55 +554,74 @@ def add_new_measurement(userId: int, body=Body(), db=Depends(get_db)):
                         detail=f"Invalid value for biomarkerId {biomarker_id}",
                     )
                 raise
+        # ----  maintain UserLatestMeasurement in the same transaction -----------------------------------------
+        if latest_rows:
+            cursor.executemany(queries.UPSERT_LATEST_MEASUREMENT, latest_rows)
         # ----  commit if all inserts were successful -----------------------------------------
         db.commit()
+    response_cache.invalidate(userId)
 
     return {"sessionId": new_session_id, "measurementIds": inserted_measurement_ids}
 
 
+@app.post("/api/v1/measurements/bulk")
+def add_measurements_bulk(body=Body(), db=Depends(get_db)):
+    """Query 4.5: Create many measurement sessions (of many users) at once"""
+    sessions = body.get("sessions") if isinstance(body, dict) else None
+    if not isinstance(sessions, list) or not sessions:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="sessions must be a non-empty list",
+        )
+    if len(sessions) > MAX_BULK_SESSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BULK_SESSIONS} sessions per request",
+        )
+
+    biomarker_ids = {row["biomarkerId"] for row in catalog.get().biomarkers}
+    entries, results = validate_sessions(sessions, biomarker_ids)
+    try:
+        ingest_sessions(db, entries, results)
+    # ---- a concurrent writer created a session or removed a user ---------------
+    except pymysql.err.IntegrityError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Request conflicted with a concurrent change, retry it: {e}",
+        )
+    response_cache.invalidate_many(
+        result["userId"] for result in results if result.get("status") == "created"
+    )
+    return summarize(results)
+
+
 @app.get("/api/v1/users/{userId}/ranges")
-def reference_range_comparison(userId: int, type: str = "both", db=Depends(get_db)):
+def reference_range_comparison(userId: int, request: Request, type: str = "both"):
     """Query 5: Compare each biomarker against clinical and longevity reference ranges"""
-    with db.cursor() as cursor:
-        query = """
-        SELECT
-            biomarkerId,
-            name,
-            value,
-            CASE
-                WHEN SUM(statusCounter)=2 THEN "Optimal"
-                WHEN SUM(statusCounter)=1 THEN "Normal"
-                ELSE "OutOfRange"
-                END AS status,
-            MAX(CASE
-                    WHEN rangeType="clinical" THEN valueRange
-                    END) AS clinicalRange,
-            MAX(CASE
-                    WHEN rangeType="longevity" THEN valueRange
-                    END) AS longevityRange
-
-        FROM(
-            SELECT
-                view_measurements.BiomarkerID AS biomarkerId,
-                view_measurements.BiomarkerName AS name,
-                view_measurements.Value AS value,
-                ReferenceRange.RangeType AS rangeType,
-                JSON_OBJECT("min", ReferenceRange.MinVal, "max", ReferenceRange.MaxVal) AS valueRange,
-                SUM(CASE
-                        WHEN (ReferenceRange.MinVal <= value) AND (value <= ReferenceRange.MaxVal) THEN 1
-                        ELSE 0
-                        END) AS statusCounter
-            FROM v_user_latest_measurements view_measurements
-            JOIN ReferenceRange ON view_measurements.BiomarkerID=ReferenceRange.BiomarkerID
-            JOIN User ON User.UserID=view_measurements.UserID
-            WHERE ReferenceRange.Sex in ("All", User.Sex) AND view_measurements.UserID = %s
-            GROUP BY biomarkerId, name, value, rangeType, valueRange
-            ) AS NestedTable
-        GROUP BY biomarkerId, name, value
-        """
-        cursor.execute(query, (userId,))
-        ranges = cursor.fetchall()
-        return {"ranges": ranges}
+    cached, slot = response_cache.lookup(userId, request)
+    if cached is not None:
+        return cached
+    with pooled_connection() as db:
+        with db.cursor() as cursor:
+            cursor.execute(queries.USER_BASIC, (userId,))
+            user = cursor.fetchone()
+            cursor.execute(queries.USER_LATEST_BIOMARKERS, (userId,))
+            biomarkers = cursor.fetchall()
+    # ---- classify against the cached, compiled reference ranges ------------
+    ranges = user_ranges(catalog.get().range_engine, user, biomarkers)
+    # ---- population percentile from the precomputed cohort tables ----------
+    return response_cache.store(
+        slot, {"ranges": cohort.annotate(ranges, user)}, request
+    )
+
+
+@app.post("/api/v1/ranges/status-batch")
+def reference_range_status_batch(
+    body: dict = Body(default={"userIds": "all"}), db=Depends(get_db)
+):
+    """Query 5.5: Reference range status of every biomarker for many users"""
+    user_ids = parse_user_ids(body)
+    return range_status_batch(db, catalog.get().range_engine, user_ids)
 
 
 @app.get("/api/v1/users/{userId}/biomarkers/{biomarkerId}/trend")
@@ -530,220 +630,147 @@ def biomarker_trends(
     biomarkerId: int,
     limit: int = 20,
     range: str = "6months",
+    bucket: Optional[str] = None,
+    points: Optional[int] = Query(None, ge=3, le=MAX_TREND_POINTS),
+    window: Optional[int] = Query(None, ge=2, le=MAX_TREND_WINDOW),
     db=Depends(get_db),
 ):
     """Query 6: Show historical values for specific biomarker over time"""
     # ----  parse input to calculate upto when the Biomarker should be queried --------------------------
-    range = range.strip()
-
-    # RD 5-27 Fix: More flexible parsing: "6 months", "6months", "6 month" all work
-    match = re.match(r"^(\d+)\s*(day|week|month|year)s?$", range.lower())
-    if not match:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Range must be in format: '<number> <days|weeks|months|years>' (e.g., '6 months')",
-        )
-
-    number, text = int(match.group(1)), match.group(2)
-    years, months, weeks, days = 0, 0, 0, 0
-    if text in {"day", "d"}:
-        days = number
-    elif text in {"week", "w"}:
-        weeks = number
-    elif text in {"month", "m"}:
-        months = number
-    elif text in {"year", "y"}:
-        years = number
-    else:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Input range must be in '<number> <days|weeks|months|years>' format",
-        )
-    range_days = 1 * days + 7 * weeks + 31 * months + 365 * years
-    range_period = datetime.today() - timedelta(days=range_days)
+    range_days, range_period = parse_trend_range(range)
+    sql, params = trend_query(userId, biomarkerId, range_period, limit, bucket, points)
 
     with db.cursor() as cursor:
-        query = """
-        SELECT
-            MeasurementSession.SessionDate AS date,
-            Measurement.Value AS value,
-            Measurement.SessionID AS sessionId
-        FROM Measurement
-        JOIN MeasurementSession ON Measurement.SessionID=MeasurementSession.SessionID
-        WHERE MeasurementSession.UserID=%s AND Measurement.BiomarkerID=%s AND MeasurementSession.SessionDate > %s
-        LIMIT %s
-        """
-        cursor.execute(query, (userId, biomarkerId, range_period, limit))
+        cursor.execute(sql, params)
         trend = cursor.fetchall()
     if not trend:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"No measurements for this biomarker: {biomarkerId}, user: {userId}, within {range_days} days",
         )
-    return {"trend": trend}
+    # ----  date order, then optional bucketing / rolling stats / downsampling ----
+    return {"trend": shape_trend(trend, bucket, points, window)}
+
+
+@app.get("/api/v1/users/{userId}/trends")
+def multi_biomarker_trends(
+    userId: int,
+    biomarkerIds: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    range: str = "6months",
+    db=Depends(get_db),
+):
+    """Query 6.5: Time series of many (default: all) biomarkers in one query"""
+    range_days, range_period = parse_trend_range(range)
+    sql, params = multi_trend_query(
+        userId, range_period, parse_biomarker_ids(biomarkerIds)
+    )
+
+    with db.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return shape_multi_trend(rows, limit)
 
 
 @app.get("/api/v1/users/{userId}/bio-age/history")
 def get_biological_age_history(
-    userId: int, model: Optional[str] = None, db=Depends(get_db)
+    userId: int,
+    request: Request,
+    model: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_HISTORY_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    bucket: Optional[str] = None,
+    aggregate: str = "last",
+    format: str = "json",
 ):
     """Query 7: Show how biological age has changed over multiple calculations"""
-    with db.cursor() as cursor:
-        query = """
-        SELECT
-            BiologicalAgeModel.ModelName as modelName,
-            BiologicalAgeResult.BioAgeYears as bioAgeYears,
-            BiologicalAgeResult.BioAgeYears - view_age.AGE AS ageGap,
-            BiologicalAgeResult.ComputedAt AS computedAt
-        FROM BiologicalAgeResult
-        JOIN BiologicalAgeModel ON BiologicalAgeResult.ModelID=BiologicalAgeModel.ModelID
-        JOIN v_user_with_age view_age ON BiologicalAgeResult.UserID = view_age.UserID
-        WHERE BiologicalAgeResult.UserID = %s
-        """
-        query_parameters = [userId]
-        if model in ["Phenotypic Age", "Homeostatic Dysregulation"]:
-            query += " AND BiologicalAgeModel.ModelName = %s"
-            query_parameters.append(model)
-        query += " ORDER BY BiologicalAgeResult.ComputedAt DESC;"
-
-        cursor.execute(query, tuple(query_parameters))
-        age_history = cursor.fetchall()
-
-        for history in age_history:
-            if isinstance(history.get("computedAt"), date):
-                history["computedAt"] = history["computedAt"].strftime(
-                    "%Y-%m-%dT%H:%M:%SZ"
-                )
-    return {"history": age_history}
+    query, query_parameters = bio_age_history_query(
+        userId, model, limit, cursor, bucket, aggregate, format
+    )
+    cached, slot = response_cache.lookup(userId, request)
+    if cached is not None:
+        return cached
+    with pooled_connection() as db:
+        with db.cursor() as db_cursor:
+            db_cursor.execute(query, tuple(query_parameters))
+            age_history = db_cursor.fetchall()
+    return response_cache.store(
+        slot,
+        shape_bio_age_history(age_history, limit, cursor, bucket, aggregate, format),
+        request,
+    )
 
 
 @app.get("/api/v1/users/{userId}/sessions/{sessionId}")
-def get_session_details(userId: int, sessionId: int, db=Depends(get_db)):
+def get_session_details(userId: int, sessionId: int, request: Request):
     """Query 8: Show all biomarkers measured in a specific lab session"""
-    with db.cursor() as cursor:
-        # ---- session data --------------------------------------------------
-        query = """
-        SELECT
-            SessionID AS sessionId,
-            SessionDate AS sessionDate,
-            FastingStatus AS fastingStatus
-        FROM MeasurementSession
-        WHERE UserID = %s AND SessionID = %s
-        """
-        cursor.execute(query, (userId, sessionId))
-        session_data = cursor.fetchone()
-        if not session_data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="User's session not found"
-            )
-        if isinstance(session_data.get("sessionDate"), date):
-            session_data["sessionDate"] = session_data["sessionDate"].isoformat()
-        if session_data.get("fastingStatus"):
-            session_data["fastingStatus"] = (
-                True if session_data["fastingStatus"] else False
-            )
-        # ---- measurement data --------------------------------------------------
-        query = """
-        SELECT
-            m.BiomarkerID   AS biomarkerID,
-            b.Name          AS name,
-            m.Value         AS value,
-            b.Units         AS units
-        FROM Measurement m
-        JOIN Biomarker b ON m.BiomarkerID = b.BiomarkerID
-        WHERE m.SessionID = %s
-        ORDER BY m.BiomarkerID
-        """
-        cursor.execute(query, (sessionId,))
-        measurement_data = cursor.fetchall()
-        if not measurement_data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="No measurements for this session",
-            )
-    return session_data | {"measurements": measurement_data}
+    cached, slot = response_cache.lookup(userId, request)
+    if cached is not None:
+        return cached
+    with pooled_connection() as db:
+        with db.cursor() as cursor:
+            # ---- session data --------------------------------------------------
+            cursor.execute(queries.SESSION_DETAILS, (userId, sessionId))
+            session_data = cursor.fetchone()
+            if not session_data:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="User's session not found",
+                )
+            shape_session(session_data)
+            # ---- measurement data --------------------------------------------------
+            cursor.execute(queries.SESSION_MEASUREMENTS, (sessionId,))
+            measurement_data = cursor.fetchall()
+            if not measurement_data:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="No measurements for this session",
+                )
+    return response_cache.store(
+        slot, session_data | {"measurements": measurement_data}, request
+    )
 
 
 @app.get("/api/v1/users/{userId}/sessions")
-def get_user_sessions(userId: int, db=Depends(get_db)):
+def get_user_sessions(userId: int, request: Request):
     """Query 8.5: Get all session IDs (and dates) for a given user."""
-    with db.cursor() as cursor:
-        cursor.execute(
-            """
-            SELECT SessionID AS sessionId,
-                   SessionDate AS sessionDate,
-                   FastingStatus AS fastingStatus
-            FROM MeasurementSession
-            WHERE UserID = %s
-            ORDER BY SessionDate
-        """,
-            (userId,),
-        )
-        sessions = cursor.fetchall()
-    return {"sessions": sessions}
+    cached, slot = response_cache.lookup(userId, request)
+    if cached is not None:
+        return cached
+    with pooled_connection() as db:
+        with db.cursor() as cursor:
+            cursor.execute(
+                queries.USER_SESSIONS,
+                (userId,),
+            )
+            sessions = cursor.fetchall()
+    return response_cache.store(slot, {"sessions": sessions}, request)
 
 
 @app.get("/api/v1/biomarkers")
-def biomarker_catalog(db=Depends(get_db)):
-    """Query 9: Return all biomarkers with metadata"""
-    with db.cursor() as cursor:
-        query = """
-        SELECT
-            BiomarkerID AS biomarkerId,
-            Name AS name,
-            Units AS units,
-            Description AS description,
-            NHANESVarCode AS nhanesVarCode
-        FROM Biomarker
-        """
-        cursor.execute(query)
-        biomarkers = cursor.fetchall()
-        return {"biomarkers": biomarkers}
+def biomarker_catalog(request: Request):
+    """Query 9: Return all biomarkers with metadata (served from the catalog cache)"""
+    return catalog.response("biomarkers", request.headers.get("if-none-match"))
 
 
 @app.get("/api/v1/biomarkers/{biomarkerId}/ranges")
-def biomarker_reference_ranges(biomarkerId: int, db=Depends(get_db)):
-    """Query 10: Get all reference ranges for specific biomarker"""
-    with db.cursor() as cursor:
-        query = """
-        SELECT
-            RangeType AS rangeType,
-            Sex AS sex,
-            AgeMin AS ageMin,
-            AgeMax AS ageMax,
-            MinVal AS minVal,
-            MaxVal AS maxVal
-        FROM ReferenceRange
-        WHERE BiomarkerID = %s
-        """
-        cursor.execute(query, (biomarkerId,))
-        ranges = cursor.fetchall()
-        if not ranges:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Biomarker not found"
-            )
-        return {"ranges": ranges}
+def biomarker_reference_ranges(biomarkerId: int, request: Request):
+    """Query 10: Get all reference ranges for specific biomarker (cached)"""
+    response = catalog.response(
+        f"ranges/{biomarkerId}", request.headers.get("if-none-match")
+    )
+    if response is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Biomarker not found"
+        )
+    return response
 
 
 @app.get("/api/v1/users/age-distribution")
 def get_age_distribution(db=Depends(get_db)):
     """Query 11: Show user count by age groups"""
     with db.cursor() as cursor:
-        query = """
-        SELECT
-            CASE
-                WHEN TIMESTAMPDIFF(YEAR, BirthDate, CURDATE()) < 30 THEN "20-29"
-                WHEN TIMESTAMPDIFF(YEAR, BirthDate, CURDATE()) < 40 THEN "30-39"
-                WHEN TIMESTAMPDIFF(YEAR, BirthDate, CURDATE()) < 50 THEN "40-49"
-                ELSE "60+"
-                END AS AgeGroup,
-            Sex,
-            COUNT(*) AS UserCount
-        FROM User
-        GROUP BY AgeGroup, Sex
-        ORDER BY AgeGroup, Sex
-        """
-        cursor.execute(query)
+        cursor.execute(queries.AGE_DISTRIBUTION)
         return {"ageDistribution": cursor.fetchall()}
 
 
@@ -751,19 +778,78 @@ def get_age_distribution(db=Depends(get_db)):
 def get_biomarkers_with_counts(db=Depends(get_db)):
     """Query 12: List all biomarkers with their measurement count"""
     with db.cursor() as cursor:
-        query = """
-        SELECT
-            Biomarker.Name,
-            Biomarker.Units,
-            COUNT(Measurement.MeasurementID) AS MeasurementCount
-        FROM Biomarker
-        LEFT JOIN Measurement ON Biomarker.BiomarkerID=Measurement.BiomarkerID
-        GROUP BY Biomarker.Name, Biomarker.Units
-        """
-        cursor.execute(query)
+        cursor.execute(queries.MEASUREMENT_SUMMARY)
         return {"biomarkers": cursor.fetchall()}
 
 
+@app.get("/api/v1/cohort/percentiles")
+def get_cohort_percentiles(biomarkerId: Optional[int] = None):
+    """Query 13: Population percentiles per biomarker, sex and age band"""
+    return cohort.response("biomarkers", biomarkerId, "biomarkerId")
+
+
+@app.get("/api/v1/cohort/bio-age-gaps")
+def get_cohort_bio_age_gaps(model: Optional[str] = None):
+    """Query 14: Distribution of biological age gaps per model, sex and age band"""
+    return cohort.bio_age_gap_response(model)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics: request/SQL timings, pool and cache counters"""
+    return PlainTextResponse(
+        profiler.render(
+            {
+                "db_pool": db_pool.stats(),
+                "catalog_cache": catalog.stats(),
+                "response_cache": response_cache.stats(),
+            }
+        ),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+@app.get("/api/v1/admin/pool")
+def get_pool_stats():
+    """Report connection pool size and checkout/wait/timeout counters"""
+    return {"pool": db_pool.stats()}
+
+
+@app.get("/api/v1/admin/cache")
+def get_cache_stats():
+    """Report catalog and response cache sizes and hit/miss/eviction counters"""
+    return {"catalog": catalog.stats(), "responses": response_cache.stats()}
+
+
+@app.post("/api/v1/admin/cache/invalidate")
+def invalidate_cache(userId: Optional[int] = None):
+    """
+    Drop the catalog and response caches (call after the seed/ETL runs)
+
+    With ``userId``, only that user's cached responses are dropped.
+    """
+    if userId is not None:
+        response_cache.invalidate(userId)
+    else:
+        catalog.invalidate()
+        response_cache.clear()
+    return {"catalog": catalog.stats(), "responses": response_cache.stats()}
+
+
+@app.get("/api/v1/admin/cohort")
+def get_cohort_stats():
+    """Report cohort table fingerprint, size and build/load counters"""
+    return {"cohort": cohort.stats()}
+
+
+@app.post("/api/v1/admin/cohort/refresh")
+def refresh_cohort(db=Depends(get_db)):
+    """Rebuild the cohort percentile tables from the current data"""
+    cohort.refresh(db, HD_MODEL_DIR, force=True)
+    response_cache.clear()  # /ranges responses carry cohort percentiles
+    return {"cohort": cohort.stats()}
+
+
 # ---------------------------------------------------------------------
 # Legacy test stub endpoints - DO NOT USE IN PRODUCTION
 # These exist only for backward compatibility with existing tests
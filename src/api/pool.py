@@ -0,0 +1,244 @@
+"""
+Bounded connection pool for the Longevity Biomarker API.
+
+Keeps PyMySQL connections open between requests so cheap endpoints do not pay
+the TCP/auth handshake on every call.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the timeout"""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections
+
+    Connections are created lazily up to ``max_size``. On checkout a
+    connection that sat idle for longer than ``ping_after`` seconds is pinged,
+    and one older than ``recycle`` seconds is replaced. On return any open
+    transaction is rolled back and idle connections beyond ``min_size`` are
+    closed once they have been idle for ``max_idle`` seconds.
+    """
+
+    def __init__(
+        self,
+        connect: Callable,
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 5.0,
+        recycle: float = 300.0,
+        max_idle: float = 60.0,
+        ping_after: float = 1.0,
+    ):
+        """Initialize the pool (no connections are opened until first use)"""
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size >= 1")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.max_idle = max_idle
+        self.ping_after = ping_after
+
+        self._lock = threading.Condition()
+        # idle entries are (connection, created_at, last_used_at)
+        self._idle = deque()
+        self._created_at = {}
+        self._size = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._wait_seconds = 0.0
+
+    # ---- public API --------------------------------------------------
+    def open(self) -> "ConnectionPool":
+        """Pre-open ``min_size`` connections"""
+        while True:
+            with self._lock:
+                if self._closed or self._size >= self.min_size:
+                    return self
+                self._size += 1
+            connection = self._new_connection()
+            with self._lock:
+                self._idle.append(
+                    (connection, self._created_at[id(connection)], time.monotonic())
+                )
+                self._lock.notify()
+
+    def acquire(self, timeout: float = None):
+        """Check out a healthy connection, waiting up to ``timeout`` seconds"""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        waited = False
+        started = time.monotonic()
+
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                entry = None
+                if self._idle:
+                    entry = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                else:
+                    remaining = deadline - time.monotonic()
+                    if not waited:
+                        self._waits += 1
+                        waited = True
+                    if remaining <= 0 or not self._lock.wait(remaining):
+                        if not self._idle and self._size >= self.max_size:
+                            self._timeouts += 1
+                            raise PoolTimeout(
+                                f"No database connection available after {timeout:.1f}s"
+                            )
+                    continue
+
+            if entry is None:
+                connection = self._new_connection()
+            else:
+                connection = self._validate(entry)
+                if connection is None:
+                    continue
+
+            with self._lock:
+                self._checkouts += 1
+                if waited:
+                    self._wait_seconds += time.monotonic() - started
+            return connection
+
+    def release(self, connection) -> None:
+        """Return a connection, rolling back anything left uncommitted"""
+        try:
+            connection.rollback()
+        except Exception:
+            self._discard(connection)
+            return
+
+        now = time.monotonic()
+        created_at = self._created_at.get(id(connection), now)
+        stale = []
+        with self._lock:
+            if self._closed or now - created_at > self.recycle:
+                discard = True
+            else:
+                discard = False
+                self._idle.append((connection, created_at, now))
+                stale = self._prune_idle(now)
+                self._lock.notify()
+        if discard:
+            self._discard(connection)
+        for idle_connection in stale:
+            _close_quietly(idle_connection)
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        """Context manager that checks a connection out and returns it after"""
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close(self) -> None:
+        """Close every idle connection and refuse further checkouts"""
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._lock.notify_all()
+        for connection, _, _ in idle:
+            self._discard(connection)
+
+    def stats(self) -> Dict[str, float]:
+        """Snapshot of pool size and checkout counters"""
+        with self._lock:
+            return {
+                "minSize": self.min_size,
+                "maxSize": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "inUse": self._size - len(self._idle),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "created": self._created,
+                "discarded": self._discarded,
+                "waitSeconds": round(self._wait_seconds, 6),
+            }
+
+    # ---- internals ---------------------------------------------------
+    def _new_connection(self):
+        """Open a connection for a slot that has already been reserved"""
+        try:
+            connection = self._connect()
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self._created += 1
+            self._created_at[id(connection)] = time.monotonic()
+        return connection
+
+    def _validate(self, entry):
+        """Return the idle connection if still usable, otherwise discard it"""
+        connection, created_at, last_used = entry
+        now = time.monotonic()
+        if now - created_at > self.recycle:
+            self._discard(connection)
+            return None
+        if now - last_used > self.ping_after:
+            try:
+                connection.ping(reconnect=False)
+            except Exception:
+                self._discard(connection)
+                return None
+        return connection
+
+    def _prune_idle(self, now: float) -> list:
+        """Detach idle connections above ``min_size`` that outlived ``max_idle``
+
+        Must be called with the lock held; the caller closes the returned
+        connections after releasing it.
+        """
+        stale = []
+        while len(self._idle) > self.min_size:
+            connection, _, last_used = self._idle[0]
+            if now - last_used <= self.max_idle:
+                break
+            self._idle.popleft()
+            self._size -= 1
+            self._discarded += 1
+            self._created_at.pop(id(connection), None)
+            stale.append(connection)
+        return stale
+
+    def _discard(self, connection) -> None:
+        """Close a connection and free its slot"""
+        _close_quietly(connection)
+        with self._lock:
+            self._size -= 1
+            self._discarded += 1
+            self._created_at.pop(id(connection), None)
+            self._lock.notify()
+
+
+def _close_quietly(connection) -> None:
+    try:
+        connection.close()
+    except Exception:
+        pass  # Connection might already be closed
@@ -0,0 +1,396 @@
+"""
+Request profiling and SQL timing.
+
+When enabled (``API_PROFILING=1``), ``ProfilingMiddleware`` gives every HTTP
+request a ``RequestProfile`` through a context variable. Pool checkouts add
+to its connect time, and the cursor classes returned by ``timed_cursor`` /
+``timed_async_cursor`` add each statement's time and row count under its
+normalized text. Whatever is left of the request's wall time is Python:
+validation, NumPy/pandas work and JSON serialization. The totals are
+aggregated into Prometheus text served at ``/metrics`` and sent back as a
+``Server-Timing`` header. Statements slower than a threshold can be logged,
+with sampling.
+
+When disabled, the middleware is not installed and connections use the
+plain cursor classes, so the only cost left is one context-variable lookup
+per pool checkout.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+
+# Upper bounds of the request duration histogram, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Longest statement text used as a metric label
+MAX_STATEMENT_LABEL = 200
+
+_WHITESPACE = re.compile(r"\s+")
+_LITERALS = re.compile(r"'(?:[^'\\]|\\.)*'|\b\d+(?:\.\d+)?\b|%s")
+_VALUE_LISTS = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and replace literals/placeholders with ``?``"""
+    text = _WHITESPACE.sub(" ", sql).strip().rstrip(";").strip()
+    text = _LITERALS.sub("?", text)
+    return _VALUE_LISTS.sub("(...)", text)
+
+
+@dataclass
+class RequestProfile:
+    """Time spent by one request, split by phase"""
+
+    started: float = field(default_factory=time.perf_counter)
+    connect_seconds: float = 0.0
+    sql_seconds: float = 0.0
+    statements: List[Tuple[str, float, int]] = field(default_factory=list)
+
+    def elapsed(self) -> float:
+        """Wall time since the request started"""
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """``Server-Timing`` header value (milliseconds per phase)"""
+        total = self.elapsed()
+        python = max(total - self.connect_seconds - self.sql_seconds, 0.0)
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.2f}"
+            for name, seconds in (
+                ("connect", self.connect_seconds),
+                ("sql", self.sql_seconds),
+                ("python", python),
+                ("total", total),
+            )
+        )
+
+
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar(
+    "current_profile", default=None
+)
+
+
+def _label(value) -> str:
+    """Escape a Prometheus label value"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _metric_name(name: str) -> str:
+    """Convert a camelCase stats key to a snake_case metric name"""
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+
+class Profiler:
+    """
+    Aggregated request and statement timings
+
+    Args:
+        enabled: Install the middleware and timed cursors
+        slow_query_ms: Log statements slower than this (None: no log)
+        slow_query_sample: Fraction of slow statements that are logged
+        slow_query_log: File the log lines are appended to (default: stdout)
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        slow_query_ms: Optional[float] = None,
+        slow_query_sample: float = 1.0,
+        slow_query_log: Optional[str] = None,
+    ):
+        """Create an empty profiler"""
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.slow_query_sample = slow_query_sample
+        self.slow_query_log = slow_query_log
+        self._lock = threading.Lock()
+        self.reset()
+
+    def configure(self, **settings) -> None:
+        """Update any of the constructor settings"""
+        for name, value in settings.items():
+            setattr(self, name, value)
+
+    def reset(self) -> None:
+        """Drop every aggregated metric"""
+        with self._lock:
+            # (method, route, status) -> [count, seconds, connect, sql, buckets]
+            self._requests: Dict[Tuple[str, str, int], list] = {}
+            # normalized statement -> [count, seconds, rows, max seconds]
+            self._statements: Dict[str, list] = {}
+            self._slow_queries = 0
+
+    # ---- recording ---------------------------------------------------------
+    def record_connect(self, seconds: float) -> None:
+        """Add a pool checkout to the current request (no-op outside one)"""
+        profile = current_profile.get()
+        if profile is not None:
+            profile.connect_seconds += seconds
+
+    def record_sql(self, sql: str, seconds: float, rows: int) -> None:
+        """Add one executed statement to the current request"""
+        profile = current_profile.get()
+        if profile is None:
+            return
+        statement = normalize_sql(sql if isinstance(sql, str) else sql.decode())
+        # Unbuffered (SS) cursors report -1 or 2**64 - 1 until read
+        rows = rows if rows and 0 < rows < 2**63 else 0
+        profile.sql_seconds += seconds
+        profile.statements.append((statement, seconds, rows))
+        if (
+            self.slow_query_ms is not None
+            and seconds * 1000 >= self.slow_query_ms
+            and random.random() < self.slow_query_sample
+        ):
+            self._log_slow(statement, seconds, rows)
+
+    def record_request(
+        self, method: str, route: str, status: int, profile: RequestProfile
+    ) -> None:
+        """Fold a finished request into the aggregates"""
+        seconds = profile.elapsed()
+        with self._lock:
+            entry = self._requests.setdefault(
+                (method, route, status), [0, 0.0, 0.0, 0.0, [0] * len(DURATION_BUCKETS)]
+            )
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += profile.connect_seconds
+            entry[3] += profile.sql_seconds
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    entry[4][i] += 1
+            for statement, statement_seconds, rows in profile.statements:
+                totals = self._statements.setdefault(statement, [0, 0.0, 0, 0.0])
+                totals[0] += 1
+                totals[1] += statement_seconds
+                totals[2] += rows
+                totals[3] = max(totals[3], statement_seconds)
+
+    def _log_slow(self, statement: str, seconds: float, rows: int) -> None:
+        """Write one slow-statement line (statement text only, never params)"""
+        self._slow_queries += 1
+        line = json.dumps(
+            {
+                "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "ms": round(seconds * 1000, 3),
+                "rows": rows,
+                "statement": statement,
+            }
+        )
+        if self.slow_query_log:
+            try:
+                with open(self.slow_query_log, "a") as f:
+                    f.write(line + "\n")
+                return
+            except OSError as e:
+                print(f"[WARNING] could not write slow query log: {str(e)}")
+        print(f"[SLOW QUERY] {line}")
+
+    # ---- exposition --------------------------------------------------------
+    def render(self, gauges: Optional[Dict[str, Dict]] = None) -> str:
+        """
+        Metrics in the Prometheus text format
+
+        Args:
+            gauges: Extra {prefix: stats dict} whose numeric values are
+                exported as ``api_<prefix>_<key>`` gauges (pool, caches)
+        """
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            requests = {key: list(value) for key, value in self._requests.items()}
+            statements = {key: list(value) for key, value in self._statements.items()}
+            slow_queries = self._slow_queries
+
+        header("api_request_duration_seconds", "histogram", "Request wall time")
+        for (method, route, status), entry in sorted(requests.items()):
+            labels = f'method="{method}",route="{_label(route)}",status="{status}"'
+            for bound, count in zip(DURATION_BUCKETS, entry[4]):
+                lines.append(
+                    f'api_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}'
+                )
+            lines.append(
+                f'api_request_duration_seconds_bucket{{{labels},le="+Inf"}} {entry[0]}'
+            )
+            lines.append(f"api_request_duration_seconds_sum{{{labels}}} {entry[1]:.6f}")
+            lines.append(f"api_request_duration_seconds_count{{{labels}}} {entry[0]}")
+
+        header(
+            "api_request_phase_seconds_total",
+            "counter",
+            "Request time by phase: connect (pool checkout), sql, python",
+        )
+        for (method, route, status), entry in sorted(requests.items()):
+            labels = f'method="{method}",route="{_label(route)}",status="{status}"'
+            python = max(entry[1] - entry[2] - entry[3], 0.0)
+            for phase, seconds in (
+                ("connect", entry[2]),
+                ("sql", entry[3]),
+                ("python", python),
+            ):
+                lines.append(
+                    f'api_request_phase_seconds_total{{{labels},phase="{phase}"}} '
+                    f"{seconds:.6f}"
+                )
+
+        for name, index, kind, help_text in (
+            ("api_sql_statements_total", 0, "counter", "Executions per statement"),
+            ("api_sql_seconds_total", 1, "counter", "Time per statement"),
+            ("api_sql_rows_total", 2, "counter", "Rows returned or affected"),
+            ("api_sql_seconds_max", 3, "gauge", "Slowest execution per statement"),
+        ):
+            header(name, kind, help_text)
+            for statement, totals in sorted(statements.items()):
+                label = _label(statement[:MAX_STATEMENT_LABEL])
+                value = totals[index]
+                value = f"{value:.6f}" if isinstance(value, float) else value
+                lines.append(f'{name}{{statement="{label}"}} {value}')
+
+        header("api_slow_queries_total", "counter", "Slow statements logged")
+        lines.append(f"api_slow_queries_total {slow_queries}")
+
+        for prefix, stats in (gauges or {}).items():
+            for key, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"api_{prefix}_{_metric_name(key)}"
+                header(name, "gauge", f"{prefix} {key}")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def route_path(scope) -> str:
+    """Path template of the matched route (low-cardinality metric label)"""
+    endpoint = scope.get("endpoint")
+    app = scope.get("app")
+    if endpoint is None or app is None:
+        return "unmatched"
+    for route in getattr(app, "routes", ()):
+        if getattr(route, "endpoint", None) is endpoint:
+            return route.path
+    return "unmatched"
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles every HTTP request"""
+
+    def __init__(self, app, profiler: Profiler):
+        """Wrap ``app``"""
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        """Run the request with a fresh RequestProfile in context"""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"server-timing", profile.server_timing().encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_profile.reset(token)
+            self.profiler.record_request(
+                scope["method"], route_path(scope), status, profile
+            )
+
+
+@lru_cache(maxsize=None)
+def timed_cursor(cursor_class):
+    """Subclass of a PyMySQL cursor class that times execute/executemany"""
+
+    class TimedCursor(cursor_class):
+        _in_executemany = False
+
+        def execute(self, query, args=None):
+            """Execute and record the statement on the current request"""
+            if self._in_executemany:
+                return super().execute(query, args)
+            started = time.perf_counter()
+            try:
+                return super().execute(query, args)
+            finally:
+                profiler.record_sql(query, time.perf_counter() - started, self.rowcount)
+
+        def executemany(self, query, args):
+            """Executemany and record it once on the current request"""
+            started = time.perf_counter()
+            self._in_executemany = True  # its per-chunk execute calls
+            try:
+                return super().executemany(query, args)
+            finally:
+                self._in_executemany = False
+                profiler.record_sql(query, time.perf_counter() - started, self.rowcount)
+
+    TimedCursor.__name__ = f"Timed{cursor_class.__name__}"
+    return TimedCursor
+
+
+@lru_cache(maxsize=None)
+def timed_async_cursor(cursor_class):
+    """Subclass of an aiomysql cursor class that times execute/executemany"""
+
+    class TimedAsyncCursor(cursor_class):
+        _in_executemany = False
+
+        async def execute(self, query, args=None):
+            """Execute and record the statement on the current request"""
+            if self._in_executemany:
+                return await super().execute(query, args)
+            started = time.perf_counter()
+            try:
+                return await super().execute(query, args)
+            finally:
+                profiler.record_sql(query, time.perf_counter() - started, self.rowcount)
+
+        async def executemany(self, query, args):
+            """Executemany and record it once on the current request"""
+            started = time.perf_counter()
+            self._in_executemany = True  # its per-chunk execute calls
+            try:
+                return await super().executemany(query, args)
+            finally:
+                self._in_executemany = False
+                profiler.record_sql(query, time.perf_counter() - started, self.rowcount)
+
+    TimedAsyncCursor.__name__ = f"Timed{cursor_class.__name__}"
+    return TimedAsyncCursor
+
+
+def cursor_class(base):
+    """``base`` itself, or its timed subclass when profiling is enabled"""
+    return timed_cursor(base) if profiler.enabled else base
+
+
+def async_cursor_class(base):
+    """Async counterpart of ``cursor_class`` for aiomysql cursors"""
+    return timed_async_cursor(base) if profiler.enabled else base
+
+
+# Shared by the middleware, the cursors and /metrics; configured in main.py
+profiler = Profiler()
@@ -0,0 +1,412 @@
+"""
+SQL statements issued by the Longevity Biomarker API.
+
+Kept in one place so the sync handlers in ``main.py`` and the async handlers
+in ``async_routes.py`` run exactly the same statements.
+"""
+
+# ---------------------------------------------------------------------
+# Startup: HD reference population
+# ---------------------------------------------------------------------
+HD_REFERENCE_POPULATION = """
+SELECT
+    view_reference.UserID,
+    view_reference.Age,
+    view_reference.BMI,
+    view_reference.Sex,
+    latest.BiomarkerID,
+    Biomarker.Name AS BiomarkerName,
+    latest.Value
+FROM v_hd_reference_candidates view_reference
+JOIN UserLatestMeasurement latest ON view_reference.UserID=latest.UserID
+JOIN Biomarker ON latest.BiomarkerID=Biomarker.BiomarkerID
+WHERE latest.BiomarkerID BETWEEN 1 AND 9
+"""
+
+# Cheap server-side summary of the rows HD_REFERENCE_POPULATION would return,
+# used to key persisted HD model artifacts
+HD_REFERENCE_FINGERPRINT = """
+SELECT
+    COUNT(*) AS rowCount,
+    BIT_XOR(CRC32(CONCAT_WS('|',
+        view_reference.UserID, view_reference.Age, view_reference.BMI,
+        view_reference.Sex, latest.BiomarkerID, Biomarker.Name, latest.Value
+    ))) AS checksum
+FROM v_hd_reference_candidates view_reference
+JOIN UserLatestMeasurement latest ON view_reference.UserID=latest.UserID
+JOIN Biomarker ON latest.BiomarkerID=Biomarker.BiomarkerID
+WHERE latest.BiomarkerID BETWEEN 1 AND 9
+"""
+
+# ---------------------------------------------------------------------
+# User-profile queries
+# ---------------------------------------------------------------------
+USER_BASIC = """
+SELECT
+    UserID AS userId,
+    SEQN AS seqn,
+    BirthDate AS birthDate,
+    Sex AS sex,
+    RaceEthnicity AS raceEthnicity,
+    TIMESTAMPDIFF(YEAR, BirthDate, CURDATE()) AS age
+FROM User
+WHERE UserID = %s
+"""
+
+USER_LATEST_BIOMARKERS = """
+SELECT
+    latest.BiomarkerID AS biomarkerId,
+    Biomarker.Name AS name,
+    latest.Value AS value,
+    Biomarker.Units AS units,
+    latest.TakenAt AS takenAt
+FROM UserLatestMeasurement latest
+JOIN Biomarker ON latest.BiomarkerID=Biomarker.BiomarkerID
+WHERE latest.UserID = %s
+ORDER BY latest.BiomarkerID
+"""
+
+# Keyset-paginated: walks the User primary key from ``after`` and counts
+# sessions per returned user via the (UserID, SessionDate) unique index, so
+# the cost is proportional to the page, not the population. ``{filters}`` is
+# filled from the LIST_USERS_*_FILTER fragments, ``{limit}`` with LIST_USERS_LIMIT
+LIST_USERS = """
+SELECT
+    view_age.UserID AS userId,
+    view_age.SEQN AS seqn,
+    view_age.Age AS age,
+    view_age.Sex AS sex,
+    view_age.RaceEthnicity AS raceEthnicity,
+    (SELECT COUNT(*)
+     FROM MeasurementSession
+     WHERE MeasurementSession.UserID = view_age.UserID) AS sessionCount
+FROM
+    v_user_with_age view_age
+WHERE
+    view_age.UserID > %s{filters}
+ORDER BY
+    view_age.UserID
+{limit}"""
+
+LIST_USERS_SEX_FILTER = "\n    AND view_age.Sex = %s"
+
+LIST_USERS_RACE_FILTER = "\n    AND view_age.RaceEthnicity = %s"
+
+# Age bounds are applied to BirthDate so they stay sargable
+LIST_USERS_MIN_AGE_FILTER = (
+    "\n    AND view_age.BirthDate <= CURDATE() - INTERVAL %s YEAR"
+)
+
+LIST_USERS_MAX_AGE_FILTER = (
+    "\n    AND view_age.BirthDate > CURDATE() - INTERVAL %s YEAR"
+)
+
+LIST_USERS_LIMIT = "LIMIT %s"
+
+# ---------------------------------------------------------------------
+# Biological age queries
+# ---------------------------------------------------------------------
+CURRENT_BIO_AGE = """
+SELECT
+    BiologicalAgeModel.ModelName AS modelName,
+    BiologicalAgeResult.BioAgeYears AS bioAgeYears,
+    BiologicalAgeResult.BioAgeYears - view_age.AGE AS ageGap,
+    BiologicalAgeResult.ComputedAt AS computedAt
+FROM v_user_with_age view_age
+JOIN BiologicalAgeResult ON view_age.UserID=BiologicalAgeResult.UserID
+JOIN BiologicalAgeModel ON BiologicalAgeResult.ModelID=BiologicalAgeModel.ModelID
+WHERE view_age.UserID = %s
+ORDER BY BiologicalAgeResult.ModelID;
+"""
+
+COHORT_LATEST_BIOMARKERS = """
+SELECT
+    latest.UserID,
+    TIMESTAMPDIFF(YEAR, User.BirthDate, CURDATE()) AS Age,
+    User.Sex,
+    latest.BiomarkerID,
+    Biomarker.Name AS BiomarkerName,
+    latest.Value
+FROM UserLatestMeasurement latest
+JOIN User ON User.UserID = latest.UserID
+JOIN Biomarker ON Biomarker.BiomarkerID = latest.BiomarkerID
+WHERE latest.BiomarkerID BETWEEN 1 AND 9
+"""
+
+COHORT_LATEST_BIOMARKERS_FOR_USERS = (
+    COHORT_LATEST_BIOMARKERS + "AND latest.UserID IN ({placeholders})\n"
+)
+
+PHENOTYPIC_COEFFICIENTS = """
+SELECT
+    BiomarkerID AS biomarkerId,
+    Coefficient AS coefficient,
+    Transform AS transform
+FROM ModelUsesBiomarker
+WHERE ModelID = 1
+"""
+
+INSERT_BIO_AGE_RESULT = """
+INSERT INTO BiologicalAgeResult(UserID, ModelID, BioAgeYears, ComputedAt, CreatedAt)
+    VALUES(%s, %s, %s, %s, %s);
+"""
+
+# The user's age is an uncorrelated subquery, computed once rather than per
+# row through v_user_with_age; params are (UserID, UserID)
+BIO_AGE_HISTORY = """
+SELECT
+    BiologicalAgeResult.ModelID AS modelId,
+    BiologicalAgeModel.ModelName as modelName,
+    BiologicalAgeResult.BioAgeYears as bioAgeYears,
+    BiologicalAgeResult.BioAgeYears - (
+        SELECT TIMESTAMPDIFF(YEAR, BirthDate, CURDATE()) FROM User WHERE UserID = %s
+    ) AS ageGap,
+    BiologicalAgeResult.ComputedAt AS computedAt
+FROM BiologicalAgeResult
+JOIN BiologicalAgeModel ON BiologicalAgeResult.ModelID=BiologicalAgeModel.ModelID
+WHERE BiologicalAgeResult.UserID = %s
+"""
+
+BIO_AGE_HISTORY_MODEL_FILTER = " AND BiologicalAgeResult.ModelID = %s"
+
+BIO_AGE_HISTORY_ORDER = " ORDER BY BiologicalAgeResult.ComputedAt DESC;"
+
+# Keyset pages walk Idx_Bio_Age_User_Model (UserID, ModelID, ComputedAt)
+# backwards; the cursor is the (ModelID, ComputedAt) of the previous page's
+# last row
+BIO_AGE_HISTORY_CURSOR_FILTER = """
+    AND (BiologicalAgeResult.ModelID < %s
+         OR (BiologicalAgeResult.ModelID = %s AND BiologicalAgeResult.ComputedAt < %s))"""
+
+BIO_AGE_HISTORY_PAGE_ORDER = """
+ORDER BY BiologicalAgeResult.ModelID DESC, BiologicalAgeResult.ComputedAt DESC
+LIMIT %s"""
+
+# Bucketed series read the same index forwards, model by model
+BIO_AGE_HISTORY_SERIES_ORDER = """
+ORDER BY BiologicalAgeResult.ModelID, BiologicalAgeResult.ComputedAt
+LIMIT %s"""
+
+# ---------------------------------------------------------------------
+# Measurement queries
+# ---------------------------------------------------------------------
+INSERT_SESSION = """
+INSERT INTO MeasurementSession(UserID, SessionDate, FastingStatus, CreatedAt)
+    VALUES(%s, %s, %s, %s);
+"""
+
+INSERT_MEASUREMENT = """
+INSERT INTO Measurement(SessionID, BiomarkerID, Value, TakenAt, CreatedAt)
+    VALUES(%s, %s, %s, %s, %s);
+"""
+
+# Bulk ingestion (ingest.py): existence checks and ID lookups for whole
+# batches, so multi-row INSERTs never need per-row lastrowid
+KNOWN_USERS = """
+SELECT UserID FROM User WHERE UserID IN %s
+"""
+
+SESSIONS_FOR_USERS = """
+SELECT SessionID, UserID, SessionDate
+FROM MeasurementSession
+WHERE UserID IN %s AND SessionDate IN %s
+"""
+
+MEASUREMENT_IDS_FOR_SESSIONS = """
+SELECT MeasurementID, SessionID, BiomarkerID
+FROM Measurement
+WHERE SessionID IN %s
+"""
+
+# Keeps UserLatestMeasurement current; Value/MeasurementID are assigned before
+# TakenAt because MySQL applies the assignments left to right
+UPSERT_LATEST_MEASUREMENT = """
+INSERT INTO UserLatestMeasurement(UserID, BiomarkerID, MeasurementID, Value, TakenAt)
+    VALUES(%s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    MeasurementID = IF(VALUES(TakenAt) >= TakenAt, VALUES(MeasurementID), MeasurementID),
+    Value = IF(VALUES(TakenAt) >= TakenAt, VALUES(Value), Value),
+    TakenAt = GREATEST(TakenAt, VALUES(TakenAt));
+"""
+
+BIOMARKER_TREND_BASE = """
+SELECT
+    MeasurementSession.SessionDate AS date,
+    Measurement.Value AS value,
+    Measurement.SessionID AS sessionId
+FROM Measurement
+JOIN MeasurementSession ON Measurement.SessionID=MeasurementSession.SessionID
+WHERE MeasurementSession.UserID=%s AND Measurement.BiomarkerID=%s AND MeasurementSession.SessionDate > %s
+"""
+
+# The most recent %s points (handlers put them back in date order)
+BIOMARKER_TREND = (
+    BIOMARKER_TREND_BASE + "ORDER BY MeasurementSession.SessionDate DESC\nLIMIT %s\n"
+)
+
+# The whole range in date order, capped, for bucketing/downsampling
+BIOMARKER_TREND_SERIES = (
+    BIOMARKER_TREND_BASE + "ORDER BY MeasurementSession.SessionDate\nLIMIT %s\n"
+)
+
+# ---------------------------------------------------------------------
+# Session queries
+# ---------------------------------------------------------------------
+# Every biomarker of a user in one scan of (UserID, SessionDate) sessions and
+# their (SessionID, BiomarkerID) measurements; {biomarkers} is empty or
+# MULTI_TREND_BIOMARKER_FILTER
+MULTI_BIOMARKER_TREND = """
+SELECT
+    MeasurementSession.SessionDate AS date,
+    MeasurementSession.SessionID AS sessionId,
+    Measurement.BiomarkerID AS biomarkerId,
+    Measurement.Value AS value
+FROM MeasurementSession
+JOIN Measurement ON Measurement.SessionID=MeasurementSession.SessionID
+WHERE MeasurementSession.UserID=%s AND MeasurementSession.SessionDate > %s{biomarkers}
+ORDER BY MeasurementSession.SessionDate DESC, Measurement.BiomarkerID
+LIMIT %s
+"""
+
+MULTI_TREND_BIOMARKER_FILTER = "\n    AND Measurement.BiomarkerID IN %s"
+
+SESSION_DETAILS = """
+SELECT
+    SessionID AS sessionId,
+    SessionDate AS sessionDate,
+    FastingStatus AS fastingStatus
+FROM MeasurementSession
+WHERE UserID = %s AND SessionID = %s
+"""
+
+SESSION_MEASUREMENTS = """
+SELECT
+    m.BiomarkerID   AS biomarkerID,
+    b.Name          AS name,
+    m.Value         AS value,
+    b.Units         AS units
+FROM Measurement m
+JOIN Biomarker b ON m.BiomarkerID = b.BiomarkerID
+WHERE m.SessionID = %s
+ORDER BY m.BiomarkerID
+"""
+
+USER_SESSIONS = """
+SELECT SessionID AS sessionId,
+       SessionDate AS sessionDate,
+       FastingStatus AS fastingStatus
+FROM MeasurementSession
+WHERE UserID = %s
+ORDER BY SessionDate
+"""
+
+# ---------------------------------------------------------------------
+# Catalog (cached in-process, see catalog.py) and population queries
+# ---------------------------------------------------------------------
+BIOMARKER_CATALOG = """
+SELECT
+    BiomarkerID AS biomarkerId,
+    Name AS name,
+    Units AS units,
+    Description AS description,
+    NHANESVarCode AS nhanesVarCode
+FROM Biomarker
+ORDER BY BiomarkerID
+"""
+
+REFERENCE_RANGES = """
+SELECT
+    BiomarkerID AS biomarkerId,
+    RangeType AS rangeType,
+    Sex AS sex,
+    AgeMin AS ageMin,
+    AgeMax AS ageMax,
+    MinVal AS minVal,
+    MaxVal AS maxVal
+FROM ReferenceRange
+ORDER BY BiomarkerID, RangeID
+"""
+
+BIO_AGE_MODEL_CATALOG = """
+SELECT
+    ModelID AS modelId,
+    ModelName AS modelName,
+    Description AS description
+FROM BiologicalAgeModel
+ORDER BY ModelID
+"""
+
+MODEL_COEFFICIENTS = """
+SELECT
+    ModelID AS modelId,
+    BiomarkerID AS biomarkerId,
+    Coefficient AS coefficient,
+    Transform AS transform
+FROM ModelUsesBiomarker
+ORDER BY ModelID, BiomarkerID
+"""
+
+# Cohort percentile tables (cohort.py): latest value per user and biomarker,
+# and age gap of the latest result per user and model
+COHORT_PERCENTILE_SOURCE = """
+SELECT
+    latest.BiomarkerID,
+    view_age.Sex,
+    view_age.Age,
+    latest.Value
+FROM UserLatestMeasurement latest
+JOIN v_user_with_age view_age ON view_age.UserID = latest.UserID
+"""
+
+BIO_AGE_GAP_SOURCE = """
+SELECT
+    result.ModelID,
+    view_age.Sex,
+    view_age.Age,
+    result.BioAgeYears - view_age.Age AS AgeGap
+FROM BiologicalAgeResult result
+JOIN (
+    SELECT UserID, ModelID, MAX(ComputedAt) AS ComputedAt
+    FROM BiologicalAgeResult
+    GROUP BY UserID, ModelID
+) newest ON newest.UserID = result.UserID
+    AND newest.ModelID = result.ModelID
+    AND newest.ComputedAt = result.ComputedAt
+JOIN v_user_with_age view_age ON view_age.UserID = result.UserID
+"""
+
+# Cheap summary of the rows above; ages depend on the date, so it is included
+COHORT_FINGERPRINT = """
+SELECT
+    CURDATE() AS asOf,
+    (SELECT COUNT(*) FROM UserLatestMeasurement) AS latestRows,
+    (SELECT BIT_XOR(CRC32(CONCAT_WS('|', UserID, BiomarkerID, MeasurementID, Value)))
+        FROM UserLatestMeasurement) AS latestChecksum,
+    (SELECT COUNT(*) FROM BiologicalAgeResult) AS resultRows,
+    (SELECT MAX(ResultID) FROM BiologicalAgeResult) AS lastResultId
+"""
+
+AGE_DISTRIBUTION = """
+SELECT
+    CASE
+        WHEN TIMESTAMPDIFF(YEAR, BirthDate, CURDATE()) < 30 THEN "20-29"
+        WHEN TIMESTAMPDIFF(YEAR, BirthDate, CURDATE()) < 40 THEN "30-39"
+        WHEN TIMESTAMPDIFF(YEAR, BirthDate, CURDATE()) < 50 THEN "40-49"
+        ELSE "60+"
+        END AS AgeGroup,
+    Sex,
+    COUNT(*) AS UserCount
+FROM User
+GROUP BY AgeGroup, Sex
+ORDER BY AgeGroup, Sex
+"""
+
+MEASUREMENT_SUMMARY = """
+SELECT
+    Biomarker.Name,
+    Biomarker.Units,
+    COUNT(Measurement.MeasurementID) AS MeasurementCount
+FROM Biomarker
+LEFT JOIN Measurement ON Biomarker.BiomarkerID=Measurement.BiomarkerID
+GROUP BY Biomarker.Name, Biomarker.Units
+"""
@@ -0,0 +1,63 @@
+"""
+Reference range status for one user or a whole cohort.
+
+Both use the ``ReferenceRangeEngine`` compiled into the catalog snapshot, so
+ranges are read from the database once per catalog load rather than joined
+per request; the cohort variant classifies the latest-value matrix of every
+requested user in one vectorized call.
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.analytics.reference_ranges import STATUS_NAMES, ReferenceRangeEngine
+from src.api.bio_age import N_BIOMARKERS, fetch_latest_biomarker_matrix
+
+
+def user_ranges(
+    engine: ReferenceRangeEngine, user: Optional[Dict], biomarkers: List[Dict]
+) -> List[Dict]:
+    """The ``/ranges`` rows of one user (empty if the user does not exist)"""
+    if not user:
+        return []
+    return engine.evaluate_user(biomarkers, user["age"], user["sex"])
+
+
+def range_status_batch(connection, engine: ReferenceRangeEngine, user_ids=None):
+    """
+    Range status of every biomarker of many users at once
+
+    Args:
+        connection: DictCursor connection
+        engine: Compiled reference ranges
+        user_ids: List of user IDs, or None for every user
+
+    Returns:
+        Per-user statuses and per-biomarker status counts
+    """
+    with connection.cursor() as cursor:
+        matrix = fetch_latest_biomarker_matrix(cursor, user_ids)
+    biomarker_ids = list(range(1, N_BIOMARKERS + 1))
+    status, _, _ = engine.classify(
+        biomarker_ids, matrix.values, matrix.ages, matrix.sexes
+    )
+
+    users = [
+        {
+            "userId": int(user_id),
+            "statuses": {
+                biomarker_id: value
+                for biomarker_id, value in zip(biomarker_ids, row)
+                if value is not None
+            },
+        }
+        for user_id, row in zip(matrix.user_ids, status)
+    ]
+    summary = {
+        biomarker_id: {
+            name: int(np.count_nonzero(status[:, j] == name)) for name in STATUS_NAMES
+        }
+        for j, biomarker_id in enumerate(biomarker_ids)
+    }
+    return {"usersEvaluated": len(users), "users": users, "summary": summary}
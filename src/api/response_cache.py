@@ -0,0 +1,300 @@
+"""
+Per-user response cache for the read endpoints.
+
+``/profile``, ``/bio-age``, ``/ranges``, ``/sessions``, ``/sessions/{id}`` and
+``/bio-age/history`` are read far more often than a user's data changes, so
+their rendered JSON (and ETag) is kept in an in-process LRU bounded by entry
+count, optionally backed by a shared store (Redis or anything with the same
+``get``/``set``/``incr`` calls) so several API processes share hits.
+
+Invalidation is precise and O(1): every user has a generation counter that
+is part of the cache key, and a write bumps it. A global epoch, also part of
+the key, is bumped by ``clear`` for changes that touch every user (batch
+recalculation, cohort refresh). Both counters live in the shared store when
+one is configured, so every process stops serving the old entries. Entries
+of older generations are never served again and age out of the LRU (or
+expire in the shared store). A read captures the epoch and generation before
+it queries the database, so a response computed concurrently with a write is
+never stored as current.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+from fastapi import Response, status
+
+from src.api.catalog import etag_matches, render
+
+
+# (user ID, request key, (epoch, generation) the response was computed at)
+CacheSlot = Tuple[int, str, Tuple[int, int]]
+
+
+class DictBackend:
+    """In-memory stand-in for a shared Redis backend (tests, single process)"""
+
+    def __init__(self):
+        """Start empty"""
+        self.data: Dict[str, bytes] = {}
+        self.expires: Dict[str, float] = {}
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Value of ``key``, or None if missing or expired"""
+        if key in self.expires and self.expires[key] <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def set(self, key: str, value: bytes, ex: Optional[float] = None) -> None:
+        """Store ``value``, expiring after ``ex`` seconds if given"""
+        self.data[key] = value
+        if ex is not None:
+            self.expires[key] = time.monotonic() + ex
+
+    def incr(self, key: str) -> int:
+        """Increment an integer counter, creating it at 0"""
+        value = int(self.get(key) or 0) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+
+def shared_backend(url: str):
+    """Redis client for ``url``, or None if the redis package is not installed"""
+    try:
+        import redis
+    except ImportError:
+        print("[WARNING] redis is not installed; the response cache stays local")
+        return None
+    return redis.Redis.from_url(url)
+
+
+def request_key(request) -> str:
+    """Path plus sorted query parameters, so parameter order does not matter"""
+    query = urlencode(sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{query}"
+
+
+class ResponseCache:
+    """
+    LRU of rendered responses keyed by (user, request, generation)
+
+    Args:
+        max_entries: Local LRU size; 0 disables the local layer
+        ttl: Seconds an entry is served, which also bounds staleness from
+            writes that bypass the API (seed, ETL)
+        shared: Optional shared backend (see ``DictBackend``)
+        prefix: Key prefix in the shared backend
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        ttl: float = 60.0,
+        shared=None,
+        prefix: str = "lbt:response",
+    ):
+        """Create an empty cache"""
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self.prefix = prefix
+        self._entries: "OrderedDict[Tuple[int, str], Tuple]" = OrderedDict()
+        self._generations: Dict[int, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._shared_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._shared_errors = 0
+
+    def configure(
+        self,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        shared=None,
+    ) -> None:
+        """Resize the cache, change the TTL or attach a shared backend"""
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if ttl is not None:
+                self.ttl = ttl
+            if shared is not None:
+                self.shared = shared
+            self._evict()
+
+    @property
+    def enabled(self) -> bool:
+        """False when neither the local nor a shared layer is configured"""
+        return self.max_entries > 0 or self.shared is not None
+
+    # ---- generations -------------------------------------------------------
+    def _shared_call(self, method: str, *args, **kwargs):
+        """Call the shared backend, counting (not raising) its failures"""
+        try:
+            return getattr(self.shared, method)(*args, **kwargs)
+        except Exception as e:
+            self._shared_errors += 1
+            print(f"[WARNING] shared response cache {method} failed: {str(e)}")
+            return None
+
+    def epoch(self) -> int:
+        """Current global epoch, bumped by ``clear``"""
+        if self.shared is not None:
+            value = self._shared_call("get", f"{self.prefix}:epoch")
+            if value is not None:
+                return int(value)
+        return self._epoch
+
+    def generation(self, user_id: int) -> int:
+        """Current generation of a user's cached responses"""
+        if self.shared is not None:
+            value = self._shared_call("get", f"{self.prefix}:gen:{user_id}")
+            if value is not None:
+                return int(value)
+        return self._generations.get(user_id, 0)
+
+    def invalidate(self, user_id: int) -> None:
+        """Stop serving every cached response of one user"""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self._invalidations += 1
+        if self.shared is not None:
+            self._shared_call("incr", f"{self.prefix}:gen:{user_id}")
+
+    def invalidate_many(self, user_ids) -> None:
+        """Invalidate several users (e.g. after a batch write)"""
+        for user_id in set(user_ids):
+            self.invalidate(user_id)
+
+    def clear(self) -> None:
+        """Stop serving every cached response, in every process"""
+        with self._lock:
+            self._entries.clear()
+            self._epoch += 1
+            self._invalidations += 1
+        if self.shared is not None:
+            self._shared_call("incr", f"{self.prefix}:epoch")
+
+    # ---- lookup / store ----------------------------------------------------
+    def _shared_key(self, slot: CacheSlot) -> str:
+        """Shared-backend key of a slot"""
+        user_id, key, (epoch, generation) = slot
+        return f"{self.prefix}:{user_id}:{epoch}.{generation}:{key}"
+
+    def _evict(self) -> None:
+        """Drop least recently used entries beyond ``max_entries``"""
+        while len(self._entries) > max(self.max_entries, 0):
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def get(self, slot: CacheSlot) -> Optional[Tuple[bytes, str]]:
+        """Rendered (body, etag) for a slot, or None on a miss"""
+        user_id, key, generation = slot
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is not None:
+                entry_generation, expires_at, rendered = entry
+                if entry_generation == generation and expires_at > now:
+                    self._entries.move_to_end((user_id, key))
+                    self._hits += 1
+                    return rendered
+                del self._entries[(user_id, key)]
+
+        if self.shared is not None:
+            value = self._shared_call("get", self._shared_key(slot))
+            if value is not None:
+                etag, _, body = bytes(value).partition(b"\n")
+                rendered = (body, etag.decode())
+                self._put_local(slot, rendered)
+                self._shared_hits += 1
+                return rendered
+        self._misses += 1
+        return None
+
+    def _put_local(self, slot: CacheSlot, rendered: Tuple[bytes, str]) -> None:
+        """Store in the local LRU, evicting the least recently used entries"""
+        if self.max_entries <= 0:
+            return
+        user_id, key, generation = slot
+        # A slot invalidated while its response was computed is stored with
+        # its old generation, which ``get`` never serves again
+        with self._lock:
+            self._entries[(user_id, key)] = (
+                generation,
+                time.monotonic() + self.ttl,
+                rendered,
+            )
+            self._entries.move_to_end((user_id, key))
+            self._evict()
+
+    def put(self, slot: CacheSlot, rendered: Tuple[bytes, str]) -> None:
+        """Store a rendered response in the local and shared layers"""
+        self._put_local(slot, rendered)
+        if self.shared is not None:
+            body, etag = rendered
+            self._shared_call(
+                "set",
+                self._shared_key(slot),
+                etag.encode() + b"\n" + body,
+                ex=max(int(self.ttl), 1),
+            )
+
+    def lookup(self, user_id: int, request) -> Tuple[Optional[Response], CacheSlot]:
+        """
+        Serve a request from the cache
+
+        Returns:
+            (response, slot): the cached Response (200, or 304 for a matching
+            If-None-Match), or None on a miss; pass the slot to ``store``
+        """
+        slot = (
+            user_id,
+            request_key(request),
+            (self.epoch(), self.generation(user_id)),
+        )
+        rendered = self.get(slot) if self.enabled else None
+        if rendered is None:
+            return None, slot
+        return self.respond(rendered, request, "HIT"), slot
+
+    def store(self, slot: CacheSlot, content, request) -> Response:
+        """Render ``content``, cache it under ``slot`` and return the Response"""
+        rendered = render(content)
+        if self.enabled:
+            self.put(slot, rendered)
+        return self.respond(rendered, request, "MISS")
+
+    @staticmethod
+    def respond(rendered: Tuple[bytes, str], request, outcome: str) -> Response:
+        """Response with ETag and X-Cache headers (304 if the ETag matches)"""
+        body, etag = rendered
+        headers = {"ETag": etag, "X-Cache": outcome}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self) -> Dict:
+        """Report size, TTL and hit/miss/eviction/invalidation counters"""
+        return {
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "ttlSeconds": self.ttl,
+            "shared": self.shared is not None,
+            "hits": self._hits,
+            "sharedHits": self._shared_hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "invalidations": self._invalidations,
+            "sharedErrors": self._shared_errors,
+        }
+
+
+# Shared by the sync and async handlers; configured in main.py
+response_cache = ResponseCache()
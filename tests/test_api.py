@@ -1,5 +1,7 @@
 """Test harness for API."""
 
+import pymysql
+
 
 def test_api_root(api_client):
     """Testing API for response"""
@@ -150,3 +152,362 @@ def test_glucose_unit_conversion_in_calculation(db_cursor):
     print(
         f"✓ Glucose unit conversion validated: {glucose_mg_dl} mg/dL → {glucose_mmol_l} mmol/L → contrib {expected_contribution:.4f}"
     )
+
+
+def test_trend_range_parsing():
+    """Trend ranges parse the same way for the sync and async handlers"""
+    from fastapi import HTTPException
+    from src.api.common import parse_trend_range
+
+    assert parse_trend_range("6 months")[0] == 186
+    assert parse_trend_range("2weeks")[0] == 14
+    assert parse_trend_range(" 1 year ")[0] == 365
+    try:
+        parse_trend_range("forever")
+    except HTTPException as e:
+        assert e.status_code == 400
+    else:
+        raise AssertionError("invalid range was accepted")
+
+
+def test_batch_bio_age_rejects_bad_input(api_client):
+    """Batch calculation validates userIds and model name"""
+    response = api_client.post(
+        "/api/v1/bio-age/calculate-batch", json={"userIds": "some"}
+    )
+    assert response.status_code == 400
+
+    response = api_client.post(
+        "/api/v1/bio-age/calculate-batch",
+        json={"userIds": [1], "modelName": "Not A Model"},
+    )
+    assert response.status_code == 400
+
+
+def test_batch_bio_age_skips_incomplete_users(api_client):
+    """Users without all 9 biomarkers are reported as skipped"""
+    response = api_client.post(
+        "/api/v1/bio-age/calculate-batch",
+        json={"userIds": [987654321], "modelName": "Phenotypic Age"},
+    )
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["usersScored"] == 0
+    assert payload["usersSkipped"] == [987654321]
+
+
+def test_batch_bio_age_conflict_is_409(api_client, monkeypatch):
+    """A run colliding with another in the same second answers 409, not 500"""
+
+    def conflicting_batch(*args, **kwargs):
+        raise pymysql.err.IntegrityError(1062, "Duplicate entry")
+
+    monkeypatch.setattr("src.api.main.calculate_batch", conflicting_batch)
+    response = api_client.post(
+        "/api/v1/bio-age/calculate-batch",
+        json={"userIds": [1], "modelName": "Phenotypic Age"},
+    )
+    assert response.status_code == 409
+
+
+def test_biomarker_catalog_etag(api_client):
+    """Catalog endpoints return an ETag and answer revalidation with 304"""
+    response = api_client.get("/api/v1/biomarkers")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    cached = api_client.get("/api/v1/biomarkers", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+
+    api_client.post("/api/v1/admin/cache/invalidate")
+    reloaded = api_client.get("/api/v1/biomarkers", headers={"If-None-Match": etag})
+    assert reloaded.status_code == 304
+    assert api_client.get("/api/v1/biomarkers/999/ranges").status_code == 404
+
+
+def test_new_measurement_updates_latest_values(api_client, db_cursor):
+    """Posting a session upserts UserLatestMeasurement, so the profile sees it"""
+    user_id = 1
+    test_date = "2031-01-01"  # later than any loaded session
+    db_cursor.execute(
+        "DELETE FROM MeasurementSession WHERE UserID = %s AND SessionDate = %s",
+        (user_id, test_date),
+    )
+    db_cursor.connection.commit()
+    api_client.post("/api/v1/admin/cache/invalidate", params={"userId": user_id})
+    api_client.get(f"/api/v1/users/{user_id}/profile")  # now cached
+
+    response = api_client.post(
+        f"/api/v1/users/{user_id}/measurements",
+        json={
+            "sessionDate": test_date,
+            "fastingStatus": True,
+            "measurements": [{"biomarkerId": 2, "value": 77.7}],
+        },
+    )
+    assert response.status_code == 201
+
+    profile = api_client.get(f"/api/v1/users/{user_id}/profile").json()
+    latest = {b["biomarkerId"]: b for b in profile["biomarkers"]}
+    assert float(latest[2]["value"]) == 77.7
+
+    db_cursor.execute(
+        "DELETE FROM MeasurementSession WHERE UserID = %s AND SessionDate = %s",
+        (user_id, test_date),
+    )
+    db_cursor.connection.commit()
+
+
+def test_user_list_query_composition():
+    """Filters and the page limit become SQL fragments with bound params"""
+    import json
+    from fastapi import HTTPException
+    from src.api.common import build_user_list_query, ndjson_lines, shape_user_page
+
+    sql, params = build_user_list_query(after=10, limit=2, sex="F", max_age=40)
+    assert "view_age.UserID > %s" in sql and "LIMIT %s" in sql
+    assert params == [10, "F", 41, 2]
+    assert "LIMIT" not in build_user_list_query()[0]
+    try:
+        build_user_list_query(min_age=50, max_age=40)
+    except HTTPException as e:
+        assert e.status_code == 400
+    else:
+        raise AssertionError("minAge > maxAge was accepted")
+
+    users = [{"userId": 3}, {"userId": 7}]
+    assert shape_user_page(users, 2)["nextCursor"] == 7
+    assert shape_user_page(users, 5)["nextCursor"] is None
+    assert "nextCursor" not in shape_user_page(users, None)
+
+    lines = b"".join(ndjson_lines(iter(users))).decode().splitlines()
+    assert [json.loads(line) for line in lines] == users
+
+
+def test_bio_age_history_keyset_and_buckets():
+    """History pages carry a cursor; buckets keep the last value or the mean"""
+    from datetime import datetime
+    from src.api.common import bio_age_history_query, shape_bio_age_history
+
+    sql, params = bio_age_history_query(
+        5, "Phenotypic Age", limit=2, cursor="1:2024-03-01T02:00:00"
+    )
+    assert "ModelID DESC" in sql and "LIMIT %s" in sql
+    assert params == [5, 5, 1, 1, 1, datetime(2024, 3, 1, 2), 2]
+    assert bio_age_history_query(5)[0].rstrip().endswith("ComputedAt DESC;")
+
+    def row(model_id, day, hour, bio_age):
+        return {
+            "modelId": model_id,
+            "modelName": f"Model {model_id}",
+            "bioAgeYears": bio_age,
+            "ageGap": bio_age - 40,
+            "computedAt": datetime(2024, 3, day, hour),
+        }
+
+    page = shape_bio_age_history([row(2, 3, 1, 41.0), row(2, 2, 1, 42.0)], limit=2)
+    assert page["nextCursor"] == "2:2024-03-02T01:00:00"
+    assert page["history"][0]["computedAt"] == "2024-03-03T01:00:00Z"
+    assert "modelId" not in page["history"][0]
+
+    rows = [row(1, 1, 1, 40.0), row(1, 1, 9, 44.0), row(1, 2, 1, 41.0)]
+    daily = shape_bio_age_history(rows, bucket="day")["history"]
+    assert [(r["date"], r["bioAgeYears"], r["count"]) for r in daily] == [
+        ("2024-03-01", 44.0, 2),
+        ("2024-03-02", 41.0, 1),
+    ]
+    columns = shape_bio_age_history(
+        rows, bucket="day", aggregate="mean", format="columnar"
+    )["models"]["Model 1"]
+    assert columns == {
+        "date": ["2024-03-01", "2024-03-02"],
+        "bioAgeYears": [42.0, 41.0],
+        "ageGap": [2.0, 1.0],
+    }
+
+
+def test_bio_age_history_pages(api_client):
+    """Keyset pages of the history never repeat a result"""
+    full = api_client.get("/api/v1/users/1/bio-age/history").json()["history"]
+    seen, cursor = [], None
+    while True:
+        url = "/api/v1/users/1/bio-age/history?limit=1"
+        response = api_client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200
+        page = response.json()
+        seen += page["history"]
+        cursor = page["nextCursor"]
+        if cursor is None:
+            break
+    assert len(seen) == len(full)
+
+    response = api_client.get("/api/v1/users/1/bio-age/history?bucket=day&limit=5")
+    assert response.status_code == 400
+
+
+def test_list_users_pagination_and_stream(api_client):
+    """Walking pages with nextCursor matches the unpaginated and NDJSON lists"""
+    import json
+
+    everyone = api_client.get("/api/v1/users").json()["users"]
+
+    paged, cursor = [], 0
+    while cursor is not None:
+        page = api_client.get("/api/v1/users", params={"limit": 2, "after": cursor})
+        assert page.status_code == 200
+        paged += page.json()["users"]
+        cursor = page.json()["nextCursor"]
+    assert [u["userId"] for u in paged] == [u["userId"] for u in everyone]
+
+    stream = api_client.get("/api/v1/users", params={"format": "ndjson"})
+    assert stream.headers["content-type"].startswith("application/x-ndjson")
+    streamed = [json.loads(line) for line in stream.text.splitlines()]
+    assert [u["userId"] for u in streamed] == [u["userId"] for u in everyone]
+
+    assert api_client.get("/api/v1/users", params={"sex": "X"}).status_code == 400
+    assert api_client.get("/api/v1/users", params={"format": "csv"}).status_code == 400
+
+
+def test_bulk_sessions_validated_in_memory():
+    """Bad entries are rejected per session before any database work"""
+    from src.api.ingest import validate_sessions
+
+    sessions = [
+        {
+            "userId": 1,
+            "sessionDate": "2031-02-01",
+            "fastingStatus": True,
+            "measurements": [{"biomarkerId": 1, "value": 4.5}],
+        },
+        {"userId": 1, "sessionDate": "2031-02-01", "fastingStatus": False},
+        {
+            "userId": 2,
+            "sessionDate": "not a date",
+            "fastingStatus": True,
+            "measurements": [{"biomarkerId": 1, "value": 4.5}],
+        },
+        {
+            "userId": 2,
+            "sessionDate": "2031-02-01",
+            "fastingStatus": True,
+            "measurements": [{"biomarkerId": 99, "value": 1.0}],
+        },
+        {
+            "userId": 1,
+            "sessionDate": "2031-02-01",
+            "fastingStatus": True,
+            "measurements": [{"biomarkerId": 2, "value": 70}],
+        },
+        {
+            "userId": 2,
+            "sessionDate": "2031-02-02",
+            "fastingStatus": True,
+            "measurements": [{"biomarkerId": [1], "value": 4.5}],
+        },
+        {
+            "userId": 2,
+            "sessionDate": "2031-02-03",
+            "fastingStatus": True,
+            "measurements": [{"biomarkerId": True, "value": 4.5}],
+        },
+    ]
+    entries, results = validate_sessions(sessions, {1, 2})
+    assert [entry.index for entry in entries] == [0]
+    assert entries[0].measurements == [(1, 4.5)]
+    assert [result.get("status") for result in results] == [None] + ["rejected"] * 6
+    assert "biomarkerId 99" in results[3]["error"]
+    assert "more than once" in results[4]["error"]
+    assert (
+        results[5]["error"] == results[6]["error"] == "biomarkerId must be an integer"
+    )
+
+
+def test_bulk_measurements_partial_failure(api_client, db_cursor):
+    """Valid sessions are created in one request; bad ones are reported"""
+    dates = ["2032-01-01", "2032-01-02"]
+    db_cursor.execute(
+        "DELETE FROM MeasurementSession WHERE UserID IN (1, 2) AND SessionDate IN %s",
+        (dates,),
+    )
+    db_cursor.connection.commit()
+
+    def session(user_id, session_date, value):
+        return {
+            "userId": user_id,
+            "sessionDate": session_date,
+            "fastingStatus": True,
+            "measurements": [
+                {"biomarkerId": 1, "value": 4.5},
+                {"biomarkerId": 2, "value": value},
+            ],
+        }
+
+    body = {
+        "sessions": [
+            session(1, dates[0], 71.0),
+            session(2, dates[0], 72.0),
+            session(1, dates[1], 73.0),
+            session(999_999_999, dates[0], 74.0),  # unknown user
+        ]
+    }
+    response = api_client.post("/api/v1/measurements/bulk", json=body)
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["created"] == 3 and payload["failed"] == 1
+    assert payload["results"][3]["error"] == "User not found"
+    assert len(payload["results"][0]["measurementIds"]) == 2
+
+    profile = api_client.get("/api/v1/users/1/profile").json()
+    latest = {b["biomarkerId"]: b for b in profile["biomarkers"]}
+    assert float(latest[2]["value"]) == 73.0  # the later of user 1's sessions
+
+    again = api_client.post("/api/v1/measurements/bulk", json=body).json()
+    assert [r["status"] for r in again["results"][:3]] == ["conflict"] * 3
+
+    db_cursor.execute(
+        "DELETE FROM MeasurementSession WHERE UserID IN (1, 2) AND SessionDate IN %s",
+        (dates,),
+    )
+    db_cursor.connection.commit()
+
+
+def test_ranges_include_population_percentile(api_client):
+    """/ranges rows carry a percentile once the cohort tables are built"""
+    refreshed = api_client.post("/api/v1/admin/cohort/refresh").json()["cohort"]
+    assert refreshed["groups"]["biomarkers"] > 0
+
+    ranges = api_client.get("/api/v1/users/1/ranges").json()["ranges"]
+    assert ranges and all("percentile" in row for row in ranges)
+    known = [row["percentile"] for row in ranges if row["percentile"] is not None]
+    assert all(0 <= percentile <= 100 for percentile in known)
+
+    groups = api_client.get("/api/v1/cohort/percentiles?biomarkerId=1").json()
+    assert {group["biomarkerId"] for group in groups["groups"]} == {1}
+    response = api_client.get("/api/v1/cohort/bio-age-gaps?model=Nope")
+    assert response.status_code == 400
+
+
+def test_range_status_batch(api_client):
+    """The bulk endpoint agrees with the per-user /ranges statuses"""
+    response = api_client.post("/api/v1/ranges/status-batch", json={"userIds": [1]})
+    assert response.status_code == 200
+    payload = response.json()
+    single = api_client.get("/api/v1/users/1/ranges").json()["ranges"]
+    statuses = payload["users"][0]["statuses"] if payload["users"] else {}
+    assert statuses == {str(row["biomarkerId"]): row["status"] for row in single}
+
+    bad = api_client.post("/api/v1/ranges/status-batch", json={"userIds": "x"})
+    assert bad.status_code == 400
+
+
+def test_multi_biomarker_trends(api_client):
+    """All of a user's series come back in one columnar response"""
+    response = api_client.get("/api/v1/users/1/trends?range=10years")
+    assert response.status_code == 200
+    trends = response.json()
+    assert len(trends["dates"]) == len(trends["sessionIds"])
+    for values in trends["series"].values():
+        assert len(values) == len(trends["dates"])
+
+    response = api_client.get("/api/v1/users/1/trends?biomarkerIds=1,x")
+    assert response.status_code == 400
@@ -0,0 +1,125 @@
+"""Tests for the async (API_ASYNC=1) read endpoints."""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api.response_cache import response_cache
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Printed by a fresh interpreter, since API_ASYNC is read when main is imported
+ROUTE_DUMP = """
+import json
+from src.api.main import app
+print(json.dumps([
+    {
+        "path": route.path,
+        "methods": sorted(route.methods),
+        "module": route.endpoint.__module__,
+        "query": sorted(param.name for param in route.dependant.query_params),
+    }
+    for route in app.routes
+    if hasattr(route, "dependant")
+]))
+"""
+
+# Read endpoints compared between the sync and async handlers (user 1 is seeded)
+PARITY_PATHS = [
+    "/api/v1/users?limit=5",
+    "/api/v1/users/1/profile",
+    "/api/v1/users/1/bio-age",
+    "/api/v1/users/1/ranges",
+    "/api/v1/users/1/biomarkers/1/trend",
+    "/api/v1/users/1/trends",
+    "/api/v1/users/1/bio-age/history",
+    "/api/v1/users/1/sessions",
+    "/api/v1/biomarkers",
+    "/api/v1/biomarkers/1/ranges",
+    "/api/v1/users/age-distribution",
+    "/api/v1/biomarkers/measurement-summary",
+    "/api/v1/users/999999999/profile",
+]
+
+
+def app_routes(api_async: bool):
+    """Routes of src.api.main imported with API_ASYNC on or off"""
+    env = dict(os.environ, API_ASYNC="1" if api_async else "0")
+    result = subprocess.run(
+        [sys.executable, "-c", ROUTE_DUMP],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_route_parity_between_modes():
+    """Both modes expose the same paths and methods; async twins win"""
+    sync_routes, async_routes = app_routes(False), app_routes(True)
+    assert {(r["path"], m) for r in sync_routes for m in r["methods"]} == {
+        (r["path"], m) for r in async_routes for m in r["methods"]
+    }
+
+    sync_reads = {
+        r["path"]: r
+        for r in sync_routes
+        if r["methods"] == ["GET"]
+        and r["path"].startswith("/api/v1/")
+        and not r["path"].startswith("/api/v1/admin/")
+    }
+    first_match = {}
+    for route in async_routes:
+        if route["methods"] == ["GET"]:
+            first_match.setdefault(route["path"], route)
+    for path, sync_route in sync_reads.items():
+        async_route = first_match[path]
+        assert async_route["module"] == "src.api.async_routes", path
+        assert async_route["query"] == sync_route["query"], path
+
+
+@pytest.fixture(scope="module")
+def async_client():
+    """A TestClient for the async router on the API's database settings"""
+    from src.api import async_routes, main
+
+    async_routes.configure(
+        host=main.DB_HOST,
+        port=main.DB_PORT,
+        user=main.DB_USER,
+        password=main.DB_PASSWORD,
+        db=main.DB_NAME,
+        minsize=1,
+        maxsize=4,
+    )
+    app = FastAPI()
+    app.include_router(async_routes.router)
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.mark.parametrize("path", PARITY_PATHS)
+def test_async_responses_match_sync(api_client, async_client, path):
+    """Each async handler returns the sync handler's status and payload"""
+    response_cache.clear()
+    expected = api_client.get(path)
+    response_cache.clear()
+    actual = async_client.get(path)
+    assert actual.status_code == expected.status_code
+    assert actual.json() == expected.json()
+
+
+def test_async_user_stream(async_client):
+    """The NDJSON stream is served by the async handler too"""
+    response = async_client.get("/api/v1/users?format=ndjson")
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows and all("userId" in row for row in rows)
@@ -0,0 +1,199 @@
+"""Test set-based biological age scoring"""
+from decimal import Decimal
+
+import numpy as np
+from src.analytics.phenotypic_age import PhenotypicAge
+from src.api import queries
+from src.api.bio_age import (
+    calculate_batch,
+    fetch_latest_biomarker_matrix,
+    load_or_fit_hd_model,
+)
+
+
+class FakeCursor:
+    """Cursor returning canned latest-measurement rows"""
+
+    def __init__(self, rows):
+        """Store the rows to return"""
+        self.rows = rows
+        self.executed = []
+
+    def execute(self, query, params=None):
+        """Record the statement"""
+        self.executed.append((query, params))
+
+    def fetchall(self):
+        """Return the canned rows"""
+        return self.rows
+
+
+def test_latest_biomarker_matrix_pivots_rows():
+    """Long (user, biomarker, value) rows become one row per user"""
+    rows = [
+        {
+            "UserID": 7,
+            "Age": 40,
+            "BiomarkerID": b,
+            "BiomarkerName": f"B{b}",
+            "Value": Decimal(b),
+        }
+        for b in range(1, 10)
+    ] + [
+        {
+            "UserID": 3,
+            "Age": 25,
+            "BiomarkerID": 2,
+            "BiomarkerName": "B2",
+            "Value": Decimal("5.5"),
+        }
+    ]
+    cursor = FakeCursor(rows)
+
+    matrix = fetch_latest_biomarker_matrix(cursor, [3, 7])
+
+    assert cursor.executed[0][1] == [3, 7]
+    assert matrix.user_ids.tolist() == [3, 7]
+    assert matrix.ages.tolist() == [25, 40]
+    assert matrix.values[1].tolist() == list(range(1, 10))
+    assert matrix.values[0, 1] == 5.5
+    assert np.isnan(matrix.values[0, 0])
+    assert matrix.biomarker_names == [f"B{b}" for b in range(1, 10)]
+
+
+class FakeReferenceConnection:
+    """Connection serving a fingerprint row and a reference population"""
+
+    def __init__(self, checksum, n_people=30):
+        """Build long-format reference rows for ``n_people``"""
+        rng = np.random.default_rng(1)
+        self.fingerprint = {"rowCount": n_people * 9, "checksum": checksum}
+        self.reference = [
+            {
+                "UserID": user,
+                "Age": 25,
+                "BMI": Decimal("22.5"),
+                "Sex": "M",
+                "BiomarkerID": b,
+                "BiomarkerName": f"B{b}",
+                "Value": Decimal(str(round(rng.normal(10 * b, b), 3))),
+            }
+            for user in range(n_people)
+            for b in range(1, 10)
+        ]
+        self.population_reads = 0
+
+    def cursor(self):
+        """Return a cursor over the canned rows"""
+        return FakeReferenceCursor(self)
+
+
+class FakeReferenceCursor(FakeCursor):
+    """Cursor answering the fingerprint and reference population queries"""
+
+    def __init__(self, connection):
+        """Bind to the fake connection"""
+        super().__init__([])
+        self.connection = connection
+
+    def __enter__(self):
+        """Support ``with connection.cursor()``"""
+        return self
+
+    def __exit__(self, *exc):
+        """Nothing to clean up"""
+        return False
+
+    def execute(self, query, params=None):
+        """Pick the canned result for the query"""
+        if query == queries.HD_REFERENCE_FINGERPRINT:
+            self.rows = [self.connection.fingerprint]
+        else:
+            self.connection.population_reads += 1
+            self.rows = self.connection.reference
+
+    def fetchone(self):
+        """Return the first canned row"""
+        return self.rows[0]
+
+
+def test_hd_model_fitted_once_per_fingerprint(tmp_path):
+    """The artifact is reused until the reference population changes"""
+    connection = FakeReferenceConnection(checksum=111)
+
+    fitted = load_or_fit_hd_model(connection, tmp_path)
+    loaded = load_or_fit_hd_model(connection, tmp_path)
+
+    assert connection.population_reads == 1
+    np.testing.assert_allclose(loaded.reference_cov_inv_, fitted.reference_cov_inv_)
+    assert len(list(tmp_path.glob("hd-*.npz"))) == 1
+
+    connection.fingerprint["checksum"] = 222
+    load_or_fit_hd_model(connection, tmp_path)
+    assert connection.population_reads == 2
+    assert len(list(tmp_path.glob("hd-*.npz"))) == 1
+
+
+class FakeBatchConnection:
+    """Connection serving latest-measurement rows and recording INSERTs"""
+
+    def __init__(self, rows):
+        """Serve ``rows`` to every query"""
+        self.batch_cursor = FakeBatchCursor(rows)
+        self.commits = 0
+
+    def cursor(self):
+        """Return the shared cursor"""
+        return self.batch_cursor
+
+    def commit(self):
+        """Count commits"""
+        self.commits += 1
+
+
+class FakeBatchCursor(FakeCursor):
+    """Cursor that also records executemany rows"""
+
+    def __init__(self, rows):
+        """Store the rows to return"""
+        super().__init__(rows)
+        self.inserted = []
+
+    def __enter__(self):
+        """Support ``with connection.cursor()``"""
+        return self
+
+    def __exit__(self, *exc):
+        """Nothing to clean up"""
+        return False
+
+    def executemany(self, query, rows):
+        """Record the inserted rows"""
+        self.inserted += rows
+
+
+def test_batch_skips_users_with_non_finite_ages():
+    """A zero CRP or negative WBC skips that user instead of failing the batch"""
+    panel = [4.2, 80, 0.9, 95, 1.5, 6.5, 30, 90, 13]
+    bad = {2: {5: 0.0}, 3: {6: -1.0}}  # user -> BiomarkerID -> value
+    rows = [
+        {
+            "UserID": user,
+            "Age": 50,
+            "BiomarkerID": b,
+            "BiomarkerName": f"B{b}",
+            "Value": Decimal(str(bad.get(user, {}).get(b, panel[b - 1]))),
+        }
+        for user in (1, 2, 3)
+        for b in range(1, 10)
+    ]
+    connection = FakeBatchConnection(rows)
+
+    summary = calculate_batch(
+        connection, [1, 2, 3], ["Phenotypic Age"], phenotypic_age=PhenotypicAge()
+    )
+
+    assert summary["usersScored"] == 1 and summary["usersSkipped"] == [2, 3]
+    inserted = connection.batch_cursor.inserted
+    assert [row[0] for row in inserted] == [1]
+    assert np.isfinite(inserted[0][2]) and connection.commits == 1
@@ -0,0 +1,122 @@
+"""Test the in-process catalog cache"""
+from contextlib import contextmanager
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from src.api import queries
+from src.api.catalog import CatalogCache
+
+CATALOG_ROWS = {
+    queries.BIOMARKER_CATALOG: [
+        {"biomarkerId": 1, "name": "Albumin", "units": "g/dL"},
+        {"biomarkerId": 4, "name": "Glucose", "units": "mg/dL"},
+    ],
+    queries.BIO_AGE_MODEL_CATALOG: [{"modelId": 1, "modelName": "Phenotypic Age"}],
+    queries.MODEL_COEFFICIENTS: [
+        {
+            "modelId": 1,
+            "biomarkerId": b,
+            "coefficient": Decimal("0.01"),
+            "transform": "log" if b in (5, 6) else "linear",
+        }
+        for b in range(1, 10)
+    ],
+    queries.REFERENCE_RANGES: [
+        {
+            "biomarkerId": 1,
+            "rangeType": "clinical",
+            "sex": "All",
+            "ageMin": 0,
+            "ageMax": 200,
+            "minVal": Decimal("3.5"),
+            "maxVal": Decimal("5.0"),
+        }
+    ],
+}
+
+
+class FakeDatabase:
+    """Connection source serving canned catalog rows"""
+
+    def __init__(self):
+        """Start with no queries issued"""
+        self.executed = []
+        self.fail = False
+
+    @contextmanager
+    def connection(self):
+        """Yield self as both connection and cursor"""
+        if self.fail:
+            raise RuntimeError("database down")
+        yield self
+
+    @contextmanager
+    def cursor(self):
+        """Yield self as the cursor"""
+        yield self
+
+    def execute(self, query, params=None):
+        """Remember the query for fetchall"""
+        self.executed.append(query)
+
+    def fetchall(self):
+        """Return fresh copies of the canned rows"""
+        return [dict(row) for row in CATALOG_ROWS[self.executed[-1]]]
+
+
+def test_catalog_served_from_memory_until_invalidated():
+    """Hits skip the database; invalidation forces a reload with a new version"""
+    database = FakeDatabase()
+    cache = CatalogCache(ttl=3600, connection=database.connection)
+
+    first = cache.get()
+    assert cache.get() is first
+    assert len(database.executed) == 4
+    assert first.reference_ranges[1][0]["minVal"] == Decimal("3.5")
+    assert first.phenotypic_age.biomarker_ids == list(range(1, 10))
+
+    cache.invalidate()
+    second = cache.get()
+    assert second.version == first.version + 1
+    assert len(database.executed) == 8
+    stats = cache.stats()
+    assert stats["loads"] == 2
+    assert stats["hits"] == 1
+    assert stats["invalidations"] == 1
+
+
+def test_expired_snapshot_reloads_and_survives_db_failure():
+    """After the TTL the cache reloads, keeping the stale copy if that fails"""
+    database = FakeDatabase()
+    cache = CatalogCache(ttl=0, connection=database.connection)
+
+    first = cache.get()
+    database.fail = True
+    assert cache.get() is first
+    assert cache.stats()["loadErrors"] == 1
+
+    cache.invalidate()
+    with pytest.raises(HTTPException) as error:
+        cache.get()
+    assert error.value.status_code == 503
+
+
+def test_etag_and_not_modified():
+    """Rendered resources carry an ETag that yields 304 on revalidation"""
+    cache = CatalogCache(ttl=3600, connection=FakeDatabase().connection)
+
+    response = cache.response("ranges/1")
+    etag = response.headers["etag"]
+    assert response.status_code == 200
+    assert b'"minVal":3.5' in response.body
+
+    assert cache.response("ranges/1", etag).status_code == 304
+    assert cache.response("ranges/1", f'"other", W/{etag}').status_code == 304
+    assert cache.response("ranges/1", '"other"').status_code == 200
+    assert cache.response("ranges/99") is None
+
+    # Same content after a reload keeps the same ETag
+    cache.invalidate()
+    assert cache.response("ranges/1").headers["etag"] == etag
+    assert cache.response("biomarkers").headers["etag"] != etag
@@ -0,0 +1,61 @@
+"""Test the vectorized cohort percentile tables"""
+import numpy as np
+import pytest
+from src.analytics.cohort import PercentileTable, age_band, band_label
+
+
+@pytest.fixture
+def population():
+    """Two biomarkers, both sexes, ages spread over several bands"""
+    rng = np.random.default_rng(7)
+    n = 4000
+    return {
+        "feature_ids": rng.integers(1, 3, n),
+        "sexes": rng.choice(["M", "F"], n),
+        "ages": rng.integers(18, 85, n),
+        "values": rng.normal(100, 15, n),
+    }
+
+
+def test_group_quantiles_match_numpy(population):
+    """Every group's quantiles equal np.quantile over that group's values"""
+    table = PercentileTable.build(**population)
+    sexes = np.asarray(population["sexes"])
+    bands = age_band(population["ages"])
+    for row, (feature, sex, band) in enumerate(table.keys.tolist()):
+        mask = (
+            (population["feature_ids"] == feature)
+            & (sexes == ("M" if sex == 0 else "F"))
+            & (bands == band)
+        )
+        expected = np.quantile(population["values"][mask], np.arange(101) / 100)
+        np.testing.assert_allclose(table.quantiles[row], expected)
+        assert table.counts[row] == mask.sum()
+
+
+def test_percentile_lookup(population, tmp_path):
+    """Lookups interpolate within the group and survive a save/load"""
+    table = PercentileTable.build(**population, min_count=20)
+    row = table.row(1, "F", 45)
+    median = table.quantiles[row, 50]
+    assert table.percentile(1, "F", 45, median) == 50.0
+    assert table.percentile(1, "F", 45, -1e9) == 0.0
+    assert table.percentile(1, "F", 45, 1e9) == 100.0
+    assert table.percentile(9, "F", 45, median) is None  # unknown biomarker
+
+    restored = PercentileTable.load(table.save(tmp_path / "cohort.npz"))
+    assert restored.percentile(1, "F", 45, median) == 50.0
+    group = restored.describe(1, "biomarkerId")[0]
+    assert group["biomarkerId"] == 1 and "p50" in group["percentiles"]
+
+
+def test_small_groups_and_bands():
+    """Groups under min_count are left out; bands are labelled"""
+    table = PercentileTable.build([1, 1, 1], ["M", "M", "M"], [30, 31, 32], [1, 2, 3])
+    assert len(table) == 0 and table.percentile(1, "M", 30, 2) is None
+    assert [band_label(b) for b in age_band([5, 20, 49, 85])] == [
+        "<20",
+        "20-29",
+        "40-49",
+        "80+",
+    ]
@@ -0,0 +1,98 @@
+"""Test the NHANES downloader against a local HTTP server standing in for CDC"""
+
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from etl.download_nhanes import download_all, nhanes_urls
+
+FILES = {
+    "/DEMO_J.XPT": bytes(range(256)) * 400,
+    "/CBC_J.XPT": b"cbc" * 5000,
+}
+
+
+class FakeCdcHandler(BaseHTTPRequestHandler):
+    """Serves FILES with ETags, conditional GETs and byte ranges"""
+
+    requests = []
+    drop_after = {}  # path -> bytes to send before dropping the connection once
+
+    def do_GET(self):
+        """Answer 200, 206 or 304 like a static file server"""
+        body = FILES.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        range_header = self.headers.get("Range")
+        self.requests.append((self.path, range_header))
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        status, payload = 200, body
+        if range_header and self.headers.get("If-Range") == etag:
+            start = int(range_header.removeprefix("bytes=").rstrip("-"))
+            status, payload = 206, body[start:]
+        self.send_response(status)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(payload)))
+        if status == 206:
+            self.send_header(
+                "Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}"
+            )
+        self.end_headers()
+        cut = self.drop_after.pop(self.path, None)
+        self.wfile.write(payload[:cut])
+
+    def log_message(self, *args):
+        """Keep test output quiet"""
+
+
+@pytest.fixture
+def cdc_server():
+    """Start the fake CDC server on a free local port"""
+    FakeCdcHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeCdcHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_nhanes_urls_cover_every_cycle():
+    """Each cycle gets its own URLs, under the first year of the cycle"""
+    urls = nhanes_urls(["I", "J"])
+    assert len(urls) == 14
+    assert urls["DEMO_I.XPT"].endswith("/2015/DataFiles/DEMO_I.XPT")
+    assert urls["CBC_J.XPT"].endswith("/2017/DataFiles/CBC_J.XPT")
+
+
+def test_download_cache_and_resume(tmp_path, cdc_server, monkeypatch):
+    """Files download in parallel, are skipped when unchanged, and resume"""
+    urls = {name.lstrip("/"): cdc_server + name for name in FILES}
+
+    assert set(download_all(urls, tmp_path).values()) == {"downloaded"}
+    for name, body in FILES.items():
+        assert (tmp_path / name.lstrip("/")).read_bytes() == body
+
+    # Unchanged files are revalidated (304) rather than downloaded again
+    assert set(download_all(urls, tmp_path).values()) == {"cached"}
+
+    # A corrupted copy is fetched again; a dropped transfer is resumed
+    (tmp_path / "CBC_J.XPT").write_bytes(b"corrupt")
+    (tmp_path / "DEMO_J.XPT").unlink()
+    FakeCdcHandler.requests = []
+    FakeCdcHandler.drop_after = {"/DEMO_J.XPT": 1000}
+    monkeypatch.setattr("etl.download_nhanes.RETRY_BACKOFF_SECONDS", 0)
+    assert set(download_all(urls, tmp_path).values()) == {"downloaded"}
+    assert ("/DEMO_J.XPT", "bytes=1000-") in FakeCdcHandler.requests
+    for name, body in FILES.items():
+        assert (tmp_path / name.lstrip("/")).read_bytes() == body
+    assert not list(tmp_path.glob("*.part"))
@@ -1,6 +1,7 @@
 """Test HD model mathematical correctness"""
 import numpy as np
 import pandas as pd
+import pytest
 from src.analytics.hd import HomeostasisDysregulation
 
 
@@ -55,3 +56,98 @@ def test_hd_mahalanobis_calculation():
         abs(hd_result.hd_score - manual_hd) < 0.001
     ), f"HD calculation mismatch: model={hd_result.hd_score:.6f}, manual={manual_hd:.6f}"
     print(f"✓ HD Mahalanobis calculation validated: {hd_result.hd_score:.4f}")
+
+
+def test_hd_artifact_round_trip(tmp_path):
+    """A saved model reloads with identical parameters and scores"""
+    np.random.seed(0)
+    names = ["Biomarker1", "Biomarker2", "Biomarker3"]
+    reference_data = pd.DataFrame(np.random.normal(50, 10, (40, 3)), columns=names)
+    reference_data["Age"] = np.random.uniform(20, 30, 40)
+    hd_model = HomeostasisDysregulation().fit_reference_population(
+        reference_data, names, "Age"
+    )
+
+    path = hd_model.save(tmp_path / "hd.npz", fingerprint="abc123")
+    loaded = HomeostasisDysregulation.load(path)
+
+    assert loaded.biomarker_names_ == names
+    assert loaded.reference_n_ == 40
+    assert loaded.metadata_["fingerprint"] == "abc123"
+    np.testing.assert_array_equal(
+        loaded.reference_cov_inv_, hd_model.reference_cov_inv_
+    )
+    assert loaded.age_regression_slope_ == hd_model.age_regression_slope_
+    individual = {"Biomarker1": 61.0, "Biomarker2": 45.0, "Biomarker3": 52.0}
+    assert (
+        loaded.calculate_hd(individual).hd_years
+        == hd_model.calculate_hd(individual).hd_years
+    )
+    assert [p.name for p in tmp_path.iterdir()] == ["hd.npz"]
+
+
+def test_hd_score_core_matches_inverse_formula():
+    """Whitened, chunked scoring equals the explicit Σ⁻¹ formula on raw values"""
+    rng = np.random.default_rng(3)
+    names = [f"B{i}" for i in range(9)]
+    mixing = rng.normal(size=(9, 9))
+    reference = pd.DataFrame(rng.normal(size=(200, 9)) @ mixing + 50, columns=names)
+    hd_model = HomeostasisDysregulation().fit_reference_population(reference, names)
+    assert hd_model.covariance_method_ == "cholesky"
+
+    values = rng.normal(size=(1000, 9)) @ mixing + 50
+    z = (values - reference.mean().values) / reference.std().values
+    reference_z = (reference - reference.mean()) / reference.std()
+    expected = np.sqrt(np.sum(z @ np.linalg.inv(np.cov(reference_z.T)) * z, axis=1))
+
+    out = np.empty(len(values))
+    scores = hd_model.score(values, out=out, chunk_size=97)
+    assert scores is out
+    np.testing.assert_allclose(scores, expected, rtol=1e-9)
+    np.testing.assert_allclose(
+        hd_model.batch_calculate_hd(pd.DataFrame(values, columns=names))["HD_score"],
+        expected,
+        rtol=1e-9,
+    )
+
+
+def test_hd_ill_conditioned_covariance_fallbacks(monkeypatch):
+    """Singular covariance is shrunk, or pseudo-inverted when shrinkage is off"""
+    from src.analytics import hd
+
+    rng = np.random.default_rng(5)
+    reference = pd.DataFrame(rng.normal(size=(50, 3)), columns=["A", "B", "C"])
+    reference["D"] = reference["A"] * 2  # perfectly collinear
+    names = ["A", "B", "C", "D"]
+
+    shrunk = HomeostasisDysregulation().fit_reference_population(reference, names)
+    assert shrunk.covariance_method_ == "shrinkage"
+    assert np.all(np.isfinite(shrunk.score(reference[names].to_numpy())))
+
+    monkeypatch.setattr(hd, "SHRINKAGE_STEPS", ())
+    pinv = HomeostasisDysregulation().fit_reference_population(reference, names)
+    assert pinv.covariance_method_ == "pinv"
+    assert pinv.whitening_.shape == (3, 4)
+    z = ((reference - reference.mean()) / reference.std())[names].to_numpy()
+    np.testing.assert_allclose(
+        pinv.whitening_ @ np.cov(z.T) @ pinv.whitening_.T, np.eye(3), atol=1e-8
+    )
+
+
+def test_hd_single_subject_path():
+    """score_one accepts dicts or ordered sequences and matches batch scoring"""
+    rng = np.random.default_rng(11)
+    names = ["A", "B", "C"]
+    reference = pd.DataFrame(rng.normal(10, 2, (60, 3)), columns=names)
+    hd_model = HomeostasisDysregulation().fit_reference_population(reference, names)
+
+    individual = {"C": 13.0, "A": 9.0, "B": 11.5, "Other": 1.0}
+    expected = hd_model.score(np.array([[9.0, 11.5, 13.0]]))[0]
+
+    assert hd_model.score_one(individual) == pytest.approx(expected)
+    assert hd_model.score_one([9.0, 11.5, 13.0]) == pytest.approx(expected)
+    assert hd_model.calculate_hd(individual).hd_score == pytest.approx(expected)
+    with pytest.raises(ValueError, match="Missing biomarker: B"):
+        hd_model.score_one({"A": 1.0, "C": 2.0})
+    with pytest.raises(ValueError):
+        hd_model.score_one([1.0, 2.0])
@@ -0,0 +1,48 @@
+"""Tests for the load-test schedule and summary (no server needed)."""
+
+import numpy as np
+
+from scripts.load_test import ENDPOINT_MIX, build_schedule, summarize, write_bodies
+
+
+def test_schedule_follows_the_mix_and_skews_users():
+    """Endpoints follow their weights; the first users are the hot ones"""
+    schedule = build_schedule(
+        np.random.default_rng(0), ENDPOINT_MIX, np.arange(1, 1001), 20_000
+    )
+    names = [name for name, _, _ in schedule]
+    assert abs(names.count("profile") / len(names) - 0.30) < 0.02
+    assert all("{" not in path for _, _, path in schedule)
+    assert all("range=15years" in path for name, _, path in schedule if "trend" in name)
+
+    profiles = [path for name, _, path in schedule if name == "profile"]
+    assert profiles.count("/api/v1/users/1/profile") > 10 * profiles.count(
+        "/api/v1/users/500/profile"
+    )
+
+
+def test_write_bodies_use_distinct_dates():
+    """Each write creates a full panel on its own session date"""
+    bodies = write_bodies(np.random.default_rng(0), 3)
+    assert len({body["sessionDate"] for body in bodies}) == 3
+    assert [m["biomarkerId"] for m in bodies[0]["measurements"]] == list(range(1, 10))
+
+
+def test_summarize_percentiles_errors_and_cache():
+    """Latencies are reported in ms per endpoint and overall"""
+    results = [
+        ("profile", 200, i / 1000, "HIT" if i % 2 else "MISS") for i in range(100)
+    ]
+    results += [("biomarkers", 500, 0.2, None), ("biomarkers", None, 0.3, None)]
+    results += [("trend", 404, 0.01, None), ("measurement", 409, 0.01, None)]
+    summary = summarize(results, elapsed=2.0)
+
+    assert summary["all"]["requests"] == 104 and summary["all"]["rps"] == 52
+    assert summary["profile"]["p50"] == np.percentile(np.arange(100), 50)
+    assert summary["profile"]["cacheHitRate"] == 0.5
+    assert summary["biomarkers"]["errors"] == 2
+    assert summary["trend"]["clientErrors"] == 1 and summary["trend"]["errors"] == 0
+    assert summary["measurement"]["errors"] == 1  # a write hit an existing session
+    assert summary["measurement"]["clientErrors"] == 0
+    assert summary["biomarkers"]["cacheHitRate"] is None
+    assert summary["all"]["max"] == 300
@@ -0,0 +1,313 @@
+"""Test the NHANES bulk loader"""
+
+import json
+from datetime import date
+
+import pytest
+
+from etl.loader import (
+    CYCLE_ANTHROPOMETRY_KEYS,
+    CYCLE_MEASUREMENT_KEYS,
+    CYCLE_SESSION_KEYS,
+    batches,
+    load,
+    resolve_measurements,
+    resolve_users,
+    stale_rows,
+)
+
+TEST_SEQN = 99_000_001  # far above real NHANES SEQNs
+
+
+def test_foreign_keys_resolve_in_memory():
+    """Rows are mapped through dicts; unresolvable ones are counted and dropped"""
+    user_ids = {10: 1, 11: 2}
+    session_ids = {(1, "2018-01-15"): 100}
+
+    skipped = [0]
+    rows = [("10", "2018-01-15", "1"), ("12", "2018-01-15", "0")]
+    assert list(resolve_users(rows, user_ids, skipped)) == [(1, "2018-01-15", "1")]
+    assert skipped == [1]
+
+    skipped = [0]
+    rows = [
+        ("10", "2018-01-15", "4", "95.0", "2018-01-15"),
+        ("11", "2018-01-15", "4", "90.0", "2018-01-15"),  # no such session
+    ]
+    assert list(resolve_measurements(rows, user_ids, session_ids, skipped)) == [
+        (100, "4", "95.0", "2018-01-15")
+    ]
+    assert skipped == [1]
+
+    # Arrow rows carry dates; session keys compare as ISO strings
+    rows = [(10, date(2018, 1, 15), 4, 95.0, date(2018, 1, 15))]
+    assert list(resolve_measurements(rows, user_ids, session_ids, [0])) == [
+        (100, 4, 95.0, date(2018, 1, 15))
+    ]
+
+    assert [len(b) for b in batches(range(7), 3)] == [3, 3, 1]
+
+
+class KeysCursor:
+    """Cursor answering the loader's session/measurement/exam key queries"""
+
+    def __init__(self, sessions, measurements, anthropometry):
+        """Store the canned key rows"""
+        self.results = {
+            CYCLE_SESSION_KEYS: sessions,
+            CYCLE_MEASUREMENT_KEYS: measurements,
+            CYCLE_ANTHROPOMETRY_KEYS: anthropometry,
+        }
+        self.rows = []
+
+    def execute(self, query, params=None):
+        """Pick the canned rows for the query"""
+        self.rows = self.results[query]
+
+    def fetchall(self):
+        """Return the canned rows"""
+        return self.rows
+
+
+def session_row(session_id, user_id, session_date, source_cycle):
+    """A row of the loader's session key query"""
+    return {
+        "SessionID": session_id,
+        "UserID": user_id,
+        "SessionDate": session_date,
+        "SourceCycle": source_cycle,
+    }
+
+
+def test_stale_rows_are_those_missing_from_the_files():
+    """Only rows this cycle loaded are pruned; API sessions keep their user"""
+    user_ids = {10: 1, 11: 2, 12: 3}  # SEQNs 11 and 12 were dropped
+    keep = {
+        "User": {10},
+        "MeasurementSession": {(1, "2018-01-15")},
+        "Measurement": {(100, 4)},
+        "Anthropometry": {(1, "2018-01-15")},
+    }
+    api = None  # SourceCycle of rows entered through the API
+    cursor = KeysCursor(
+        [
+            session_row(100, 1, date(2018, 1, 15), "T"),
+            session_row(101, 1, date(2019, 1, 15), "T"),  # session dropped
+            session_row(102, 1, date(2020, 3, 1), api),
+            session_row(200, 2, date(2018, 1, 15), "T"),  # user dropped
+            session_row(300, 3, date(2018, 1, 15), "T"),  # user dropped...
+            session_row(301, 3, date(2021, 5, 1), api),  # ...but added a session
+        ],
+        [
+            {"MeasurementID": 1, "SessionID": 100, "BiomarkerID": 4},
+            {"MeasurementID": 2, "SessionID": 100, "BiomarkerID": 5},  # lab dropped
+            {"MeasurementID": 3, "SessionID": 101, "BiomarkerID": 4},
+            {"MeasurementID": 4, "SessionID": 200, "BiomarkerID": 4},
+            {"MeasurementID": 5, "SessionID": 300, "BiomarkerID": 4},
+        ],
+        [
+            {
+                "AnthroID": 7,
+                "UserID": 1,
+                "ExamDate": date(2018, 1, 15),
+                "SourceCycle": "T",
+            },
+            {
+                "AnthroID": 8,
+                "UserID": 1,
+                "ExamDate": date(2019, 1, 15),
+                "SourceCycle": "T",
+            },
+            {
+                "AnthroID": 9,
+                "UserID": 2,
+                "ExamDate": date(2018, 1, 15),
+                "SourceCycle": "T",
+            },
+            {
+                "AnthroID": 10,
+                "UserID": 1,
+                "ExamDate": date(2020, 3, 1),
+                "SourceCycle": api,
+            },
+        ],
+    )
+
+    stale = stale_rows(cursor, "T", user_ids, keep, (10, 12))
+
+    assert stale == {
+        "Measurement": [2, 3, 4, 5],
+        "MeasurementSession": [101, 200, 300],
+        "Anthropometry": [8, 9],
+        "BiologicalAgeResult": [2],
+        "User": [2],
+    }
+
+
+def write_cycle(root, fingerprint, glucose):
+    """Write a one-user transformed cycle directory"""
+    write_cycle_files(
+        root,
+        fingerprint,
+        {
+            "users.csv": f"SEQN,BirthDate,Sex,RaceEthnicity\n{TEST_SEQN},1970-07-01,F,Other Hispanic\n",
+            "sessions.csv": f"SEQN,SessionDate,FastingStatus\n{TEST_SEQN},2018-01-15,1\n",
+            "measurements.csv": (
+                "SEQN,SessionDate,BiomarkerID,Value,TakenAt\n"
+                f"{TEST_SEQN},2018-01-15,4,{glucose},2018-01-15\n"
+                f"{TEST_SEQN},2018-01-15,1,4.5,2018-01-15\n"
+                "12345678,2018-01-15,1,4.0,2018-01-15\n"  # not a user of this cycle
+            ),
+            "anthropometry.csv": f"SEQN,ExamDate,HeightCM,WeightKG,BMI\n{TEST_SEQN},2018-01-15,165.0,,\n",
+        },
+    )
+
+
+def write_cycle_files(root, fingerprint, files):
+    """Write a transformed cycle directory "T" from CSV contents"""
+    cycle_dir = root / "cycles" / "T"
+    cycle_dir.mkdir(parents=True, exist_ok=True)
+    for name, content in files.items():
+        (cycle_dir / name).write_text(content)
+    (cycle_dir / "manifest.json").write_text(
+        json.dumps({"cycle": "T", "label": "test", "fingerprint": fingerprint})
+    )
+
+
+@pytest.fixture
+def clean_test_cycle(db_connection):
+    """Remove the test cycle's rows before and after the test"""
+
+    def cleanup():
+        with db_connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM User WHERE SEQN BETWEEN %s AND %s",
+                (TEST_SEQN, TEST_SEQN + 1),
+            )
+            cursor.execute("DELETE FROM NhanesCycleLoad WHERE Cycle = 'T'")
+        db_connection.commit()
+
+    cleanup()
+    yield
+    cleanup()
+
+
+def test_load_is_incremental(tmp_path, db_connection, clean_test_cycle):
+    """A cycle loads once, is skipped while unchanged and upserts when changed"""
+    write_cycle(tmp_path, "a" * 64, 95.0)
+    first = load(tmp_path, connection=db_connection)["T"]
+    assert first["User"] == 1 and first["Measurement"] == 2
+    assert first["UserLatestMeasurement"] == 2
+
+    assert load(tmp_path, connection=db_connection)["T"] is None
+
+    write_cycle(tmp_path, "b" * 64, 101.0)
+    load(tmp_path, connection=db_connection, defer_indexes=True)
+    with db_connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT latest.Value, a.WeightKG "
+            "FROM UserLatestMeasurement latest "
+            "JOIN User u ON u.UserID = latest.UserID "
+            "JOIN Anthropometry a ON a.UserID = u.UserID "
+            "WHERE u.SEQN = %s AND latest.BiomarkerID = 4",
+            (TEST_SEQN,),
+        )
+        row = cursor.fetchone()
+        cursor.execute(
+            "SHOW INDEX FROM Measurement WHERE Key_name = 'Idx_Measurement_Trend'"
+        )
+        assert cursor.fetchall(), "deferred index was not rebuilt"
+    assert float(row["Value"]) == 101.0
+    assert row["WeightKG"] is None
+
+
+def test_reload_prunes_rows_dropped_from_the_files(
+    tmp_path, db_connection, clean_test_cycle
+):
+    """A changed cycle deletes the participants, labs and exams it loaded"""
+    other = TEST_SEQN + 1
+    write_cycle_files(
+        tmp_path,
+        "a" * 64,
+        {
+            "users.csv": (
+                "SEQN,BirthDate,Sex,RaceEthnicity\n"
+                f"{TEST_SEQN},1970-07-01,F,Other\n{other},1980-07-01,M,Other\n"
+            ),
+            "sessions.csv": (
+                "SEQN,SessionDate,FastingStatus\n"
+                f"{TEST_SEQN},2018-01-15,1\n{other},2018-01-15,1\n"
+            ),
+            "measurements.csv": (
+                "SEQN,SessionDate,BiomarkerID,Value,TakenAt\n"
+                f"{TEST_SEQN},2018-01-15,4,95.0,2018-01-15\n"
+                f"{TEST_SEQN},2018-01-15,5,1.2,2018-01-15\n"
+                f"{other},2018-01-15,4,90.0,2018-01-15\n"
+            ),
+            "anthropometry.csv": (
+                "SEQN,ExamDate,HeightCM,WeightKG,BMI\n"
+                f"{TEST_SEQN},2018-01-15,165.0,60.0,22.0\n"
+            ),
+        },
+    )
+    load(tmp_path, connection=db_connection)
+
+    # A session entered through the API, as POST /users/{id}/measurements does
+    with db_connection.cursor() as cursor:
+        cursor.execute("SELECT UserID FROM User WHERE SEQN = %s", (TEST_SEQN,))
+        user_id = cursor.fetchone()["UserID"]
+        cursor.execute(
+            "INSERT INTO MeasurementSession (UserID, SessionDate, FastingStatus) "
+            "VALUES (%s, '2024-03-01', 1)",
+            (user_id,),
+        )
+        cursor.execute(
+            "INSERT INTO Measurement (SessionID, BiomarkerID, Value, TakenAt) "
+            "VALUES (%s, 1, 4.5, '2024-03-01')",
+            (cursor.lastrowid,),
+        )
+    db_connection.commit()
+
+    # The re-transform drops the second participant, CRP and the exam
+    write_cycle_files(
+        tmp_path,
+        "b" * 64,
+        {
+            "users.csv": f"SEQN,BirthDate,Sex,RaceEthnicity\n{TEST_SEQN},1970-07-01,F,Other\n",
+            "sessions.csv": f"SEQN,SessionDate,FastingStatus\n{TEST_SEQN},2018-01-15,1\n",
+            "measurements.csv": (
+                "SEQN,SessionDate,BiomarkerID,Value,TakenAt\n"
+                f"{TEST_SEQN},2018-01-15,4,96.0,2018-01-15\n"
+            ),
+            "anthropometry.csv": "SEQN,ExamDate,HeightCM,WeightKG,BMI\n",
+        },
+    )
+    load(tmp_path, connection=db_connection, defer_indexes=True)
+
+    with db_connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT SEQN FROM User WHERE SEQN BETWEEN %s AND %s", (TEST_SEQN, other)
+        )
+        assert [row["SEQN"] for row in cursor.fetchall()] == [TEST_SEQN]
+        cursor.execute(
+            "SELECT m.BiomarkerID FROM Measurement m "
+            "JOIN MeasurementSession s ON s.SessionID = m.SessionID "
+            "JOIN User u ON u.UserID = s.UserID WHERE u.SEQN = %s "
+            "ORDER BY m.BiomarkerID",
+            (TEST_SEQN,),
+        )
+        # CRP is gone; the API session's measurement is untouched
+        assert [row["BiomarkerID"] for row in cursor.fetchall()] == [1, 4]
+        cursor.execute(
+            "SELECT latest.BiomarkerID FROM UserLatestMeasurement latest "
+            "JOIN User u ON u.UserID = latest.UserID WHERE u.SEQN = %s "
+            "ORDER BY latest.BiomarkerID",
+            (TEST_SEQN,),
+        )
+        assert [row["BiomarkerID"] for row in cursor.fetchall()] == [1, 4]
+        cursor.execute(
+            "SELECT COUNT(*) AS n FROM Anthropometry a "
+            "JOIN User u ON u.UserID = a.UserID WHERE u.SEQN = %s",
+            (TEST_SEQN,),
+        )
+        assert cursor.fetchone()["n"] == 0
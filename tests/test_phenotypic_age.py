@@ -0,0 +1,90 @@
+"""Test Phenotypic Age engine against the original scalar formula"""
+import math
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from src.analytics.phenotypic_age import PhenotypicAge
+
+PHENOTYPIC_COEFFICIENTS = [
+    {"biomarkerId": 1, "coefficient": Decimal("-0.0336"), "transform": "linear"},
+    {"biomarkerId": 2, "coefficient": Decimal("0.00188"), "transform": "linear"},
+    {"biomarkerId": 3, "coefficient": Decimal("0.0095"), "transform": "linear"},
+    {"biomarkerId": 4, "coefficient": Decimal("0.1953"), "transform": "linear"},
+    {"biomarkerId": 5, "coefficient": Decimal("0.0954"), "transform": "log"},
+    {"biomarkerId": 6, "coefficient": Decimal("0.0554"), "transform": "log"},
+    {"biomarkerId": 7, "coefficient": Decimal("-0.0120"), "transform": "linear"},
+    {"biomarkerId": 8, "coefficient": Decimal("0.0268"), "transform": "linear"},
+    {"biomarkerId": 9, "coefficient": Decimal("0.3306"), "transform": "linear"},
+]
+
+
+def scalar_phenotypic_age(values, age):
+    """Per-coefficient loop as originally written in the API handler"""
+    linear_term = 0
+    for coefficient in PHENOTYPIC_COEFFICIENTS:
+        value = float(values[coefficient["biomarkerId"] - 1])
+        if coefficient["biomarkerId"] == 4:
+            value /= 18.0
+        if coefficient["transform"] == "log":
+            value = math.log(value)
+        linear_term += value * float(coefficient["coefficient"])
+    mortality_score = linear_term + age * 0.0804 - 19.9067
+    R = min(0.999999, 1 - math.exp(-math.exp(mortality_score)))
+    return mortality_score, R, 141.50 + math.log(-math.log(1 - R)) / 0.09165
+
+
+def random_cohort(n, seed=7):
+    """Plausible biomarker matrix (BiomarkerID 1..9 columns) and ages"""
+    rng = np.random.default_rng(seed)
+    values = np.column_stack(
+        [
+            rng.normal(4.2, 0.3, n),
+            rng.normal(80, 20, n),
+            rng.normal(0.9, 0.2, n),
+            rng.normal(95, 10, n),
+            rng.lognormal(0.3, 0.8, n),
+            rng.normal(6.5, 1.5, n),
+            rng.normal(30, 6, n),
+            rng.normal(90, 4, n),
+            rng.normal(13, 0.8, n),
+        ]
+    )
+    return values, rng.uniform(20, 80, n).round()
+
+
+def test_engine_matches_scalar_loop():
+    """Vectorized scores agree with the per-user loop"""
+    values, ages = random_cohort(200)
+    engine = PhenotypicAge.from_coefficients(PHENOTYPIC_COEFFICIENTS)
+
+    result = engine.score(values, ages)
+    expected = np.array(
+        [scalar_phenotypic_age(row, age) for row, age in zip(values, ages)]
+    )
+
+    np.testing.assert_allclose(result.mortality_score, expected[:, 0], atol=1e-9)
+    np.testing.assert_allclose(result.mortality_risk, expected[:, 1], atol=1e-9)
+    np.testing.assert_allclose(result.phenotypic_age, expected[:, 2], atol=1e-6)
+    # Input matrix is left untouched
+    np.testing.assert_array_equal(values, random_cohort(200)[0])
+
+
+def test_default_coefficients_and_single_subject():
+    """Built-in Levine coefficients match the seeded ones; single path agrees"""
+    values, ages = random_cohort(5)
+    seeded = PhenotypicAge.from_coefficients(PHENOTYPIC_COEFFICIENTS)
+    default = PhenotypicAge()
+
+    assert default.biomarker_ids == list(range(1, 10))
+    for row, age in zip(values, ages):
+        assert default.calculate(row, age) == pytest.approx(
+            scalar_phenotypic_age(row, age)[2]
+        )
+        assert seeded.calculate(row, age) == pytest.approx(default.calculate(row, age))
+
+
+def test_rejects_wrong_shape():
+    """Matrix must have one column per biomarker"""
+    with pytest.raises(ValueError):
+        PhenotypicAge().score(np.ones((3, 8)), np.ones(3))
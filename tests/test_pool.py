@@ -0,0 +1,98 @@
+"""Test the API connection pool"""
+import threading
+import time
+
+import pytest
+from src.api.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    """Minimal stand-in for a PyMySQL connection"""
+
+    def __init__(self):
+        """Start healthy with zeroed counters"""
+        self.rollbacks = 0
+        self.pings = 0
+        self.closed = False
+        self.healthy = True
+
+    def rollback(self):
+        """Count rollbacks, failing once the connection is unhealthy"""
+        if not self.healthy:
+            raise RuntimeError("connection lost")
+        self.rollbacks += 1
+
+    def ping(self, reconnect=False):
+        """Count pings, failing once the connection is unhealthy"""
+        self.pings += 1
+        if not self.healthy:
+            raise RuntimeError("connection lost")
+
+    def close(self):
+        """Mark the connection closed"""
+        self.closed = True
+
+
+def test_pool_reuses_connections_and_rolls_back():
+    """A returned connection is rolled back and handed out again"""
+    pool = ConnectionPool(FakeConnection, min_size=0, max_size=2)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    assert first.rollbacks == 2
+    stats = pool.stats()
+    assert stats["created"] == 1
+    assert stats["checkouts"] == 2
+    assert stats["inUse"] == 0
+
+
+def test_pool_times_out_when_exhausted():
+    """Checkout waits for a free slot and raises once the timeout passes"""
+    pool = ConnectionPool(FakeConnection, min_size=0, max_size=1, timeout=0.05)
+    held = pool.acquire()
+
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+
+    released = threading.Timer(0.05, pool.release, args=(held,))
+    released.start()
+    assert pool.acquire(timeout=2) is held
+    released.join()
+
+    stats = pool.stats()
+    assert stats["waits"] == 2
+    assert stats["timeouts"] == 1
+
+
+def test_pool_discards_unhealthy_and_expired_connections():
+    """Failed pings and connections past the recycle age are replaced"""
+    pool = ConnectionPool(FakeConnection, min_size=0, max_size=2, ping_after=0)
+    connection = pool.acquire()
+    pool.release(connection)
+    connection.healthy = False
+
+    replacement = pool.acquire()
+    assert replacement is not connection
+    assert connection.closed
+    pool.release(replacement)
+
+    pool.recycle = 0
+    time.sleep(0.01)
+    assert pool.acquire() is not replacement
+    assert replacement.closed
+    assert pool.stats()["discarded"] == 2
+
+
+def test_pool_open_and_close():
+    """open() pre-fills min_size connections and close() shuts them"""
+    pool = ConnectionPool(FakeConnection, min_size=2, max_size=4).open()
+    assert pool.stats()["idle"] == 2
+
+    pool.close()
+    assert pool.stats()["size"] == 0
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
@@ -0,0 +1,82 @@
+"""Tests for the synthetic population generator (no database needed)."""
+
+import numpy as np
+import pandas as pd
+
+from scripts.generate_population import (
+    draw_panels,
+    population_chunk,
+    reference_distribution,
+)
+from src.analytics.hd import HomeostasisDysregulation
+
+NAMES = [f"Biomarker {i}" for i in range(1, 10)]
+MEANS = np.array([4.2, 80, 0.9, 95, 1.5, 6.5, 30, 90, 13])
+
+
+def correlated_cov(seed=0):
+    """A random covariance with strong correlations, scaled to MEANS"""
+    factors = np.random.default_rng(seed).normal(size=(9, 3))
+    corr = factors @ factors.T + np.eye(9)
+    scale = 1 / np.sqrt(np.diag(corr))
+    sd = MEANS * 0.1
+    return corr * np.outer(scale, scale) * np.outer(sd, sd)
+
+
+def test_reference_distribution_matches_the_hd_fit():
+    """Means/covariance come back in BiomarkerID order, glucose in mg/dL"""
+    cov = correlated_cov()
+    reference = np.random.default_rng(1).multivariate_normal(MEANS, cov, 5000)
+    reference[:, 3] /= 18  # HD is fitted on glucose in mmol/L
+    df = pd.DataFrame(reference[:, ::-1], columns=NAMES[::-1])
+    df["Age"] = 25
+    hd_model = HomeostasisDysregulation().fit_reference_population(df, NAMES[::-1])
+
+    means, fitted = reference_distribution(
+        hd_model, {name: i + 1 for i, name in enumerate(NAMES)}
+    )
+    sample = reference.copy()
+    sample[:, 3] *= 18
+    np.testing.assert_allclose(means, sample.mean(axis=0))
+    np.testing.assert_allclose(fitted, np.cov(sample.T), rtol=1e-6)
+
+
+def test_panels_keep_the_reference_correlations():
+    """At the reference age, panels have the reference mean and correlations"""
+    cov = correlated_cov()
+    rng = np.random.default_rng(2)
+    owners = np.repeat(np.arange(4000), 5)
+    panels = draw_panels(rng, MEANS, cov, owners, np.full(len(owners), 25.0))
+
+    expected = cov / np.sqrt(np.outer(np.diag(cov), np.diag(cov)))
+    np.testing.assert_allclose(panels.mean(axis=0), MEANS, rtol=0.02)
+    np.testing.assert_allclose(np.corrcoef(panels.T), expected, atol=0.05)
+
+    older = draw_panels(rng, MEANS, cov, owners, np.full(len(owners), 75.0))
+    assert older[:, 3].mean() > panels[:, 3].mean()  # glucose rises with age
+
+
+def test_population_chunk_rows_are_consistent():
+    """Every row references a user/session of its own chunk; IDs advance"""
+    first_ids = {"userId": 100, "sessionId": 500, "seqn": 8_000_000}
+    rows = population_chunk(
+        np.random.default_rng(3), MEANS, correlated_cov(), 50, 4, first_ids
+    )
+
+    user_ids = {row[0] for row in rows["User"]}
+    sessions = {row[0]: (row[1], row[2]) for row in rows["MeasurementSession"]}
+    assert user_ids == set(range(100, 150))
+    assert set(sessions) == set(range(500, 500 + len(sessions)))
+    assert len(set(sessions.values())) == len(sessions)  # (UserID, SessionDate)
+    assert {user for user, _ in sessions.values()} <= user_ids
+    assert len(rows["Measurement"]) == 9 * len(sessions)
+    assert {row[0] for row in rows["Measurement"]} == set(sessions)
+    assert [(row[0], row[1]) for row in rows["Anthropometry"]] == list(
+        sessions.values()
+    )
+    assert all(16 <= row[4] <= 50 for row in rows["Anthropometry"])
+    assert first_ids == {
+        "userId": 150,
+        "sessionId": 500 + len(sessions),
+        "seqn": 8_000_050,
+    }
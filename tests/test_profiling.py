@@ -0,0 +1,101 @@
+"""Tests for request profiling and SQL timing (no database needed)."""
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api.profiling import (
+    Profiler,
+    ProfilingMiddleware,
+    RequestProfile,
+    current_profile,
+    normalize_sql,
+    profiler,
+    timed_cursor,
+)
+
+
+class FakeCursor:
+    """Cursor stand-in with PyMySQL's execute/executemany/rowcount surface"""
+
+    rowcount = -1
+
+    def execute(self, query, args=None):
+        """Pretend to return three rows"""
+        self.rowcount = 3
+
+    def executemany(self, query, args):
+        """Run execute per row, as PyMySQL does for non-INSERT statements"""
+        for row in args:
+            self.execute(query, row)
+        self.rowcount = len(args)
+
+
+def test_normalize_sql():
+    """Whitespace, literals, placeholders and IN lists are normalized"""
+    sql = """
+        SELECT * FROM User
+        WHERE UserID IN (1, 2, 3) AND Sex = 'F' AND Age > %s;
+    """
+    assert normalize_sql(sql) == (
+        "SELECT * FROM User WHERE UserID IN (...) AND Sex = ? AND Age > ?"
+    )
+
+
+def test_timed_cursor_records_on_current_request():
+    """Statements are recorded once each, only inside a profiled request"""
+    cursor = timed_cursor(FakeCursor)()
+    cursor.execute("SELECT 1")  # outside a request: ignored
+
+    profile = RequestProfile()
+    token = current_profile.set(profile)
+    try:
+        cursor.execute("SELECT * FROM User WHERE UserID = %s", (1,))
+        cursor.executemany("UPDATE User SET Sex = %s", [("F",), ("M",)])
+    finally:
+        current_profile.reset(token)
+    assert [(sql, rows) for sql, _, rows in profile.statements] == [
+        ("SELECT * FROM User WHERE UserID = ?", 3),
+        ("UPDATE User SET Sex = ?", 2),
+    ]
+    assert profile.sql_seconds >= 0
+
+
+def test_middleware_and_metrics():
+    """Requests are aggregated by route template with a phase breakdown"""
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+    @app.get("/users/{userId}")
+    def user(userId: int):
+        profiler.record_connect(0.001)
+        profiler.record_sql("SELECT * FROM User WHERE UserID = %s", 0.002, 1)
+        return {"userId": userId}
+
+    profiler.reset()
+    with TestClient(app) as client:
+        response = client.get("/users/7")
+    assert "sql;dur=2.00" in response.headers["server-timing"]
+
+    text = profiler.render({"db_pool": {"inUse": 2, "enabled": True}})
+    assert 'route="/users/{userId}",status="200",le="+Inf"} 1' in text
+    assert 'phase="connect"} 0.001000' in text
+    assert (
+        'api_sql_rows_total{statement="SELECT * FROM User WHERE UserID = ?"} 1' in text
+    )
+    assert "api_db_pool_in_use 2" in text and "enabled" not in text
+
+
+def test_slow_query_log_sampling(tmp_path):
+    """Slow statements are written to the log; sample 0 logs none"""
+    log = tmp_path / "slow.log"
+    slow = Profiler(slow_query_ms=1, slow_query_log=str(log))
+    token = current_profile.set(RequestProfile())
+    try:
+        slow.record_sql("SELECT 1", 0.005, 1)
+        slow.record_sql("SELECT 2", 0.0001, 1)
+        slow.configure(slow_query_sample=0.0)
+        slow.record_sql("SELECT 3", 0.005, 1)
+    finally:
+        current_profile.reset(token)
+    lines = log.read_text().splitlines()
+    assert len(lines) == 1 and '"statement": "SELECT ?"' in lines[0]
@@ -0,0 +1,93 @@
+"""Tests for the query plan regression check."""
+
+import json
+
+import pytest
+
+from scripts.explain_queries import (
+    BASELINE,
+    api_statements,
+    compare,
+    explain,
+    summarize_plan,
+)
+
+PLAN = {
+    "query_block": {
+        "ordering_operation": {
+            "using_filesort": False,
+            "nested_loop": [
+                {
+                    "table": {
+                        "table_name": "MeasurementSession",
+                        "access_type": "range",
+                        "key": "UserID",
+                        "rows_examined_per_scan": 12,
+                    }
+                },
+                {
+                    "table": {
+                        "table_name": "Measurement",
+                        "access_type": "ref",
+                        "key": "Idx_Measurement_Trend",
+                        "rows_examined_per_scan": 1,
+                    }
+                },
+            ],
+        }
+    }
+}
+
+
+def test_every_statement_gets_sample_params():
+    """Each collected statement binds one sample value per placeholder"""
+    statements = api_statements()
+    assert "USER_LATEST_BIOMARKERS" in statements
+    assert "BIO_AGE_HISTORY+page" in statements
+    assert not any(name.startswith("INSERT") for name in statements)
+    for name, (sql, params) in statements.items():
+        assert sql.count("%s") == len(params), name
+        assert "{" not in sql, name
+
+
+def test_summarize_plan():
+    """Nested tables are listed in plan order with access, key and rows"""
+    summary = summarize_plan(PLAN)
+    assert summary["filesort"] is False and summary["temporary"] is False
+    assert [(t["table"], t["access"], t["key"]) for t in summary["tables"]] == [
+        ("MeasurementSession", "range", "UserID"),
+        ("Measurement", "ref", "Idx_Measurement_Trend"),
+    ]
+
+
+def test_compare_flags_full_scans_filesorts_and_new_statements():
+    """Regressions fail; index and row-estimate changes are only noted"""
+    baseline = {"TREND": summarize_plan(PLAN)}
+    current = {"TREND": summarize_plan(PLAN), "NEW": summarize_plan(PLAN)}
+    current["TREND"]["filesort"] = True
+    current["TREND"]["tables"][0].update(access="ALL", key=None)
+    current["TREND"]["tables"][1].update(key="SessionID", rows=5000)
+
+    failures, notes = compare(baseline, current)
+    assert any("NEW: not in the baseline" in failure for failure in failures)
+    assert any("now uses a filesort" in failure for failure in failures)
+    assert any("MeasurementSession regressed to a full scan" in f for f in failures)
+    assert any("uses SessionID" in note for note in notes)
+    assert any("examines 5000 rows" in note for note in notes)
+
+    assert compare(baseline, {"TREND": summarize_plan(PLAN)}) == ([], [])
+
+
+def test_api_plans_match_the_baseline(db_connection):
+    """No API statement regresses against the committed plan baseline"""
+    if not BASELINE.exists():
+        pytest.skip(
+            f"No baseline at {BASELINE}; run make explain-baseline against the "
+            "seeded database and commit it"
+        )
+    current = {
+        name: explain(db_connection, sql, params)
+        for name, (sql, params) in api_statements().items()
+    }
+    failures, _ = compare(json.loads(BASELINE.read_text()), current)
+    assert not failures, "\n".join(failures)
@@ -0,0 +1,86 @@
+"""Test the compiled reference range engine against per-value rules"""
+import json
+from decimal import Decimal
+
+import numpy as np
+from src.analytics.reference_ranges import ReferenceRangeEngine
+
+RANGES = [
+    {"biomarkerId": 1, "rangeType": "clinical", "sex": "All", "ageMin": 0,
+     "ageMax": 200, "minVal": Decimal("3.5"), "maxVal": Decimal("5.0")},
+    {"biomarkerId": 1, "rangeType": "longevity", "sex": "All", "ageMin": 0,
+     "ageMax": 200, "minVal": Decimal("4.2"), "maxVal": Decimal("5.0")},
+    {"biomarkerId": 3, "rangeType": "clinical", "sex": "M", "ageMin": 18,
+     "ageMax": 200, "minVal": Decimal("0.7"), "maxVal": Decimal("1.3")},
+    {"biomarkerId": 3, "rangeType": "clinical", "sex": "F", "ageMin": 18,
+     "ageMax": 200, "minVal": Decimal("0.6"), "maxVal": Decimal("1.1")},
+    {"biomarkerId": 4, "rangeType": "clinical", "sex": "All", "ageMin": 0,
+     "ageMax": 200, "minVal": Decimal("70"), "maxVal": Decimal("99")},
+    {"biomarkerId": 4, "rangeType": "clinical", "sex": "F", "ageMin": 60,
+     "ageMax": 200, "minVal": Decimal("70"), "maxVal": Decimal("110")},
+]  # fmt: skip
+
+
+def scalar_status(biomarker_id, value, age, sex):
+    """Row-by-row reference: count range types the value falls in"""
+    if value is None or np.isnan(value):
+        return None
+    applicable = {}
+    for row in RANGES:
+        if (
+            row["biomarkerId"] == biomarker_id
+            and row["sex"] in ("All", sex)
+            and row["ageMin"] <= age <= row["ageMax"]
+        ):
+            # sex-specific rows win over "All"
+            if row["rangeType"] not in applicable or row["sex"] != "All":
+                applicable[row["rangeType"]] = row
+    if not applicable:
+        return None
+    within = sum(
+        float(row["minVal"]) <= value <= float(row["maxVal"])
+        for row in applicable.values()
+    )
+    return ["OutOfRange", "Normal", "Optimal"][within]
+
+
+def test_cohort_matrix_matches_scalar_rules():
+    """Vectorized statuses equal a per-value evaluation, honouring ages and sex"""
+    engine = ReferenceRangeEngine(RANGES)
+    rng = np.random.default_rng(3)
+    n = 500
+    biomarker_ids = [1, 2, 3, 4]  # 2 has no ranges
+    values = np.column_stack(
+        [
+            rng.uniform(3, 6, n),
+            rng.uniform(0, 100, n),
+            rng.uniform(0.5, 1.5, n),
+            rng.uniform(60, 120, n),
+        ]
+    )
+    values[::17, 0] = np.nan
+    ages = rng.integers(5, 90, n)
+    sexes = rng.choice(["M", "F"], n)
+
+    status, _, _ = engine.classify(biomarker_ids, values, ages, sexes)
+    for i in range(n):
+        for j, biomarker_id in enumerate(biomarker_ids):
+            expected = scalar_status(biomarker_id, values[i, j], ages[i], sexes[i])
+            assert status[i, j] == expected
+
+
+def test_evaluate_user_rows():
+    """One user's rows keep the /ranges shape and skip unranged biomarkers"""
+    engine = ReferenceRangeEngine(RANGES)
+    biomarkers = [
+        {"biomarkerId": 1, "name": "Albumin", "value": Decimal("4.5")},
+        {"biomarkerId": 2, "name": "ALP", "value": Decimal("80")},
+        {"biomarkerId": 4, "name": "Glucose", "value": Decimal("105")},
+    ]
+    rows = engine.evaluate_user(biomarkers, 65, "F")
+    assert [row["biomarkerId"] for row in rows] == [1, 4]
+    assert rows[0]["status"] == "Optimal"
+    assert json.loads(rows[0]["longevityRange"]) == {"min": 4.2, "max": 5.0}
+    assert rows[1]["status"] == "Normal"  # the age 60+ range for women applies
+    assert rows[1]["longevityRange"] is None
+    assert engine.evaluate_user(biomarkers, 40, "F")[1]["status"] == "OutOfRange"
@@ -0,0 +1,89 @@
+"""Tests for the per-user response cache (no database needed)."""
+
+from starlette.requests import Request
+
+from src.api.response_cache import DictBackend, ResponseCache
+
+
+def make_request(path, query="", etag=None):
+    """A bare GET request for ``path`` with a query string"""
+    headers = [(b"if-none-match", etag.encode())] if etag else []
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "query_string": query.encode(),
+            "headers": headers,
+        }
+    )
+
+
+def serve(cache, user_id, request, content):
+    """Look a request up, storing ``content`` on a miss"""
+    cached, slot = cache.lookup(user_id, request)
+    if cached is not None:
+        return cached
+    return cache.store(slot, content, request)
+
+
+def test_hits_misses_and_parameter_order():
+    """Query parameter order does not matter; ETags answer with 304"""
+    cache = ResponseCache(max_entries=10)
+    first = serve(cache, 1, make_request("/p", "a=1&b=2"), {"v": 1})
+    assert first.headers["X-Cache"] == "MISS"
+    again = serve(cache, 1, make_request("/p", "b=2&a=1"), {"v": 2})
+    assert again.headers["X-Cache"] == "HIT" and again.body == first.body
+
+    etag = first.headers["ETag"]
+    assert serve(cache, 1, make_request("/p", "a=1&b=2", etag), None).status_code == 304
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+
+def test_invalidation_is_per_user_and_fences_in_flight_reads():
+    """A write drops one user's responses, including a read that raced it"""
+    cache = ResponseCache(max_entries=10)
+    serve(cache, 1, make_request("/p"), {"v": 1})
+    serve(cache, 2, make_request("/p"), {"v": 1})
+
+    _, slot = cache.lookup(1, make_request("/p"))  # read starts...
+    cache.invalidate(1)  # ...a write commits...
+    cache.store(slot, {"v": "stale"}, make_request("/p"))  # ...read finishes
+
+    assert serve(cache, 1, make_request("/p"), {"v": 2}).headers["X-Cache"] == "MISS"
+    assert serve(cache, 2, make_request("/p"), None).headers["X-Cache"] == "HIT"
+
+
+def test_lru_eviction_bound():
+    """The local layer never holds more than max_entries responses"""
+    cache = ResponseCache(max_entries=2)
+    for user_id in range(3):
+        serve(cache, user_id, make_request("/p"), {"v": user_id})
+    assert cache.stats()["entries"] == 2 and cache.stats()["evictions"] == 1
+    assert serve(cache, 0, make_request("/p"), None).headers["X-Cache"] == "MISS"
+
+
+def test_shared_backend_is_shared_between_processes():
+    """Two caches on one backend share hits and invalidations"""
+    shared = DictBackend()
+    first, second = ResponseCache(shared=shared), ResponseCache(shared=shared)
+    serve(first, 1, make_request("/p"), {"v": 1})
+    assert serve(second, 1, make_request("/p"), None).headers["X-Cache"] == "HIT"
+    assert second.stats()["sharedHits"] == 1
+
+    first.invalidate(1)
+    response = serve(second, 1, make_request("/p"), {"v": 2})
+    assert response.headers["X-Cache"] == "MISS" and b'"v":2' in response.body
+
+
+def test_clear_reaches_every_process():
+    """clear() on one cache stops a second cache serving shared entries"""
+    shared = DictBackend()
+    first, second = ResponseCache(shared=shared), ResponseCache(shared=shared)
+    serve(first, 1, make_request("/p"), {"v": 1})
+    assert serve(second, 1, make_request("/p"), None).headers["X-Cache"] == "HIT"
+
+    first.clear()
+    response = serve(second, 1, make_request("/p"), {"v": 2})
+    assert response.headers["X-Cache"] == "MISS" and b'"v":2' in response.body
+    assert serve(first, 1, make_request("/p"), None).body == response.body
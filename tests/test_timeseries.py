@@ -0,0 +1,88 @@
+"""Test trend bucketing, LTTB downsampling and rolling statistics"""
+from datetime import date, timedelta
+
+import numpy as np
+from src.analytics.timeseries import (
+    bucket_series,
+    bucket_starts,
+    lttb,
+    rolling_mean,
+    rolling_slope,
+)
+from src.api.common import shape_multi_trend, shape_trend
+
+
+def test_buckets_start_on_monday_and_first_of_month():
+    """Week buckets start on Mondays, month buckets on the 1st"""
+    dates = np.array(["2024-01-03", "2024-01-07", "2024-01-08", "2024-02-29"])
+    weeks = bucket_starts(dates, "week").astype(str).tolist()
+    assert weeks == ["2024-01-01", "2024-01-01", "2024-01-08", "2024-02-26"]
+
+    series = bucket_series(dates, [1.0, 3.0, 5.0, 7.0], "month")
+    assert series["date"].astype(str).tolist() == ["2024-01-01", "2024-02-01"]
+    assert series["value"].tolist() == [3.0, 7.0]
+    assert series["min"].tolist() == [1.0, 7.0]
+    assert series["count"].tolist() == [3, 1]
+    assert series["last"].tolist() == [5.0, 7.0]
+    assert bucket_starts(dates, "day").astype(str).tolist() == dates.tolist()
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    """Downsampling returns n points, the first/last point and the spike"""
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    y[500] = 10.0
+    kept = lttb(x, y, 50)
+    assert len(kept) == 50 and kept[0] == 0 and kept[-1] == 999
+    assert 500 in kept
+    assert np.all(np.diff(kept) > 0)
+    assert len(lttb(x[:10], y[:10], 50)) == 10
+
+
+def test_rolling_statistics_match_naive_windows():
+    """Cumulative-sum windows equal per-window mean and polyfit slope"""
+    rng = np.random.default_rng(1)
+    days = np.cumsum(rng.integers(1, 60, 40))
+    values = 90 + 0.01 * days + rng.normal(0, 1, 40)
+    window = 7
+    means = rolling_mean(values, window)
+    slopes = rolling_slope(days, values, window)
+    assert np.isnan(means[: window - 1]).all()
+    for end in range(window, len(values) + 1):
+        chunk = slice(end - window, end)
+        assert np.isclose(means[end - 1], values[chunk].mean())
+        expected = np.polyfit(days[chunk] / 365.25, values[chunk], 1)[0]
+        assert np.isclose(slopes[end - 1], expected)
+
+
+def test_shape_trend_pipeline():
+    """Rows come back in date order, bucketed, smoothed and downsampled"""
+    start = date(2020, 1, 1)
+    rows = [
+        {"date": start + timedelta(days=7 * i), "value": float(i), "sessionId": i}
+        for i in range(104)
+    ][::-1]
+    assert [row["sessionId"] for row in shape_trend(rows)][:3] == [0, 1, 2]
+
+    monthly = shape_trend(rows, bucket="month", window=3)
+    assert monthly[0]["date"] == "2020-01-01" and monthly[0]["count"] == 5
+    assert monthly[0]["rollingMean"] is None and monthly[2]["rollingMean"] > 0
+    assert len(shape_trend(rows, points=10)) == 10
+
+
+def test_shape_multi_trend_is_columnar():
+    """Dates are listed once and every series is aligned with them"""
+    rows = [
+        {"date": date(2024, 3, 1), "sessionId": 3, "biomarkerId": 1, "value": 5.0},
+        {"date": date(2024, 3, 1), "sessionId": 3, "biomarkerId": 2, "value": 7.0},
+        {"date": date(2024, 2, 1), "sessionId": 2, "biomarkerId": 2, "value": 6.0},
+        {"date": date(2024, 1, 1), "sessionId": 1, "biomarkerId": 1, "value": 4.0},
+    ]
+    trends = shape_multi_trend(rows)
+    assert trends["dates"] == ["2024-01-01", "2024-02-01", "2024-03-01"]
+    assert trends["sessionIds"] == [1, 2, 3]
+    assert trends["series"] == {1: [4.0, None, 5.0], 2: [None, 6.0, 7.0]}
+
+    latest = shape_multi_trend(rows, limit=2)
+    assert latest["dates"] == ["2024-02-01", "2024-03-01"]
+    assert latest["series"] == {1: [None, 5.0], 2: [6.0, 7.0]}
@@ -0,0 +1,135 @@
+"""Test the chunked NHANES XPT transform on tiny synthetic XPT files"""
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyreadstat
+
+from etl.clean_store import biomarker_matrix, iter_rows, read_table
+from etl.transform import transform
+
+
+def write_xpt(raw_dir, name, columns):
+    """Write one synthetic XPT file"""
+    pyreadstat.write_xport(pd.DataFrame(columns), str(raw_dir / name))
+
+
+def test_transform_writes_typed_tables(tmp_path):
+    """Chunks smaller than the files give the same one-pass, typed tables"""
+    raw, clean = tmp_path / "raw", tmp_path / "clean" / "cycles" / "J"
+    raw.mkdir()
+    write_xpt(
+        raw,
+        "DEMO_J.XPT",
+        {
+            "SEQN": [1.0, 2.0, 3.0, 4.0, 5.0],
+            "RIDAGEYR": [40.0, 65.0, 30.0, np.nan, 80.0],
+            "RIAGENDR": [1.0, 2.0, 2.0, 1.0, 1.0],
+            "RIDRETH3": [3.0, 4.0, 6.0, 1.0, 5.0],
+            "RIDEXMON": [1.0, 2.0, np.nan, 1.0, 2.0],
+        },
+    )
+    write_xpt(
+        raw,
+        "FASTQX_J.XPT",
+        {"SEQN": [1.0, 2.0], "PHAFSTHR": [9.0, 7.0], "PHAFSTMN": [0.0, 59.0]},
+    )
+    write_xpt(
+        raw,
+        "CBC_J.XPT",
+        {
+            "SEQN": [1.0, 2.0, 3.0],
+            "LBXWBCSI": [6.1, np.nan, 5.0],
+            "LBXLYPCT": [30.0, 25.0, np.nan],
+            "LBXMCVSI": [90.0, 88.0, 91.0],
+            "LBXRDW": [13.1, 12.9, 14.0],
+        },
+    )
+    write_xpt(raw, "GLU_J.XPT", {"SEQN": [2.0, 9.0], "LBXGLU": [101.0, 88.0]})
+    write_xpt(
+        raw,
+        "BMX_J.XPT",
+        {"SEQN": [1.0, 3.0], "BMXWT": [80.0, 60.5], "BMXHT": [180.0, 165.0]},
+    )
+
+    counts = transform(
+        ["J"],
+        raw_dir=raw,
+        clean_dir=tmp_path / "clean",
+        chunk_rows=2,
+        formats=("arrow", "csv"),
+    )
+    counts = counts["J"]["rows"]
+
+    def table(name):
+        return read_table(name, clean_dir=tmp_path / "clean")
+
+    users = table("users")
+    assert users.column_names == ["SEQN", "BirthDate", "Sex", "RaceEthnicity"]
+    assert users.schema.field("BirthDate").type == pa.date32()
+    assert users["SEQN"].to_pylist() == [1, 2, 3]  # no age / unmapped race dropped
+    assert users["BirthDate"].to_pylist() == [
+        date(1978, 7, 1),
+        date(1953, 7, 1),
+        date(1988, 7, 1),
+    ]
+
+    assert list(iter_rows(clean / "sessions.arrow")) == [
+        (1, date(2018, 1, 15), 1),
+        (2, date(2018, 7, 15), 0),
+        (3, date(2018, 1, 1), 0),
+    ]
+
+    measurements = table("measurements")
+    assert measurements.schema.field("BiomarkerID").type == pa.int16()
+    assert counts["measurements"] == measurements.num_rows == 12
+    glucose = measurements.filter(pc.equal(measurements["BiomarkerID"], 4))
+    assert glucose["TakenAt"].to_pylist() == [date(2018, 7, 15), date(2018, 1, 1)]
+    wide = biomarker_matrix(clean_dir=tmp_path / "clean")
+    assert wide.loc[2, 4] == 101.0 and np.isnan(wide.loc[1, 4])
+
+    anthropometry = table("anthropometry")
+    assert anthropometry["HeightCM"].to_pylist() == [180.0, 165.0]
+    assert anthropometry["BMI"].to_pylist() == [None, None]
+
+    # optional CSV copies match the Arrow tables
+    sessions_csv = pd.read_csv(clean / "sessions.csv")
+    assert sessions_csv.values.tolist() == [
+        [1, "2018-01-15", 1],
+        [2, "2018-07-15", 0],
+        [3, "2018-01-01", 0],
+    ]
+    assert len(pd.read_csv(clean / "measurements.csv")) == 12
+    assert not list(clean.glob("*.part"))
+
+
+def test_transform_skips_unchanged_cycles(tmp_path):
+    """A cycle is only transformed again when one of its source files changes"""
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    demo = {
+        "SEQN": [1.0, 2.0],
+        "RIDAGEYR": [40.0, 50.0],
+        "RIAGENDR": [1.0, 2.0],
+        "RIDRETH3": [3.0, 3.0],
+        "RIDEXMON": [1.0, 2.0],
+    }
+    write_xpt(raw, "DEMO_J.XPT", demo)
+    write_xpt(raw, "DEMO_I.XPT", {**demo, "SEQN": [101.0, 102.0]})
+
+    first = transform(["I", "J", "H"], raw_dir=raw, clean_dir=tmp_path)
+    assert first["H"] is None  # no DEMO_H.XPT
+    assert not list((tmp_path / "cycles" / "H").glob("*.arrow"))
+
+    write_xpt(raw, "CBC_J.XPT", {"SEQN": [1.0], "LBXRDW": [13.0]})
+    second = transform(["I", "J"], raw_dir=raw, clean_dir=tmp_path)
+    assert second["I"] == first["I"]  # untouched
+    assert second["J"]["fingerprint"] != first["J"]["fingerprint"]
+    assert second["J"]["rows"]["measurements"] == 1
+
+    # asking for CSV copies redoes a cycle that only has Arrow files
+    third = transform(["I"], raw_dir=raw, clean_dir=tmp_path, formats=("arrow", "csv"))
+    assert "users.csv" in third["I"]["files"]
@@ -94,6 +94,8 @@ def verify_schema():
         "BiologicalAgeModel",
         "ModelUsesBiomarker",
         "BiologicalAgeResult",
+        "UserLatestMeasurement",
+        "NhanesCycleLoad",
     ]
 
     try: